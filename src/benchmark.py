@@ -0,0 +1,317 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准：生成指定规模的合成数据文件夹（.md 与图片笔记）和对应的 config.json，
+对扫描、配置读写、调度同步、任务分析和列表框填充分别计时，结果输出为 JSON，便于对比不同版本。
+
+用法: python src/benchmark.py --sizes 1000 10000 100000 --repeat 3 --output bench.json
+"""
+import argparse
+import copy
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from loguru import logger
+
+from config_manager import ConfigManager
+from note_manager import NoteManager
+from notifiers import InstrumentedBackend, RecordingBackend
+from schedule_rules import WEEKDAYS, RuleCache, ScheduleRule
+from scheduler_service import SchedulerService
+from task_analyzer import TaskAnalyzer
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# 1x1 像素的透明 PNG，作为合成的图片笔记内容
+_PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d4944415478da63f8ffff3f0005fe02fea7d6a4e40000000049454e44ae426082"
+)
+_IMG_EXTS = (".png", ".jpg", ".gif")
+
+
+def _random_schedule(rng):
+    """生成一条随机的调度配置，覆盖界面能产生的几种规则"""
+    at_time = f"{rng.randrange(24):02d}:{rng.choice((0, 15, 30, 45)):02d}"
+    kind = rng.randrange(4)
+    if kind == 0:
+        rules = [ScheduleRule(rng.randint(1, 12), "hours")]
+    elif kind == 1:
+        rules = [ScheduleRule(rng.randint(1, 7), "days", at_time=at_time)]
+    elif kind == 2:
+        rules = [ScheduleRule(1, "weeks", weekday=rng.choice(WEEKDAYS), at_time=at_time)]
+    else:
+        weekdays = sorted(rng.sample(WEEKDAYS, rng.randint(2, 5)), key=WEEKDAYS.index)
+        rules = [ScheduleRule(1, "weeks", weekday=day, at_time=at_time) for day in weekdays]
+    return {"mode": rng.choice(("light", "popup")), "schedule": [rule.to_dict() for rule in rules]}
+
+
+def generate_dataset(root, note_count, scheduled_ratio=0.5, image_ratio=0.2, seed=0, folder_count=0):
+    """
+    在 root 下生成 notes/ 数据文件夹和 config.json。
+    :param folder_count: 大于 0 时把笔记平均分到这么多个两层的子文件夹（如 notes/组_01/目录_003/）中
+    :return: (数据文件夹路径, config.json 路径, 已设置调度的笔记数)
+    """
+    rng = random.Random(seed)
+    data_folder = os.path.join(root, "notes")
+    os.makedirs(data_folder, exist_ok=True)
+
+    notes_schedule = {}
+    for i in range(note_count):
+        folder = ""
+        if folder_count > 0:
+            folder_index = i % folder_count
+            folder = f"组_{folder_index % 10:02d}/目录_{folder_index:03d}/"
+            os.makedirs(os.path.join(data_folder, folder), exist_ok=True)
+        if rng.random() < image_ratio:
+            filename = f"{folder}image_{i:06d}{rng.choice(_IMG_EXTS)}"
+            with open(os.path.join(data_folder, filename), 'wb') as f:
+                f.write(_PNG_BYTES)
+        else:
+            filename = f"{folder}笔记_{i:06d}.md"
+            with open(os.path.join(data_folder, filename), 'w', encoding='utf-8') as f:
+                f.write(f"# 笔记 {i}\n\n需要定期回顾的内容。\n")
+        if rng.random() < scheduled_ratio:
+            notes_schedule[filename] = _random_schedule(rng)
+
+    # 只取默认配置，不创建 ConfigManager（它会在 root 下写入配置和缓存文件）
+    config = copy.deepcopy(ConfigManager.default_config)
+    config["settings"]["data_folder"] = data_folder
+    config["notes_schedule"] = notes_schedule
+    config_path = os.path.join(root, "config.json")
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=4, ensure_ascii=False)
+    return data_folder, config_path, len(notes_schedule)
+
+
+def _time_call(func, repeat, setup=None):
+    """执行 repeat 次 func 并返回耗时统计（秒）；setup 的返回值作为 func 的参数，且不计入耗时"""
+    samples = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        started = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - started)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "max": max(samples),
+        "samples": samples,
+    }
+
+
+def _reset_caches(config_manager, drop_validation_cache=False):
+    """清空内存中的规则缓存（相当于新启动的进程），可选删除磁盘上的配置校验缓存"""
+    config_manager.rule_cache = RuleCache()
+    if drop_validation_cache and os.path.exists(config_manager.validation_cache.path):
+        os.remove(config_manager.validation_cache.path)
+
+
+def _metadata_manager(data_folder, root, fresh=False):
+    """创建使用 root 下元数据缓存数据库的 NoteManager（已扫描），fresh 为 True 时先清空缓存"""
+    cache_path = os.path.join(root, "metadata_cache.db")
+    if fresh:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(cache_path + suffix):
+                os.remove(cache_path + suffix)
+    manager = NoteManager(data_folder, max_depth=2, workers=1, metadata_cache_path=cache_path)
+    manager.scan_notes()
+    return manager
+
+
+def _warm_metadata(manager, notes):
+    """先读取一遍元数据，使之后的读取全部命中内存 LRU"""
+    for note in notes:
+        manager.get_metadata(note)
+    return manager
+
+
+def _create_scheduler(config_path):
+    """创建不写入状态文件、不发送真实通知的调度服务（不启动后台线程）"""
+    config_manager = ConfigManager(config_path)
+    return SchedulerService(
+        config_manager,
+        NoteManager(config_manager.get_setting("data_folder")),
+        notifier=InstrumentedBackend(RecordingBackend()),
+        persist_state=False,
+    )
+
+
+def _benchmark_listbox(config_manager, notes, repeat):
+    """
+    在隐藏的 Tk 窗口中对 App._populate_notes_listbox 计时。
+    缺少 GUI 依赖或没有可用的显示器时返回跳过原因。
+    """
+    try:
+        import tkinter as tk
+        from ui.app_main import App
+    except ImportError as e:
+        return {"skipped": f"缺少 GUI 依赖: {e}"}
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return {"skipped": f"无法创建 Tk 窗口: {e}"}
+    root.withdraw()
+
+    class _ListboxHost:
+        """只借用 App 中填充列表框的方法，不创建完整的主窗口"""
+        DEFAULT_BG_COLOR = App.DEFAULT_BG_COLOR
+        SCHEDULED_BG_COLOR = App.SCHEDULED_BG_COLOR
+        _populate_notes_listbox = App._populate_notes_listbox
+        _update_listbox_colors = App._update_listbox_colors
+
+        def __init__(self):
+            self.config_manager = config_manager
+            self.left_frame = tk.Frame(root)
+            self.left_frame.notes_listbox = tk.Listbox(self.left_frame)
+
+    try:
+        host = _ListboxHost()
+        return _time_call(lambda: (host._populate_notes_listbox(notes), root.update_idletasks()), repeat)
+    finally:
+        root.destroy()
+
+
+def run_benchmark(note_count, repeat=3, workdir=None, scheduled_ratio=0.5, image_ratio=0.2, seed=0,
+                  folder_count=0):
+    """
+    生成 note_count 个笔记的数据集并对各项操作计时。
+    :param workdir: 数据集所在目录，默认使用临时目录并在结束后删除
+    :return: 本规模下的结果字典
+    """
+    root = workdir or tempfile.mkdtemp(prefix=f"echonote_bench_{note_count}_")
+    os.makedirs(root, exist_ok=True)
+    try:
+        started = time.perf_counter()
+        data_folder, config_path, scheduled = generate_dataset(
+            root, note_count, scheduled_ratio, image_ratio, seed, folder_count)
+        generate_seconds = time.perf_counter() - started
+
+        note_manager = NoteManager(data_folder, max_depth=2 if folder_count else 0, workers=1)
+        config_manager = ConfigManager(config_path)
+        notes = [record.name for record in note_manager.scan_notes()]
+        # 生成数据集后立即扫描时文件夹的修改时间都在 RACY_SECONDS 以内，不会写入索引，
+        # 把它们调早以模拟一个已有一段时间的数据文件夹
+        past = time.time() - 3600
+        for dir_path, _, _ in os.walk(data_folder):
+            os.utime(dir_path, (past, past))
+        indexed_manager = NoteManager(data_folder, max_depth=2 if folder_count else 0, workers=1,
+                                      index_path=os.path.join(root, "scan_index.json"))
+        indexed_manager.scan_notes()
+
+        timings = {
+            "scan_notes": _time_call(note_manager.scan_notes, repeat),
+            # 子文件夹由线程池并行遍历（没有子文件夹时与 scan_notes 相同）
+            "scan_notes_parallel": _time_call(
+                NoteManager(data_folder, max_depth=2 if folder_count else 0, workers=8).scan_notes, repeat),
+            # 启动时从扫描索引载入列表，耗时不应随文件夹大小明显增长
+            "load_scan_index": _time_call(indexed_manager.load_index, repeat),
+            # 后台校验索引：文件夹未变化时只需 stat 每个文件夹
+            "revalidate_scan_index": _time_call(indexed_manager.revalidate, repeat),
+            # 读取前 1000 个笔记的元数据：磁盘缓存为空 / 只有磁盘缓存 / 命中内存 LRU
+            "metadata_1000_cold": _time_call(
+                lambda manager: [manager.get_metadata(note) for note in notes[:1000]], repeat,
+                setup=lambda: _metadata_manager(data_folder, root, fresh=True)),
+            "metadata_1000_disk": _time_call(
+                lambda manager: [manager.get_metadata(note) for note in notes[:1000]], repeat,
+                setup=lambda: _metadata_manager(data_folder, root)),
+            "metadata_1000_memory": _time_call(
+                lambda manager: [manager.get_metadata(note) for note in notes[:1000]], repeat,
+                setup=lambda: _warm_metadata(indexed_manager, notes[:1000])),
+            # 已扫描的记录在内存中重新排序，不应再访问磁盘
+            "sort_notes_mtime": _time_call(
+                lambda: note_manager.sort_notes(note_manager.notes, "mtime", reverse=True), repeat),
+            # 模拟新进程启动（规则缓存为空），删除校验缓存：完整的 JSON 解析、迁移和校验
+            "load_config_cold": _time_call(
+                lambda _: config_manager.load_config(), repeat,
+                setup=lambda: _reset_caches(config_manager, drop_validation_cache=True)),
+            # 配置文件未变化：直接使用校验缓存
+            "load_config": _time_call(
+                lambda _: config_manager.load_config(), repeat,
+                setup=lambda: _reset_caches(config_manager)),
+            "save_config": _time_call(config_manager.save_config, repeat),
+            # 保存单个笔记的规则，耗时应与笔记总数无关
+            "set_note_schedule": _time_call(
+                lambda: config_manager.set_note_schedule(notes[0], _random_schedule(random.Random(seed))), repeat),
+            # 把同一规则一次性应用到 500 个笔记
+            "set_many_note_schedules_500": _time_call(
+                lambda: config_manager.set_many_note_schedules(
+                    dict.fromkeys(notes[:500], _random_schedule(random.Random(seed)))), repeat),
+            # 每次使用新的调度服务和规则缓存，测量启动时的全量同步
+            "reload_schedules": _time_call(
+                lambda service: service.reload_schedules(), repeat,
+                setup=lambda: _create_scheduler(config_path)),
+        }
+
+        # 已同步过的调度服务再次同步：测量配置未变化时的比对开销
+        service = _create_scheduler(config_path)
+        service.reload_schedules()
+        timings["reload_schedules_unchanged"] = _time_call(service.reload_schedules, repeat)
+
+        timings["analyze_weekly_schedule"] = _time_call(
+            TaskAnalyzer(service.config_manager).analyze_weekly_schedule, repeat)
+        timings["populate_listbox"] = _benchmark_listbox(config_manager, notes, repeat)
+
+        return {
+            "notes": note_count,
+            "folders": folder_count,
+            "scanned": len(notes),
+            "scheduled": scheduled,
+            "jobs": len(service.scheduler.jobs),
+            "config_bytes": os.path.getsize(config_path),
+            "generate_seconds": generate_seconds,
+            "timings": timings,
+        }
+    finally:
+        if workdir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EchoNote 性能基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="笔记数量，可指定多个")
+    parser.add_argument("--repeat", type=int, default=3, help="每项操作的重复次数")
+    parser.add_argument("--scheduled-ratio", type=float, default=0.5, help="设置了调度的笔记比例")
+    parser.add_argument("--image-ratio", type=float, default=0.2, help="图片笔记的比例")
+    parser.add_argument("--folders", type=int, default=0, help="把笔记分散到多少个子文件夹中，0 表示全部放在顶层")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，相同种子生成相同的数据集")
+    parser.add_argument("--workdir", help="保留生成的数据集的目录（默认使用临时目录并在结束后删除）")
+    parser.add_argument("--output", help="结果 JSON 的输出路径（默认输出到标准输出）")
+    args = parser.parse_args(argv)
+
+    # 基准测试只关心耗时，屏蔽逐条任务的日志
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = []
+    for size in args.sizes:
+        print(f"正在测试 {size} 个笔记...", file=sys.stderr)
+        workdir = os.path.join(args.workdir, str(size)) if args.workdir else None
+        results.append(run_benchmark(size, args.repeat, workdir, args.scheduled_ratio, args.image_ratio, args.seed,
+                                     args.folders))
+
+    report = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
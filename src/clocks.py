@@ -0,0 +1,25 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import datetime
+
+
+class SystemClock:
+    """真实的系统时钟，调度服务默认使用"""
+
+    def now(self):
+        return datetime.datetime.now()
+
+
+class VirtualClock:
+    """只能手动推进的虚拟时钟，用于在几秒内模拟数天乃至数月的调度"""
+
+    def __init__(self, start=None):
+        self.current = start or datetime.datetime.now().replace(microsecond=0)
+
+    def now(self):
+        return self.current
+
+    def advance_to(self, moment):
+        """将时钟推进到 moment（时钟不会倒退）"""
+        if moment > self.current:
+            self.current = moment
@@ -1,87 +1,621 @@
+import copy
 import json
 import os
+import sqlite3
+import threading
+from dataclasses import dataclass, field
 from loguru import logger
 
+from config_schema import SCHEMA_VERSION, ValidationCache, migrate_config, validate_config
+from note_store import SqliteNoteStore, read_note_schedules
+from schedule_journal import ScheduleJournal
+from schedule_rules import RuleCache, RuleParseError, parse_rules
+
+_MISSING = object()
+
+
+@dataclass
+class ConfigChange:
+    """一次配置变更涉及的设置项和笔记，调度服务和界面据此只更新受影响的部分"""
+    settings: set = field(default_factory=set)
+    notes: set = field(default_factory=set)
+    # 内存和文件两边都修改过、且结果不同的项，形如 "settings.data_folder"、"notes_schedule.a.md"
+    conflicts: list = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.settings or self.notes)
+
+
 class ConfigManager:
-    """负责处理应用程序的配置文件（config.json）"""
-    def __init__(self, config_path='config.json'):
+    """
+    负责处理应用程序的配置文件（config.json）。
+    修改配置时只标记为待保存，save_delay 秒内的多次修改合并为一次写入；
+    写入先落到临时文件并 fsync，再原子地替换原文件，中途崩溃不会留下残缺的配置。
+    笔记的调度修改只追加到 schedule_journal.jsonl，日志足够长时才在后台写入完整快照。
+    storage_backend 设置为 "sqlite" 时，笔记调度改为保存在 echonote.db 中（见 note_store.py）。
+    """
+
+    # 默认配置：加载时补齐缺失的键，类型错误的设置项恢复为这里的值（只读，使用时先深拷贝）
+    default_config = {
+        "version": SCHEMA_VERSION,
+        "settings": {
+            "data_folder": "",
+            "md_editor_path": "",
+            "img_editor_path": "",
+            "autostart": False,
+            "window_size": [900, 700],
+            "window_position": [100, 100],
+            "pane_width": 250,
+            "dispatch_workers": 4,
+            "dispatch_queue_size": 256,
+            "catchup_policy": "once",
+            "catchup_max_per_note": 10,
+            "digest_window_seconds": 30,
+            "md_editor_multi_file": False,
+            "img_editor_multi_file": False,
+            "max_reminders_per_minute": 10,
+            "max_reminders_per_hour": 120,
+            "quiet_hours": [],
+            "notifier_backend": "auto",
+            "storage_backend": "json",
+            "config_watch_interval": 2,
+            # 主数据文件夹之外的笔记来源: [{"name": "工作", "path": "...", "include": [], "exclude": []}]
+            "note_sources": [],
+            "scan_max_depth": 5,
+            "scan_ignore_patterns": [".*", "__pycache__", "node_modules"],
+            "scan_workers": 4,
+            "notes_watch": "auto",
+            "notes_watch_debounce": 0.5,
+            "notes_watch_interval": 2,
+            "metadata_cache_size": 2048,
+            "thumbnail_size": 128,
+            "thumbnail_cache_mb": 64,
+            "thumbnail_workers": 2
+        },
+        "notes_schedule": {}
+    }
+
+    def __init__(self, config_path='config.json', save_delay=1.0):
         self.config_path = config_path
-        self.default_config = {
-            "settings": {
-                "data_folder": "",
-                "md_editor_path": "",
-                "img_editor_path": "",
-                "autostart": False,
-                "window_size": [900, 700],
-                "window_position": [100, 100],
-                "pane_width": 250
-            },
-            "notes_schedule": {}
-        }
+        self.save_delay = save_delay
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._save_timer = None
+        self._dirty = False
+        # 最近一次从磁盘读取或写入磁盘的内容及文件签名，用于识别外部修改
+        self._disk_content = None
+        self._pending_content = None
+        self._disk_signature = None
+        # 每次序列化得到一个递增的代号；写入时已有更新的快照落盘则跳过，避免旧快照覆盖新快照
+        self._save_generation = 0
+        self._written_generation = 0
+        self.rule_cache = RuleCache()
+        # 加载时发现的配置问题（类型错误的设置项、无效的规则等）
+        self.validation_errors = []
+        self.validation_cache = ValidationCache(self.get_state_path("config_cache.json"))
+        self.schedule_journal = ScheduleJournal(self.get_state_path("schedule_journal.jsonl"))
         self.config = self.load_config()
+        self._known_notes = []
+        self.note_store = None
+        if self.get_setting("storage_backend") == "sqlite":
+            self.note_store = self._open_note_store()
+        else:
+            self._export_note_store()
 
     def load_config(self):
-        """加载配置文件，如果文件不存在则创建一个默认的"""
+        """
+        加载配置文件（快照）并重放调度日志，如果文件不存在则创建一个默认的。
+        文件内容会迁移到当前版本并校验一次，规则编译进 rule_cache；
+        文件未变化时直接使用上次的校验缓存。
+        """
         if not os.path.exists(self.config_path):
             logger.info("配置文件不存在，将创建默认配置文件。")
-            self.save_config(self.default_config)
-            return self.default_config
+            config = copy.deepcopy(self.default_config)
+            self.schedule_journal.replay(config['notes_schedule'])
+            self.save_config(config)
+            return config
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                # 确保所有键都存在
-                for key, value in self.default_config.items():
-                    if key not in config:
-                        config[key] = value
-                    elif isinstance(value, dict):
-                        for sub_key, sub_value in value.items():
-                            if sub_key not in config[key]:
-                                config[key][sub_key] = sub_value
-                return config
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"加载配置文件失败: {e}。将使用默认配置。")
-            return self.default_config
+            signature = self._file_signature()
+            with open(self.config_path, 'rb') as f:
+                raw = f.read()
+            content = raw.decode('utf-8')
+            cache_key = self.validation_cache.make_key(raw, signature)
+            cached = self.validation_cache.load(cache_key)
+            if cached is not None:
+                config, self.validation_errors = cached["config"], cached["errors"]
+                notes_schedule = config['notes_schedule']
+                self.rule_cache.preload({filename: notes_schedule[filename] for filename in cached["valid"]
+                                         if filename in notes_schedule})
+            else:
+                config = self._normalize_config(json.loads(content))
+                self.validation_errors = validate_config(config, self.default_config, self.rule_cache)
+                valid = [filename for filename, schedule_info in config['notes_schedule'].items()
+                         if filename in self.rule_cache and all(
+                             isinstance(raw, dict) for raw in schedule_info.get("schedule") or [])]
+                self.validation_cache.save(cache_key, {
+                    "config": config, "errors": self.validation_errors, "valid": valid})
+            self._report_validation_errors(self.validation_errors)
+            with self._lock:
+                self._disk_content, self._disk_signature = content, signature
+            self.schedule_journal.replay(config['notes_schedule'])
+            return config
+        except (ValueError, IOError) as e:
+            # 保留损坏的文件，避免之后保存默认配置时覆盖掉原有的调度设置
+            backup_path = self.config_path + ".corrupt"
+            try:
+                os.replace(self.config_path, backup_path)
+                logger.error(f"加载配置文件失败: {e}。原文件已备份为 '{backup_path}'，将使用默认配置。")
+            except OSError:
+                logger.error(f"加载配置文件失败: {e}。将使用默认配置。")
+            config = copy.deepcopy(self.default_config)
+            self.schedule_journal.replay(config['notes_schedule'])
+            return config
+
+    @classmethod
+    def _normalize_config(cls, config):
+        """将刚解析出的配置迁移到当前版本并补齐缺失的键（原地修改并返回 config）"""
+        if not isinstance(config, dict):
+            raise ValueError("配置文件顶层不是 JSON 对象")
+        migrate_config(config)
+        return cls._fill_defaults(config)
+
+    @staticmethod
+    def _report_validation_errors(errors, limit=20):
+        for error in errors[:limit]:
+            logger.warning(f"配置校验: {error}")
+        if len(errors) > limit:
+            logger.warning(f"配置校验: 另有 {len(errors) - limit} 个问题未列出。")
+
+    @classmethod
+    def _fill_defaults(cls, config):
+        """确保所有键都存在（原地修改并返回 config）"""
+        for key, value in cls.default_config.items():
+            if key not in config:
+                config[key] = copy.deepcopy(value)
+            elif isinstance(value, dict) and isinstance(config[key], dict):
+                for sub_key, sub_value in value.items():
+                    if sub_key not in config[key]:
+                        config[key][sub_key] = copy.deepcopy(sub_value)
+        return config
+
+    def _file_signature(self):
+        """返回配置文件的 (修改时间, 大小)，文件不存在时返回 None"""
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
 
     def save_config(self, data=None):
-        """将当前配置保存到文件"""
-        if data is None:
-            data = self.config
+        """
+        立即将当前配置原子地保存到文件（临时文件 + fsync + 替换）。
+        保存当前配置时会同时轮转调度日志：快照写入成功后，旧日志中的修改已包含在快照里。
+        多个线程同时保存时（如防抖计时器和 flush），后序列化的快照一定最后落盘。
+        :return: 是否写入成功（已有更新的快照落盘时也视为成功）
+        """
+        snapshot = data is None
+        with self._lock:
+            if snapshot:
+                data = self.config
+            content = json.dumps(data, indent=4, ensure_ascii=False)
+            if snapshot:
+                self.schedule_journal.rotate()
+            self._save_generation += 1
+            generation = self._save_generation
+            self._pending_content = content
+            self._dirty = False
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+
+        tmp_path = self.config_path + ".tmp"
         try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+            with self._write_lock:
+                if generation < self._written_generation:
+                    # 更新的快照已经落盘，其中包含了这次要写入的全部内容
+                    return True
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.config_path)
+                self._written_generation = generation
+                with self._lock:
+                    self._disk_content, self._disk_signature = content, self._file_signature()
+                    # 之后又有快照轮转过日志时，轮转出的日志里可能有这次快照不包含的修改，交给那次保存删除
+                    latest = generation == self._save_generation
+                if snapshot and latest:
+                    self.schedule_journal.discard_rotated()
             logger.info("配置已成功保存。")
-        except IOError as e:
+            return True
+        except OSError as e:
             logger.error(f"保存配置文件失败: {e}")
+            with self._lock:
+                self._dirty = True
+            return False
+
+    def reload_external(self):
+        """
+        检查 config.json 是否被外部程序修改过，如果是，则与内存中的配置做三方合并：
+        以上次读写磁盘时的内容为基准，只有外部修改过的项才会覆盖内存中的值；
+        两边都修改过且结果不同的项视为冲突，保留内存中的值，外部文件另存为 config.json.conflict。
+        :return: ConfigChange；文件未变化或暂时无法解析（外部程序可能正在写入）时返回 None
+        """
+        signature = self._file_signature()
+        with self._lock:
+            if signature is None or signature == self._disk_signature:
+                return None
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            remote = json.loads(content)
+            if not isinstance(remote, dict):
+                raise ValueError("顶层不是 JSON 对象")
+        except (IOError, ValueError) as e:
+            logger.debug(f"外部修改的配置文件暂时无法解析，稍后重试: {e}")
+            return None
+        self._normalize_config(remote)
+        self._report_validation_errors(validate_config(remote, self.default_config, RuleCache()))
+
+        change = ConfigChange()
+        with self._lock:
+            if content in (self._disk_content, self._pending_content):
+                # 本进程自己写入的内容
+                self._disk_content, self._disk_signature = content, signature
+                return None
+            base = self._normalize_config(json.loads(self._disk_content) if self._disk_content else {})
+
+            change.settings, conflicts = self._merge_section(
+                self.config['settings'], base['settings'], remote['settings'])
+            change.conflicts.extend(f"settings.{key}" for key in conflicts)
+
+            if self.note_store:
+                # SQLite 存储以数据库为准：只把外部写入 config.json 的调度导入数据库
+                updates = {filename: remote['notes_schedule'].get(filename)
+                           for filename in set(base['notes_schedule']) | set(remote['notes_schedule'])
+                           if remote['notes_schedule'].get(filename) != base['notes_schedule'].get(filename)}
+                if updates:
+                    self.note_store.set_many_note_schedules(updates)
+                    change.notes = set(updates)
+            else:
+                change.notes, conflicts = self._merge_section(
+                    self.config['notes_schedule'], base['notes_schedule'], remote['notes_schedule'])
+                change.conflicts.extend(f"notes_schedule.{filename}" for filename in conflicts)
+            for filename in change.notes:
+                self.rule_cache.discard(filename)
+
+            self._disk_content, self._disk_signature = content, signature
+
+        if change.conflicts:
+            conflict_path = self.config_path + ".conflict"
+            try:
+                with open(conflict_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+            except IOError as e:
+                logger.error(f"保存冲突的配置文件失败: {e}")
+            logger.warning(f"配置文件在外部和程序内都被修改，以下项保留程序内的值: {change.conflicts}。"
+                           f"外部修改的版本已另存为 '{conflict_path}'。")
+        if change.conflicts or (self.note_store and change.notes):
+            # 将合并结果写回文件
+            self.mark_dirty()
+        if change:
+            logger.info(f"检测到配置文件被外部修改：{len(change.settings)} 个设置项、"
+                        f"{len(change.notes)} 个笔记的调度有变化。")
+        return change
+
+    @staticmethod
+    def _merge_section(local, base, remote):
+        """
+        将 remote 相对 base 的修改合并到 local（原地修改）。
+        :return: (被修改的键集合, 冲突的键列表)
+        """
+        changed, conflicts = set(), []
+        for key in set(base) | set(remote):
+            base_value = base.get(key, _MISSING)
+            remote_value = remote.get(key, _MISSING)
+            if remote_value == base_value:
+                continue
+            local_value = local.get(key, _MISSING)
+            if local_value == remote_value:
+                continue
+            if local_value != base_value:
+                conflicts.append(key)
+                continue
+            if remote_value is _MISSING:
+                del local[key]
+            else:
+                local[key] = remote_value
+            changed.add(key)
+        return changed, sorted(conflicts)
+
+    def mark_dirty(self):
+        """标记配置已修改，在 save_delay 秒后统一保存；期间的其他修改会合并到同一次写入"""
+        with self._lock:
+            self._dirty = True
+            if self.save_delay <= 0:
+                self.save_config()
+                return
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self):
+        """如果有尚未写入的修改，立即保存（退出程序前调用）"""
+        with self._lock:
+            if not self._dirty:
+                return
+        self.save_config()
+
+    def _open_note_store(self):
+        """
+        打开 SQLite 存储，并把 config.json 中的调度导入数据库（同名笔记以 config.json 为准），之后以数据库为准。
+        调度确认写入数据库后才清空 config.json 中的副本。
+        """
+        with self._lock:
+            notes_schedule = dict(self.config['notes_schedule'])
+        try:
+            store = SqliteNoteStore(self.get_state_path("echonote.db"))
+            if notes_schedule:
+                store.set_many_note_schedules(notes_schedule)
+                logger.info(f"已将 {len(notes_schedule)} 个笔记的调度导入 SQLite 存储。")
+        except sqlite3.Error as e:
+            logger.error(f"打开 SQLite 存储失败: {e}。将继续使用 config.json 保存调度。")
+            return None
+        if notes_schedule:
+            with self._lock:
+                for filename in notes_schedule:
+                    if self.config['notes_schedule'].get(filename) == notes_schedule[filename]:
+                        del self.config['notes_schedule'][filename]
+            self.save_config()
+        return store
+
+    def _export_note_store(self):
+        """
+        storage_backend 改回 "json" 后，把 SQLite 存储中的调度导出到 config.json（同名笔记以 config.json 为准）。
+        config.json 保存成功后才清除数据库中的调度，两边不会同时保存同一份调度；触发历史保留在数据库中。
+        """
+        db_path = self.get_state_path("echonote.db")
+        if not os.path.exists(db_path):
+            return
+        try:
+            store = SqliteNoteStore(db_path)
+        except sqlite3.Error as e:
+            logger.error(f"打开 SQLite 存储失败，无法导出其中的调度: {e}")
+            return
+        try:
+            exported = store.get_all_note_schedules()
+            if not exported:
+                return
+            with self._lock:
+                notes_schedule = self.config['notes_schedule']
+                for filename, schedule_info in exported.items():
+                    notes_schedule.setdefault(filename, schedule_info)
+                    self.rule_cache.discard(filename)
+            if not self.save_config():
+                logger.error("导出的调度未能写入 config.json，SQLite 存储中的调度暂时保留。")
+                return
+            store.set_many_note_schedules(dict.fromkeys(exported))
+            logger.info(f"已将 {len(exported)} 个笔记的调度从 SQLite 存储导出到 config.json。")
+        except sqlite3.Error as e:
+            logger.error(f"从 SQLite 存储导出调度失败: {e}")
+        finally:
+            store.close()
+
+    def get_state_path(self, filename):
+        """返回与配置文件位于同一目录下的状态文件路径（如触发日志、缓存等）"""
+        return os.path.join(os.path.dirname(os.path.abspath(self.config_path)), filename)
 
     def get_setting(self, key, default=None):
         """获取一个全局设置项"""
         return self.config['settings'].get(key, default)
 
     def set_setting(self, key, value):
-        """设置一个全局设置项并立即保存"""
-        self.config['settings'][key] = value
-        self.save_config()
+        """设置一个全局设置项，稍后统一保存"""
+        with self._lock:
+            self.config['settings'][key] = value
+        self.mark_dirty()
 
     # --- 修改开始: 添加一个新方法用于批量设置 ---
     def set_geometry_settings(self, size, position, pane_width):
         """
         批量更新窗口几何相关的设置，并只保存一次。
         """
-        self.config['settings']['window_size'] = size
-        self.config['settings']['window_position'] = position
-        self.config['settings']['pane_width'] = pane_width
-        self.save_config()
+        with self._lock:
+            self.config['settings']['window_size'] = size
+            self.config['settings']['window_position'] = position
+            self.config['settings']['pane_width'] = pane_width
+        self.mark_dirty()
     # --- 修改结束 ---
 
     def get_note_schedule(self, note_filename):
         """获取指定笔记的调度配置"""
+        if self.note_store:
+            return self.note_store.get_note_schedule(note_filename)
         return self.config['notes_schedule'].get(note_filename)
 
+    def get_all_note_schedules(self):
+        """
+        返回 {笔记文件名: 调度配置} 的浅拷贝（在锁内复制，配置监视线程合并外部修改时可以安全遍历），
+        调用方不应修改其中的调度配置
+        """
+        if self.note_store:
+            return self.note_store.get_all_note_schedules()
+        with self._lock:
+            return dict(self.config['notes_schedule'])
+
+    def get_scheduled_notes(self):
+        """返回已设置调度的笔记文件名集合"""
+        if self.note_store:
+            return self.note_store.get_scheduled_notes()
+        with self._lock:
+            return set(self.config['notes_schedule'])
+
+    def get_compiled_schedule(self, note_filename):
+        """
+        获取指定笔记编译后的调度配置（CompiledSchedule），未设置时返回 None。
+        规则无效时抛出 RuleParseError。
+        """
+        return self.rule_cache.get(note_filename, self.get_note_schedule(note_filename))
+
     def set_note_schedule(self, note_filename, schedule_info):
-        """设置指定笔记的调度配置并立即保存"""
-        if schedule_info is None:
-            if note_filename in self.config['notes_schedule']:
-                del self.config['notes_schedule'][note_filename]
+        """
+        设置指定笔记的调度配置。修改只追加到调度日志，耗时与笔记总数无关；
+        日志过长时才安排一次完整保存（在后台写入快照并清空日志）。
+        """
+        self._apply_note_schedules({note_filename: schedule_info})
+
+    def set_many_note_schedules(self, mapping):
+        """
+        批量设置多个笔记的调度配置 {笔记文件名: 调度配置}，值为 None 表示清除。
+        先校验全部规则，任一无效则抛出 RuleParseError 且不做任何修改；
+        校验通过后一次性写入（一次日志追加或一个 SQLite 事务）。
+        :return: ConfigChange，调度服务和界面可据此只更新涉及的笔记
+        """
+        for note_filename, schedule_info in mapping.items():
+            if schedule_info is None:
+                continue
+            if not isinstance(schedule_info, dict) or not schedule_info.get("mode"):
+                raise RuleParseError(f"笔记 '{note_filename}' 的调度配置缺少提醒模式: {schedule_info!r}")
+            try:
+                parse_rules(schedule_info.get("schedule"))
+            except RuleParseError as e:
+                raise RuleParseError(f"笔记 '{note_filename}' 的调度规则无效: {e}") from e
+
+        self._apply_note_schedules(mapping)
+        logger.info(f"已批量更新 {len(mapping)} 个笔记的调度。")
+        return ConfigChange(notes=set(mapping))
+
+    def batch(self):
+        """
+        返回批量修改调度的上下文管理器，退出时通过 set_many_note_schedules 一次性提交：
+            with config_manager.batch() as batch:
+                batch.set("a.md", {...})
+                batch.delete("b.md")
+            scheduler_service.apply_config_change(batch.change)
+        """
+        return ScheduleBatch(self)
+
+    def _apply_note_schedules(self, mapping):
+        """写入调度修改（不做校验）"""
+        if not mapping:
+            return
+        if self.note_store:
+            self.note_store.set_many_note_schedules(mapping)
+            for note_filename, schedule_info in mapping.items():
+                if schedule_info is None:
+                    self.rule_cache.discard(note_filename)
+            return
+
+        with self._lock:
+            notes_schedule = self.config['notes_schedule']
+            for note_filename, schedule_info in mapping.items():
+                if schedule_info is None:
+                    notes_schedule.pop(note_filename, None)
+                    self.rule_cache.discard(note_filename)
+                else:
+                    notes_schedule[note_filename] = schedule_info
+            self.schedule_journal.record_many(mapping)
+            needs_compaction = self.schedule_journal.needs_compaction(len(notes_schedule))
+        if needs_compaction:
+            self.mark_dirty()
+
+    def sync_notes(self, filenames):
+        """记录最近一次扫描到的笔记文件，供 get_unscheduled_notes 查询"""
+        if self.note_store:
+            self.note_store.sync_notes(filenames)
         else:
-            self.config['notes_schedule'][note_filename] = schedule_info
-        self.save_config()
\ No newline at end of file
+            self._known_notes = list(filenames)
+
+    def get_unscheduled_notes(self):
+        """返回最近一次扫描到、但尚未设置调度的笔记文件名"""
+        if self.note_store:
+            return self.note_store.get_unscheduled_notes()
+        with self._lock:
+            return sorted(f for f in self._known_notes if f not in self.config['notes_schedule'])
+
+    def get_notes_due_between(self, start, end):
+        """返回在 (start, end] 内有规则到期的笔记文件名，按到期时间排序"""
+        if self.note_store:
+            return self.note_store.get_notes_due_between(start, end)
+        due = []
+        with self._lock:
+            notes_schedule = list(self.config['notes_schedule'].items())
+        for filename, schedule_info in notes_schedule:
+            try:
+                compiled = self.rule_cache.get(filename, schedule_info)
+            except RuleParseError:
+                continue
+            if compiled and compiled.rules:
+                next_run = min(rule.next_run_after(start) for rule in compiled.rules)
+                if next_run <= end:
+                    due.append((next_run, filename))
+        return [filename for _, filename in sorted(due)]
+
+    def record_fire(self, when, note_filename, mode=None):
+        """记录一次提醒触发（仅 SQLite 存储保存触发历史；签名与调度服务的 fire_listeners 一致）"""
+        if self.note_store:
+            self.note_store.record_fire(when, note_filename, mode)
+
+
+class ScheduleBatch:
+    """ConfigManager.batch() 返回的批量修改，退出 with 块时一次性提交；块内抛出异常时放弃全部修改"""
+
+    def __init__(self, config_manager):
+        self.config_manager = config_manager
+        self.pending = {}
+        self.change = ConfigChange()
+
+    def set(self, note_filename, schedule_info):
+        self.pending[note_filename] = schedule_info
+
+    def delete(self, note_filename):
+        self.pending[note_filename] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None and self.pending:
+            self.change = self.config_manager.set_many_note_schedules(self.pending)
+        return False
+
+
+class ConfigSnapshot:
+    """
+    只读加载的配置（模拟运行使用），提供调度服务需要的查询接口。
+    解析、迁移和校验都只作用于内存中的副本：不保存文件、不写校验缓存、不轮转调度日志，
+    也不打开 SQLite 存储（只以只读方式查询其中的调度）。
+    文件无法解析时抛出 ValueError，不会像 ConfigManager 那样改名备份并退回默认配置。
+    """
+
+    def __init__(self, config_path):
+        self.config_path = config_path
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = ConfigManager._normalize_config(json.load(f))
+        self.rule_cache = RuleCache()
+        self.validation_errors = validate_config(config, ConfigManager.default_config, self.rule_cache)
+        ScheduleJournal(self.get_state_path("schedule_journal.jsonl")).replay(config['notes_schedule'])
+        if config['settings'].get("storage_backend") == "sqlite":
+            try:
+                stored = read_note_schedules(self.get_state_path("echonote.db"))
+            except sqlite3.Error as e:
+                raise ValueError(f"读取 SQLite 存储失败: {e}") from e
+            # 与 ConfigManager 打开存储时一致：同名笔记以 config.json 为准
+            stored.update(config['notes_schedule'])
+            config['notes_schedule'] = stored
+        self.config = config
+
+    get_state_path = ConfigManager.get_state_path
+
+    def get_setting(self, key, default=None):
+        return self.config['settings'].get(key, default)
+
+    def get_note_schedule(self, note_filename):
+        return self.config['notes_schedule'].get(note_filename)
+
+    def get_all_note_schedules(self):
+        return self.config['notes_schedule']
+
+    def record_fire(self, when, note_filename, mode=None):
+        """只读配置不记录触发历史"""
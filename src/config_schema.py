@@ -0,0 +1,167 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+config.json 的版本、迁移和校验。
+
+第 1 版：没有 version 字段，规则保存为 every(3).hours、every().monday.at('10:30') 形式的字符串。
+第 2 版：顶层增加 "version": 2，规则保存为结构化列表，如
+         [{"interval": 1, "unit": "weeks", "weekday": "monday", "at": "10:30"}]。
+"""
+import copy
+import hashlib
+import json
+import os
+from loguru import logger
+
+from schedule_rules import RuleParseError, parse_rule
+
+SCHEMA_VERSION = 2
+REMINDER_MODES = ("popup", "light")
+
+
+def upgrade_rules(raw_rules):
+    """将字符串规则（或其列表）转换为结构化规则列表；无法解析的规则原样保留，交给校验报告"""
+    if isinstance(raw_rules, (str, dict)):
+        raw_rules = [raw_rules]
+    if not isinstance(raw_rules, list):
+        return raw_rules
+    upgraded = []
+    for raw_rule in raw_rules:
+        if isinstance(raw_rule, str) and raw_rule:
+            try:
+                raw_rule = parse_rule(raw_rule).to_dict()
+            except RuleParseError:
+                pass
+        upgraded.append(raw_rule)
+    return upgraded
+
+
+def _migrate_1_to_2(config):
+    """第 1 版 → 第 2 版：字符串规则改为结构化规则"""
+    notes_schedule = config.get("notes_schedule")
+    if not isinstance(notes_schedule, dict):
+        return
+    for schedule_info in notes_schedule.values():
+        if isinstance(schedule_info, dict) and "schedule" in schedule_info:
+            schedule_info["schedule"] = upgrade_rules(schedule_info["schedule"])
+
+
+# 键为迁移前的版本号，每一步把配置升级一个版本（原地修改）
+MIGRATIONS = {
+    1: _migrate_1_to_2,
+}
+
+
+def migrate_config(config):
+    """
+    将配置逐步迁移到 SCHEMA_VERSION（原地修改）。
+    :return: 迁移前的版本号
+    """
+    version = config.get("version", 1)
+    if type(version) is not int or version < 1:
+        logger.warning(f"配置文件的版本号无效: {version!r}，将按第 1 版处理。")
+        version = 1
+    original_version = version
+    if version > SCHEMA_VERSION:
+        logger.warning(f"配置文件版本（{version}）高于程序支持的版本（{SCHEMA_VERSION}），将尽量按当前版本读取。")
+        return original_version
+
+    while version < SCHEMA_VERSION:
+        MIGRATIONS[version](config)
+        version += 1
+    config["version"] = max(original_version, SCHEMA_VERSION)
+    if original_version != SCHEMA_VERSION:
+        logger.info(f"配置已从第 {original_version} 版迁移到第 {SCHEMA_VERSION} 版。")
+    return original_version
+
+
+def _same_type(value, default):
+    if isinstance(default, bool):
+        return isinstance(value, bool)
+    if isinstance(default, (int, float)):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    return isinstance(value, type(default))
+
+
+def validate_config(config, default_config, rule_cache):
+    """
+    校验已迁移的配置（原地修正）并把所有笔记的规则编译进 rule_cache。
+    类型错误的设置项恢复为默认值，残留的字符串规则转换为结构化规则；
+    规则无效的笔记保留原样，只在返回的错误列表中报告。
+    :return: 错误信息列表
+    """
+    errors = []
+    for section in ("settings", "notes_schedule"):
+        if not isinstance(config.get(section), dict):
+            errors.append(f"'{section}' 不是对象，已恢复为默认值。")
+            config[section] = copy.deepcopy(default_config[section])
+
+    settings = config["settings"]
+    for key, default in default_config["settings"].items():
+        if not _same_type(settings.get(key), default):
+            errors.append(f"设置项 '{key}' 的值 {settings.get(key)!r} 类型无效，已恢复为默认值 {default!r}。")
+            settings[key] = copy.deepcopy(default)
+
+    for filename, schedule_info in config["notes_schedule"].items():
+        if not isinstance(schedule_info, dict):
+            errors.append(f"笔记 '{filename}' 的调度配置不是对象: {schedule_info!r}")
+            continue
+        raw_rules = schedule_info.get("schedule")
+        if isinstance(raw_rules, str) or isinstance(raw_rules, list) and any(isinstance(r, str) for r in raw_rules):
+            # 外部脚本仍可能写入旧版的字符串规则
+            schedule_info["schedule"] = upgrade_rules(raw_rules)
+        if schedule_info.get("mode") not in REMINDER_MODES:
+            errors.append(f"笔记 '{filename}' 的提醒模式无效: {schedule_info.get('mode')!r}")
+        try:
+            rule_cache.get(filename, schedule_info)
+        except RuleParseError as e:
+            errors.append(f"笔记 '{filename}' 的调度规则无效: {e}")
+    return errors
+
+
+class ValidationCache:
+    """
+    缓存校验后的配置和规则有效的笔记（JSON 文件），键为配置文件的 (修改时间, 大小, 内容哈希)。
+    文件未变化时，下次启动直接载入缓存，跳过迁移和校验，有效的规则直接按结构编译。
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def make_key(content, signature):
+        """content 为配置文件的原始字节，signature 为 (st_mtime_ns, st_size)；返回可直接写入 JSON 的列表"""
+        return [SCHEMA_VERSION, list(signature) if signature else None, hashlib.sha256(content).hexdigest()]
+
+    def load(self, key):
+        """
+        返回与 key 匹配的缓存内容 {"config": ..., "errors": [...], "valid": [...]}，
+        不存在、不匹配或格式不对时返回 None
+        """
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取配置校验缓存失败，将重新校验: {e}")
+            return None
+        if not isinstance(cached, dict) or cached.get("key") != key:
+            return None
+        payload = cached.get("payload")
+        if not isinstance(payload, dict) or not isinstance(payload.get("config"), dict) \
+                or not isinstance(payload.get("errors"), list) or not isinstance(payload.get("valid"), list):
+            logger.warning("配置校验缓存的格式无效，将重新校验。")
+            return None
+        return payload
+
+    def save(self, key, payload):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"key": key, "payload": payload}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"保存配置校验缓存失败: {e}")
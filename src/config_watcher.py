@@ -0,0 +1,56 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import threading
+from loguru import logger
+
+
+class ConfigWatcher:
+    """
+    在后台线程中按固定间隔检查 config.json 的修改时间和大小，
+    发现外部修改时调用 ConfigManager.reload_external 合并，并把变更通知给各监听器。
+    监听器 listener(change) 在监视线程中调用，涉及界面的操作需自行切回主线程。
+    """
+
+    def __init__(self, config_manager, interval=2):
+        self.config_manager = config_manager
+        self.interval = interval
+        self.listeners = []
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.interval <= 0:
+            logger.info("配置文件监视已关闭。")
+            return
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self.thread.start()
+        logger.info(f"开始监视配置文件的外部修改（每 {self.interval} 秒检查一次）。")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """检查一次配置文件；有变化时通知监听器并返回 ConfigChange，否则返回 None"""
+        try:
+            change = self.config_manager.reload_external()
+        except Exception as e:
+            logger.error(f"重新加载配置文件失败: {e}")
+            return None
+        if not change:
+            return None
+        for listener in self.listeners:
+            try:
+                listener(change)
+            except Exception as e:
+                logger.error(f"处理配置变更失败: {e}")
+        return change
@@ -0,0 +1,192 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import datetime
+import heapq
+import itertools
+import json
+import os
+import threading
+from loguru import logger
+
+
+class TokenBucket:
+    """令牌桶：每 period_seconds 秒最多放行 capacity 次，capacity 为 0 表示不限制"""
+
+    def __init__(self, capacity, period_seconds):
+        self.capacity = max(0, int(capacity))
+        self.period_seconds = period_seconds
+        self.tokens = float(self.capacity)
+        self.updated_at = None
+
+    @property
+    def unlimited(self):
+        return self.capacity == 0
+
+    def _refill(self, now):
+        if self.updated_at is not None:
+            elapsed = max(0.0, (now - self.updated_at).total_seconds())
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.capacity / self.period_seconds)
+        self.updated_at = now
+
+    def has_token(self, now):
+        if self.unlimited:
+            return True
+        self._refill(now)
+        # 允许微小的浮点误差，避免令牌恰好补满时被判定为不足
+        return self.tokens >= 1 - 1e-9
+
+    def take(self, now):
+        if not self.unlimited:
+            self._refill(now)
+            self.tokens -= 1
+
+    def seconds_until_token(self, now):
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        if self.tokens >= 1 - 1e-9:
+            return 0.0
+        return (1 - self.tokens) * self.period_seconds / self.capacity
+
+
+class DispatchGovernor:
+    """
+    提醒分发前的限流层：按分钟/小时的令牌桶限制提醒次数，并在免打扰时段内暂缓提醒。
+    超出限制或处于免打扰时段的提醒进入持久化的优先队列（按到期时间排序），
+    之后按令牌速率逐个放行，而不是一次性全部弹出。同一笔记在队列中只保留一条。
+    """
+
+    def __init__(self, per_minute=10, per_hour=120, quiet_hours=None, state_path=None):
+        self.buckets = [TokenBucket(per_minute, 60), TokenBucket(per_hour, 3600)]
+        self.quiet_hours = self._parse_quiet_hours(quiet_hours or [])
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        # 暂缓队列，元素为 (due_at, seq, filename, mode)
+        self._queue = []
+        self._queued = set()
+        self._seq = itertools.count()
+        self.stats = {"deferred": 0, "deferred_quiet": 0, "deferred_rate": 0, "released": 0, "merged": 0}
+        self._load()
+
+    @staticmethod
+    def _parse_quiet_hours(quiet_hours):
+        """将 [["22:00", "08:00"], ...] 解析为 [(开始分钟数, 结束分钟数), ...]"""
+        windows = []
+        for window in quiet_hours:
+            try:
+                start, end = (datetime.datetime.strptime(t, "%H:%M") for t in window)
+                windows.append((start.hour * 60 + start.minute, end.hour * 60 + end.minute))
+            except (TypeError, ValueError):
+                logger.warning(f"忽略无效的免打扰时段设置: {window}")
+        return windows
+
+    def quiet_until(self, now):
+        """处于免打扰时段时返回该时段的结束时间，否则返回 None"""
+        minute_of_day = now.hour * 60 + now.minute
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        for start, end in self.quiet_hours:
+            if start <= end:
+                if start <= minute_of_day < end:
+                    return midnight + datetime.timedelta(minutes=end)
+            elif minute_of_day >= start:  # 跨午夜的时段，当前处于午夜之前
+                return midnight + datetime.timedelta(days=1, minutes=end)
+            elif minute_of_day < end:  # 跨午夜的时段，当前处于午夜之后
+                return midnight + datetime.timedelta(minutes=end)
+        return None
+
+    def _has_token(self, now):
+        return all(bucket.has_token(now) for bucket in self.buckets)
+
+    def _take_token(self, now):
+        for bucket in self.buckets:
+            bucket.take(now)
+
+    def admit(self, reminders, now):
+        """
+        判断一次分发（单条提醒或一批合并提醒）能否立即执行。
+        不能执行时将其中的提醒放入暂缓队列并返回 False。
+        :param reminders: [(filename, mode), ...]
+        """
+        with self._lock:
+            quiet = self.quiet_until(now) is not None
+            # 队列中还有更早的提醒时，新的提醒排在其后，保证先到先出
+            if not quiet and not self._queue and self._has_token(now):
+                self._take_token(now)
+                return True
+
+            for filename, mode in reminders:
+                self._defer(filename, mode, now)
+            self.stats["deferred_quiet" if quiet else "deferred_rate"] += len(reminders)
+            self._save()
+            return False
+
+    def _defer(self, filename, mode, due_at):
+        """放入暂缓队列（调用方需持有锁）"""
+        self.stats["deferred"] += 1
+        if (filename, mode) in self._queued:
+            self.stats["merged"] += 1
+            return
+        self._queued.add((filename, mode))
+        heapq.heappush(self._queue, (due_at, next(self._seq), filename, mode))
+
+    def pop_ready(self, now):
+        """取出当前可以放行的暂缓提醒，每条消耗一个令牌"""
+        released = []
+        with self._lock:
+            if not self._queue or self.quiet_until(now) is not None:
+                return released
+            while self._queue and self._has_token(now):
+                self._take_token(now)
+                _, _, filename, mode = heapq.heappop(self._queue)
+                self._queued.discard((filename, mode))
+                released.append((filename, mode))
+            if released:
+                self.stats["released"] += len(released)
+                self._save()
+        return released
+
+    def seconds_until_ready(self, now):
+        """距离下一条暂缓提醒可以放行的秒数，队列为空时返回 None"""
+        with self._lock:
+            if not self._queue:
+                return None
+            quiet_end = self.quiet_until(now)
+            if quiet_end is not None:
+                return (quiet_end - now).total_seconds()
+            return max(bucket.seconds_until_token(now) for bucket in self.buckets)
+
+    def get_stats(self):
+        """返回暂缓队列深度和累计的暂缓/放行次数"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["queue_depth"] = len(self._queue)
+        return stats
+
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get("queue", [])
+            for due_at, filename, mode in entries:
+                self._defer(filename, mode, datetime.datetime.fromisoformat(due_at))
+            self.stats["deferred"] = 0
+            self.stats["merged"] = 0
+            if self._queue:
+                logger.info(f"已恢复 {len(self._queue)} 条暂缓的提醒。")
+        except (json.JSONDecodeError, IOError, ValueError, TypeError) as e:
+            logger.error(f"加载暂缓提醒队列失败: {e}")
+
+    def _save(self):
+        """持久化暂缓队列（调用方需持有锁）"""
+        if not self.state_path:
+            return
+        entries = [[due_at.isoformat(timespec="seconds"), filename, mode]
+                   for due_at, _, filename, mode in sorted(self._queue)]
+        tmp_path = self.state_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"queue": entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except IOError as e:
+            logger.error(f"保存暂缓提醒队列失败: {e}")
@@ -0,0 +1,101 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import queue
+import threading
+import time
+from loguru import logger
+
+
+class DispatchPool:
+    """
+    在调度线程之外执行提醒的工作线程池。
+    调度线程只负责把提醒放入有界队列；队列已满时最多等待 put_timeout 秒（背压），
+    仍无空位则丢弃该提醒并计数，保证调度线程不会被慢速的编辑器或通知卡住。
+    max_workers 为 0 时不创建线程，提醒在调用 submit 的线程中同步执行（用于模拟运行）。
+    """
+
+    def __init__(self, max_workers=4, max_queue=256, put_timeout=0.5):
+        self.max_workers = max(0, int(max_workers))
+        self.put_timeout = put_timeout
+        self.queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self.threads = []
+        self._lock = threading.Lock()
+        self.stats = {
+            "submitted": 0, "completed": 0, "failed": 0, "rejected": 0,
+            "max_queue_depth": 0, "total_latency": 0.0, "max_latency": 0.0,
+        }
+
+    def start(self):
+        """启动工作线程（已启动时不重复创建）"""
+        self.threads = [t for t in self.threads if t.is_alive()]
+        for i in range(len(self.threads), self.max_workers):
+            thread = threading.Thread(target=self._worker, name=f"dispatch-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=5):
+        """通知所有工作线程在处理完已入队的提醒后退出"""
+        for _ in self.threads:
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                break
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def submit(self, func, *args, **kwargs):
+        """
+        将一次提醒放入队列。
+        :return: 是否成功入队；队列持续已满时返回 False
+        """
+        if self.max_workers == 0:
+            with self._lock:
+                self.stats["submitted"] += 1
+            self._execute((time.monotonic(), func, args, kwargs))
+            return True
+
+        try:
+            self.queue.put((time.monotonic(), func, args, kwargs), timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self.stats["rejected"] += 1
+            logger.error(f"提醒队列已满（{self.queue.maxsize}），丢弃本次提醒: {args} {kwargs}")
+            return False
+
+        with self._lock:
+            self.stats["submitted"] += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue.qsize())
+        return True
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            self._execute(item)
+
+    def _execute(self, item):
+        enqueued_at, func, args, kwargs = item
+        failed = False
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            failed = True
+            logger.error(f"执行提醒失败: {e}")
+
+        # 延迟从入队开始计算，包含排队等待的时间
+        latency = time.monotonic() - enqueued_at
+        with self._lock:
+            self.stats["failed" if failed else "completed"] += 1
+            self.stats["total_latency"] += latency
+            self.stats["max_latency"] = max(self.stats["max_latency"], latency)
+
+    def get_stats(self):
+        """返回队列深度、提交/完成/失败/丢弃次数和单次提醒延迟（秒）"""
+        with self._lock:
+            stats = dict(self.stats)
+        finished = stats["completed"] + stats["failed"]
+        stats["queue_depth"] = self.queue.qsize()
+        stats["avg_latency"] = stats["total_latency"] / finished if finished else 0.0
+        return stats
@@ -0,0 +1,123 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import datetime
+import json
+import os
+import threading
+from loguru import logger
+
+
+class FireJournal:
+    """
+    只追加的提醒触发日志（JSON Lines），记录每个笔记最后一次触发的时间，
+    以及调度服务最后一次存活的时间，用于在休眠或停机后计算错过的提醒。
+    每行形如 {"note": "a.md", "at": "2025-01-01T10:30:00"} 或 {"alive": "..."}。
+    """
+
+    # 日志行数超过 有效记录数 * 2 + COMPACT_MIN_LINES 时压缩重写
+    COMPACT_MIN_LINES = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.last_fired = {}
+        self.last_alive = None
+        self._line_count = 0
+        self._file = None
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._line_count += 1
+                    try:
+                        entry = json.loads(line)
+                        if "alive" in entry:
+                            self.last_alive = datetime.datetime.fromisoformat(entry["alive"])
+                        else:
+                            self.last_fired[entry["note"]] = datetime.datetime.fromisoformat(entry["at"])
+                    except (ValueError, KeyError, TypeError):
+                        # 进程崩溃时最后一行可能只写了一半，忽略即可
+                        continue
+        except IOError as e:
+            logger.error(f"读取提醒触发日志失败: {e}")
+            return
+
+        # 存活时间至少不早于最后一次触发
+        if self.last_fired:
+            latest_fire = max(self.last_fired.values())
+            if self.last_alive is None or latest_fire > self.last_alive:
+                self.last_alive = latest_fire
+        logger.info(f"已加载提醒触发日志，共 {len(self.last_fired)} 个笔记的记录。")
+        self._compact_if_needed()
+
+    def get_last_fired(self, note_filename):
+        with self._lock:
+            return self.last_fired.get(note_filename)
+
+    def record(self, note_filename, when):
+        """记录一次提醒触发"""
+        with self._lock:
+            self.last_fired[note_filename] = when
+            if self.last_alive is None or when > self.last_alive:
+                self.last_alive = when
+            self._append({"note": note_filename, "at": when.isoformat(timespec="seconds")})
+
+    def record_many(self, note_filenames, when):
+        """批量记录多个笔记在同一时间触发，只写入一次文件"""
+        with self._lock:
+            for note_filename in note_filenames:
+                self.last_fired[note_filename] = when
+            if self.last_alive is None or when > self.last_alive:
+                self.last_alive = when
+            at = when.isoformat(timespec="seconds")
+            self._append(*({"note": note_filename, "at": at} for note_filename in note_filenames))
+
+    def touch(self, when):
+        """记录调度服务在 when 时仍在运行"""
+        with self._lock:
+            self.last_alive = when
+            self._append({"alive": when.isoformat(timespec="seconds")})
+
+    def _append(self, *entries):
+        """追加若干行日志（调用方需持有锁）"""
+        if not self.path or not entries:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+            self._file.flush()
+            self._line_count += len(entries)
+        except IOError as e:
+            logger.error(f"写入提醒触发日志失败: {e}")
+            return
+        self._compact_if_needed()
+
+    def close(self):
+        """关闭日志文件句柄（下次写入时会自动重新打开）"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _compact_if_needed(self):
+        """日志过长时只保留每个笔记的最新记录（调用方需持有锁或处于初始化阶段）"""
+        if self._line_count <= len(self.last_fired) * 2 + self.COMPACT_MIN_LINES:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for note, when in self.last_fired.items():
+                    f.write(json.dumps({"note": note, "at": when.isoformat(timespec="seconds")},
+                                       ensure_ascii=False) + "\n")
+                if self.last_alive is not None:
+                    f.write(json.dumps({"alive": self.last_alive.isoformat(timespec="seconds")}) + "\n")
+            self.close()
+            os.replace(tmp_path, self.path)
+            self._line_count = len(self.last_fired) + (1 if self.last_alive else 0)
+            logger.info(f"提醒触发日志已压缩，保留 {len(self.last_fired)} 条记录。")
+        except IOError as e:
+            logger.error(f"压缩提醒触发日志失败: {e}")
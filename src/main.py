@@ -1,5 +1,6 @@
 #!/user/bin/env python3
 # -*- coding: utf-8 -*-
+import multiprocessing
 import os
 import sys  # 导入 sys 模块
 
@@ -8,8 +9,13 @@ from loguru import logger
 
 # 导入我们自己的模块
 from config_manager import ConfigManager
-from note_manager import NoteManager
+from config_watcher import ConfigWatcher
+from note_identity import NoteIdentityIndex
+from note_manager import NoteManager, parse_note_sources
+from note_watcher import NoteWatcher
 from scheduler_service import SchedulerService
+from search_index import SearchIndex
+from thumbnails import ThumbnailCache
 from ui.app_main import App
 
 # --- 全局配置 ---
@@ -31,16 +37,54 @@ os.makedirs(os.path.dirname(log_path), exist_ok=True)
 logger.add(log_path, rotation="10 MB", retention="7 days", encoding="utf-8", level="INFO")
 
 if __name__ == "__main__":
+    # 打包为 exe 后，缩略图进程池的子进程需要由此进入
+    multiprocessing.freeze_support()
     logger.info("应用程序启动...")
 
     # 初始化核心组件
     config = ConfigManager(config_path='config.json')
-    notes = NoteManager(config.get_setting('data_folder'))
+    notes = NoteManager(
+        config.get_setting('data_folder'),
+        max_depth=config.get_setting('scan_max_depth', 0),
+        ignore_patterns=config.get_setting('scan_ignore_patterns', []),
+        workers=config.get_setting('scan_workers', 4),
+        sources=parse_note_sources(config.get_setting('note_sources', [])),
+        identities=NoteIdentityIndex(config.get_state_path('note_identity.json')),
+        index_path=config.get_state_path('scan_index.json'),
+        metadata_cache_path=config.get_state_path('metadata_cache.db'),
+        metadata_cache_size=config.get_setting('metadata_cache_size', 2048),
+        search_index=SearchIndex(config.get_state_path('search_index.db')),
+        thumbnails=ThumbnailCache(
+            config.get_state_path('thumbnails'),
+            size=config.get_setting('thumbnail_size', 128),
+            max_bytes=config.get_setting('thumbnail_cache_mb', 64) * 1024 * 1024,
+            workers=config.get_setting('thumbnail_workers', 2),
+        ),
+    )
     scheduler = SchedulerService(config, notes)
 
     # 启动后台调度服务
     scheduler.start()
 
-    # 创建并运行GUI
+    # 创建GUI
     app = App(config, notes, scheduler)
+
+    # 监视配置文件的外部修改，只把变化的部分推送给调度服务和界面
+    watcher = ConfigWatcher(config, config.get_setting('config_watch_interval', 2))
+    watcher.listeners.append(scheduler.apply_config_change)
+    watcher.listeners.append(lambda change: app.after(0, app.on_config_changed, change))
+    watcher.start()
+    app.watchers.append(watcher)
+
+    # 监视数据文件夹，笔记文件增删或重命名时增量更新列表
+    note_watcher = NoteWatcher(
+        notes,
+        backend=config.get_setting('notes_watch', 'auto'),
+        debounce=config.get_setting('notes_watch_debounce', 0.5),
+        interval=config.get_setting('notes_watch_interval', 2),
+    )
+    note_watcher.listeners.append(lambda changes: app.after(0, app.on_notes_changed, changes))
+    note_watcher.start()
+    app.watchers.append(note_watcher)
+
     app.mainloop()
@@ -0,0 +1,185 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import NamedTuple
+from loguru import logger
+
+
+class NoteIdentity(NamedTuple):
+    """已设置调度的笔记的身份：文件 ID 在重命名和移动（同一磁盘内）后不变，内容指纹在复制或另存后不变"""
+    type: str
+    size: int
+    mtime: float
+    file_id: tuple  # (st_dev, st_ino)
+    fingerprint: str  # 文件内容的 SHA-256
+
+
+@dataclass
+class ScheduleMatches:
+    """NoteIdentityIndex.reconcile 的结果"""
+    renamed: list = field(default_factory=list)  # [(旧笔记名, 新笔记名)]，调度应随之迁移
+    dangling: list = field(default_factory=list)  # 文件已不存在、也找不到对应新文件的调度
+
+    def __bool__(self):
+        return bool(self.renamed or self.dangling)
+
+
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class NoteIdentityIndex:
+    """
+    记录每个已设置调度的笔记的文件 ID 和内容指纹（note_identity.json，与 config.json 同目录），
+    用于在笔记被重命名或移动后（包括程序未运行期间）找回它的调度。
+    只有 (修改时间, 大小) 变化过的笔记才重新计算指纹。
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+
+    def _load(self):
+        """调用方需持有锁"""
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != self.VERSION:
+                return
+            for name, (note_type, size, mtime, file_id, fingerprint) in data["notes"].items():
+                self._entries[name] = NoteIdentity(note_type, size, mtime, tuple(file_id), fingerprint)
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.warning(f"读取笔记身份索引失败: {e}")
+            self._entries = {}
+
+    def _save(self):
+        """调用方需持有锁"""
+        if not self.path or not self._dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": self.VERSION, "notes": self._entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"保存笔记身份索引失败: {e}")
+
+    @staticmethod
+    def _identify(record, path):
+        """读取文件 ID 并计算内容指纹，文件无法读取时返回 None"""
+        try:
+            stat = os.stat(path)
+            return NoteIdentity(record.type, record.size, record.mtime, (stat.st_dev, stat.st_ino),
+                                file_fingerprint(path))
+        except OSError as e:
+            logger.warning(f"读取笔记 '{record.name}' 的身份信息失败: {e}")
+            return None
+
+    def reconcile(self, records, scheduled, get_path, is_available=None):
+        """
+        更新已设置调度的笔记的身份，并为文件已不存在的调度找到对应的新文件。
+        以文件 ID 和 (大小, 内容指纹) 为键各做一次哈希连接，每个笔记只查一次字典：
+        先按文件 ID 匹配（重命名、移动后内容又被修改也能找回），
+        再对大小与某个失效调度相同的笔记计算指纹，按内容匹配（跨磁盘移动、另存为后删除原文件）。
+        内容相同的笔记不止一对时无法区分，不做匹配。
+        :param records: 当前全部笔记的 NoteRecord
+        :param scheduled: 已设置调度的笔记名集合
+        :param get_path: get_path(笔记名) 返回笔记的绝对路径
+        :param is_available: is_available(笔记名) 为 False 时说明笔记所在的文件夹暂时不可用（如移动硬盘未连接），
+                             不把它的调度视为失效
+        :return: ScheduleMatches
+        """
+        current = {record.name: record for record in records}
+        with self._lock:
+            self._load()
+            entries = self._entries
+            for name in scheduled:
+                record = current.get(name)
+                if record is None:
+                    continue
+                entry = entries.get(name)
+                if entry is None or (entry.type, entry.size, entry.mtime) != (record.type, record.size, record.mtime):
+                    identity = self._identify(record, get_path(name))
+                    if identity is not None:
+                        entries[name] = identity
+                        self._dirty = True
+
+            matches = ScheduleMatches()
+            orphans = [name for name in scheduled if name not in current
+                       and (is_available is None or is_available(name))]
+            unknown = [name for name in orphans if name not in entries]
+            orphans = [name for name in orphans if name in entries]
+            candidates = [record for name, record in current.items() if name not in scheduled]
+            if orphans and candidates:
+                matches.renamed = self._match(orphans, candidates, get_path)
+            matched = {old_name for old_name, _ in matches.renamed}
+            matches.dangling = sorted(unknown + [name for name in orphans if name not in matched])
+
+            for old_name, new_name in matches.renamed:
+                entries[new_name] = entries.pop(old_name)
+                self._dirty = True
+            # 不再设置调度的笔记不必记录
+            keep = set(scheduled) | {new_name for _, new_name in matches.renamed}
+            for name in [name for name in entries if name not in keep]:
+                del entries[name]
+                self._dirty = True
+            self._save()
+        return matches
+
+    def _match(self, orphans, candidates, get_path):
+        """调用方需持有锁。返回 [(旧笔记名, 新笔记名)]"""
+        entries = self._entries
+        by_file_id = {entries[name].file_id: name for name in orphans}
+        renamed, remaining = [], []
+        for record in candidates:
+            try:
+                stat = os.stat(get_path(record.name))
+            except (OSError, TypeError):
+                continue
+            old_name = by_file_id.pop((stat.st_dev, stat.st_ino), None)
+            # 文件 ID 可能被删除后新建的文件复用，类型不同时不认为是同一个笔记
+            if old_name is not None and entries[old_name].type == record.type:
+                renamed.append((old_name, record.name))
+            else:
+                remaining.append(record)
+
+        matched = {old_name for old_name, _ in renamed}
+        by_content = {}
+        for name in orphans:
+            if name not in matched:
+                entry = entries[name]
+                by_content.setdefault((entry.type, entry.size, entry.fingerprint), []).append(name)
+        sizes = {key[1] for key in by_content}
+        found = {}
+        for record in remaining:
+            if record.size not in sizes:
+                continue
+            try:
+                key = (record.type, record.size, file_fingerprint(get_path(record.name)))
+            except (OSError, TypeError):
+                continue
+            if key in by_content:
+                found.setdefault(key, []).append(record.name)
+        for key, new_names in found.items():
+            old_names = by_content[key]
+            if len(old_names) == 1 and len(new_names) == 1:
+                renamed.append((old_names[0], new_names[0]))
+        return renamed
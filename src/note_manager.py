@@ -1,37 +1,536 @@
 #!/user/bin/env python3
 # -*- coding: utf-8 -*-
+import fnmatch
 import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from operator import attrgetter
+from typing import NamedTuple
 from loguru import logger
 
+from note_identity import ScheduleMatches
+from note_metadata import MetadataCache
+from scan_index import ScanIndex
+
+
+class NoteRecord(NamedTuple):
+    """扫描得到的笔记文件信息，时间戳在扫描时一并读取，排序时不再访问磁盘"""
+    # 笔记名：来源前缀 + 相对来源文件夹的路径（'/' 分隔），主数据文件夹中的笔记没有前缀，顶层笔记即文件名
+    name: str
+    type: str  # 'markdown' 或 'image'
+    size: int
+    ctime: float
+    mtime: float
+
+
+@dataclass
+class NoteChanges:
+    """一批笔记文件的变化，由 NoteWatcher 产生，NoteManager 和界面据此增量更新"""
+    added: list = field(default_factory=list)    # NoteRecord
+    removed: list = field(default_factory=list)  # 笔记名
+    renamed: list = field(default_factory=list)  # (旧笔记名, 新的 NoteRecord)
+    updated: list = field(default_factory=list)  # 内容或大小变化的 NoteRecord
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.renamed or self.updated)
+
+
+class NoteSource(NamedTuple):
+    """
+    一个笔记来源（文件夹）。name 为空表示主数据文件夹（data_folder 设置项），其中的笔记名不带前缀；
+    其余来源的笔记名形如 "工作:周报/第一周.md"，因此不同文件夹中的同名文件在 notes_schedule 中不会冲突。
+    """
+    name: str
+    path: str
+    include: tuple = ()  # 只收录匹配的文件（fnmatch 通配符，匹配文件名或相对路径），为空表示全部收录
+    exclude: tuple = ()  # 在 scan_ignore_patterns 之外另行跳过的文件或文件夹
+
+    @property
+    def prefix(self):
+        return f"{self.name}:" if self.name else ""
+
+
+def parse_note_sources(entries):
+    """
+    将 note_sources 设置项（[{"name": "工作", "path": "D:/work", "include": [...], "exclude": [...]}]）
+    转换为 NoteSource 列表，跳过无效或重名的条目。
+    """
+    sources, names = [], set()
+    for entry in entries or []:
+        if not isinstance(entry, dict):
+            logger.warning(f"笔记来源配置无效: {entry!r}")
+            continue
+        name, path = entry.get("name"), entry.get("path")
+        if not isinstance(name, str) or not name or any(c in name for c in ':/\\') \
+                or not isinstance(path, str) or not path:
+            logger.warning(f"笔记来源需要不含 ':'、'/' 的名称和文件夹路径: {entry!r}")
+            continue
+        if name in names:
+            logger.warning(f"笔记来源名称重复，已忽略: {name}")
+            continue
+        names.add(name)
+        sources.append(NoteSource(name, path, tuple(entry.get("include") or ()), tuple(entry.get("exclude") or ())))
+    return sources
+
+
+def resolve_note_path(data_folder, note_name):
+    """
+    将笔记的相对路径转换为绝对路径。
+    相对路径为绝对路径或指向数据文件夹之外（如 '../x.md'，或 Windows 上带盘符的 'C:x.md'）时返回 None。
+    """
+    # 同一盘符的 'C:x.md' 会被拼接到数据文件夹之内，但指向的已不是笔记名所表示的文件
+    if not data_folder or not note_name or os.path.isabs(note_name) or os.path.splitdrive(note_name)[0]:
+        return None
+    root = os.path.abspath(data_folder)
+    file_path = os.path.normpath(os.path.join(root, *note_name.split("/")))
+    try:
+        inside = os.path.commonpath([root, file_path]) == root
+    except ValueError:
+        # Windows 上两个路径位于不同的盘符
+        return None
+    if not inside or file_path == root:
+        return None
+    return file_path
+
 
 class NoteManager:
     """负责扫描和管理数据文件夹中的笔记文件"""
     SUPPORTED_IMG_EXTS = ['.png', '.jpg', '.jpeg', '.gif', '.bmp']
     SUPPORTED_MD_EXTS = ['.md', '.markdown']
+    # 可用的排序方式
+    SORT_KEYS = {
+        "ctime": attrgetter("ctime"),
+        "mtime": attrgetter("mtime"),
+        "name": attrgetter("name"),
+        "size": attrgetter("size"),
+    }
+
+    # 修改时间距扫描时不足这么多秒的文件夹不写入索引：文件系统的时间精度有限（如 FAT 为 2 秒），
+    # 同一时间单位内的后续修改不会改变文件夹的修改时间
+    RACY_SECONDS = 2
 
-    def __init__(self, data_folder):
+    def __init__(self, data_folder, max_depth=0, ignore_patterns=(), workers=4, index_path=None,
+                 metadata_cache_path=None, metadata_cache_size=2048, thumbnails=None, search_index=None,
+                 sources=(), identities=None):
+        """
+        :param data_folder: 主数据文件夹，其中的笔记名不带来源前缀
+        :param max_depth: 向下扫描的子文件夹层数，0 表示只扫描数据文件夹本身
+        :param ignore_patterns: 要跳过的文件或文件夹（fnmatch 通配符，匹配名称或相对路径）
+        :param workers: 并行遍历子文件夹的线程数，1 表示在当前线程中顺序扫描
+        :param index_path: 扫描索引的保存路径，None 表示不持久化
+        :param metadata_cache_path: 笔记元数据缓存数据库的路径，None 表示只缓存在内存中
+        :param metadata_cache_size: 内存中最多缓存的元数据条数
+        :param thumbnails: 图片笔记的 ThumbnailCache，None 表示不生成缩略图
+        :param search_index: Markdown 笔记的 SearchIndex，None 表示不建立全文索引
+        :param sources: 主数据文件夹之外的 NoteSource 列表，与主数据文件夹同时扫描并合并到 notes 中
+        :param identities: 已设置调度的笔记的 NoteIdentityIndex，None 表示不追踪重命名
+        """
         self.data_folder = data_folder
+        self.extra_sources = sources
+        self.max_depth = max_depth
+        self.ignore_patterns = list(ignore_patterns)
+        self.workers = workers
         self.notes = []
+        # 监视线程通过 apply_changes 修改 notes，与 scan_notes 互斥
+        self._lock = threading.RLock()
+        self._sort = ("ctime", False)
+        self.index = ScanIndex(index_path, NoteRecord)
+        # 上一次遍历的结果，下一次遍历时跳过修改时间未变化的文件夹
+        self._dirs = {}
+        self._dirs_key = None
+        self._index_dirty = False
+        self.metadata = MetadataCache(metadata_cache_path, metadata_cache_size)
+        self.thumbnails = thumbnails
+        self.search_index = search_index
+        self.identities = identities
+        self._by_name = {}
+        self._by_name_source = None
 
-    def scan_notes(self):
-        """扫描数据文件夹，加载所有支持的笔记文件"""
-        self.notes = []
-        if not self.data_folder or not os.path.isdir(self.data_folder):
+    @property
+    def extra_sources(self):
+        return self._extra_sources
+
+    @extra_sources.setter
+    def extra_sources(self, sources):
+        self._extra_sources = tuple(sources)
+        # 按名称查找来源，解析笔记路径时不必逐个检查各文件夹
+        self._sources_by_name = {source.name: source for source in self._extra_sources}
+
+    @property
+    def sources(self):
+        """所有笔记来源：主数据文件夹（已设置时）在前，其余来源按配置顺序"""
+        primary = (NoteSource("", self.data_folder),) if self.data_folder else ()
+        return primary + self._extra_sources
+
+    def split_note_name(self, note_name):
+        """
+        将笔记名拆分为 (NoteSource, 来源内的相对路径)。
+        前缀不是已配置的来源名称时视为主数据文件夹中的笔记；主数据文件夹未设置时来源为 None。
+        """
+        name, sep, rel_path = note_name.partition(":")
+        if sep and "/" not in name:
+            source = self._sources_by_name.get(name)
+            if source is not None:
+                return source, rel_path
+        return (NoteSource("", self.data_folder) if self.data_folder else None), note_name
+
+    def scan_notes(self, sort_by="ctime", reverse=False):
+        """
+        扫描所有笔记来源（及 max_depth 层以内的子文件夹），加载所有支持的笔记文件。
+        每个文件夹只遍历一次：文件类型来自目录项本身，大小和时间戳来自同一次 stat；
+        各来源的根文件夹和同级的子文件夹提交到线程池并行遍历。
+        :param sort_by: 排序方式，见 SORT_KEYS，默认按创建时间升序
+        :return: NoteRecord 列表
+        """
+        sources = [source for source in self.sources if os.path.isdir(source.path)]
+        if not sources:
             logger.warning(f"数据文件夹 '{self.data_folder}' 不存在或未设置。")
+            with self._lock:
+                self.notes = []
+            return []
+        for source in self.sources:
+            if source not in sources:
+                logger.warning(f"笔记来源 '{source.name or source.path}' 的文件夹不存在: {source.path}")
+
+        logger.info(f"开始扫描笔记文件夹: {', '.join(source.path for source in sources)}")
+        notes = self.sort_notes(self.walk(use_cache=False), sort_by, reverse)
+        with self._lock:
+            self.notes = notes
+            self._sort = (sort_by, reverse)
+        self.save_index()
+        self.metadata.prune(record.name for record in notes)
+        self._request_search_sync()
+        logger.info(f"扫描完成，共找到 {len(notes)} 个笔记。")
+        return notes
+
+    def _index_key(self):
+        return ScanIndex.make_key(self.sources, self.max_depth, self.ignore_patterns)
+
+    def load_index(self, sort_by="ctime", reverse=False):
+        """
+        用上一次保存的扫描索引填充 notes，不遍历数据文件夹（启动时立即显示列表）。
+        :return: NoteRecord 列表；没有与当前扫描参数匹配的索引时返回 None
+        """
+        if not self.sources:
+            return None
+        key = self._index_key()
+        dirs = self.index.load(key)
+        if dirs is None:
+            return None
+        notes = self.sort_notes((record for _, records, _ in dirs.values() for record in records), sort_by, reverse)
+        with self._lock:
+            self._dirs, self._dirs_key = dirs, key
+            self.notes = notes
+            self._sort = (sort_by, reverse)
+        logger.info(f"已从扫描索引载入 {len(notes)} 个笔记。")
+        return notes
+
+    def save_index(self):
+        """上一次遍历有变化时保存扫描索引"""
+        with self._lock:
+            if not self._index_dirty or self._dirs_key is None:
+                return
+            dirs, key = self._dirs, self._dirs_key
+            self._index_dirty = False
+        self.index.save(key, dirs)
+
+    def revalidate(self):
+        """
+        重新遍历（修改时间未变化的文件夹直接沿用上次的结果）并把差异应用到 notes 上，然后保存索引。
+        :return: 实际生效的 NoteChanges
+        """
+        changes = self.apply_changes(self.diff_notes(self.walk()))
+        self.save_index()
+        # 即使列表没有变化，也要确认全文索引与上次退出时一致
+        self._request_search_sync()
+        return changes
+
+    def walk(self, use_cache=True):
+        """
+        遍历所有笔记来源，返回未排序的 NoteRecord 列表（不修改 notes）。
+        修改时间与上一次遍历相同的文件夹不再列目录，直接使用上次的记录；
+        因此文件夹中已有文件的内容修改不会在这里发现（由 NoteWatcher 的系统通知或手动刷新负责）。
+        :param use_cache: False 表示重新列出所有文件夹（手动刷新）
+        """
+        root_tasks = [(source, source.path, source.prefix, 0) for source in self.sources
+                      if os.path.isdir(source.path)]
+        if not root_tasks:
             return []
+        key = self._index_key()
+        with self._lock:
+            cached = self._dirs if use_cache and self._dirs_key == key else {}
+        racy_after_ns = int((time.time() - self.RACY_SECONDS) * 1e9)
+        found, dirs, rescanned = [], {}, 0
+
+        def collect(result):
+            nonlocal rescanned
+            rel_prefix, entry, subdirs, from_cache = result
+            if entry is not None:
+                dirs[rel_prefix] = entry
+                found.extend(entry[1])
+            rescanned += not from_cache
+            return subdirs
+
+        if self.workers <= 1 or self.max_depth <= 0 and len(root_tasks) == 1:
+            pending = root_tasks
+            while pending:
+                pending.extend(collect(self._scan_dir(*pending.pop(), cached, racy_after_ns)))
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="note-scan") as executor:
+                futures = {executor.submit(self._scan_dir, *task, cached, racy_after_ns) for task in root_tasks}
+                while futures:
+                    done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        futures.update(executor.submit(self._scan_dir, *task, cached, racy_after_ns)
+                                       for task in collect(future.result()))
+
+        with self._lock:
+            if rescanned or dirs.keys() != cached.keys():
+                self._index_dirty = True
+            self._dirs, self._dirs_key = dirs, key
+        return found
+
+    def stat_note(self, note_name):
+        """
+        读取单个笔记的当前信息（监视到文件变化时使用）。
+        文件不存在、类型不支持、超出扫描深度或不符合来源的收录、忽略规则时返回 None。
+        """
+        source, rel_path = self.split_note_name(note_name)
+        note_type = self.get_note_type(note_name)
+        parts = rel_path.split("/")
+        if source is None or note_type == 'unknown' or len(parts) - 1 > max(self.max_depth, 0):
+            return None
+        for i, part in enumerate(parts):
+            if self._is_ignored(source, part, "/".join(parts[:i + 1])):
+                return None
+        if not self._is_included(source, parts[-1], rel_path):
+            return None
+        file_path = resolve_note_path(source.path, rel_path)
+        try:
+            if not file_path or not os.path.isfile(file_path):
+                return None
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return NoteRecord(note_name, note_type, stat.st_size, stat.st_ctime, stat.st_mtime)
+
+    def diff_notes(self, records):
+        """
+        将一次完整遍历的结果与当前 notes 比较，返回 NoteChanges。
+        大小和修改时间都相同的 "一删一增" 视为重命名（移动文件不会改变这两项）。
+        """
+        with self._lock:
+            current = {record.name: record for record in self.notes}
+        latest = {record.name: record for record in records}
+        changes = NoteChanges()
+        removed = {}
+        for name, record in current.items():
+            if name not in latest:
+                removed.setdefault((record.type, record.size, record.mtime), []).append(name)
+        for name, record in latest.items():
+            old = current.get(name)
+            if old is None:
+                candidates = removed.get((record.type, record.size, record.mtime))
+                if candidates:
+                    changes.renamed.append((candidates.pop(), record))
+                else:
+                    changes.added.append(record)
+            elif old != record:
+                changes.updated.append(record)
+        changes.removed = [name for names in removed.values() for name in names]
+        return changes
+
+    def apply_changes(self, changes):
+        """
+        将 NoteChanges 应用到 notes 上并保持当前排序方式。
+        :return: 实际生效的 NoteChanges（已反映在 notes 中的变化会被过滤掉）
+        """
+        with self._lock:
+            index = {record.name: record for record in self.notes}
+            effective = NoteChanges()
+            for name in changes.removed:
+                if index.pop(name, None) is not None:
+                    effective.removed.append(name)
+            for old_name, record in changes.renamed:
+                if old_name in index and record.name not in index:
+                    del index[old_name]
+                    index[record.name] = record
+                    effective.renamed.append((old_name, record))
+                elif record.name not in index:
+                    index[record.name] = record
+                    effective.added.append(record)
+            for record in changes.added:
+                if record.name not in index:
+                    index[record.name] = record
+                    effective.added.append(record)
+                elif index[record.name] != record:
+                    index[record.name] = record
+                    effective.updated.append(record)
+            for record in changes.updated:
+                if record.name in index and index[record.name] != record:
+                    index[record.name] = record
+                    effective.updated.append(record)
+            if effective:
+                self.notes = self.sort_notes(index.values(), *self._sort)
+                self._request_search_sync()
+            return effective
+
+    @staticmethod
+    def _matches(patterns, name, rel_path):
+        return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern) for pattern in patterns)
+
+    def _is_ignored(self, source, name, rel_path):
+        """rel_path 为来源内的相对路径（不含来源前缀）"""
+        return self._matches(self.ignore_patterns, name, rel_path) or self._matches(source.exclude, name, rel_path)
+
+    @classmethod
+    def _is_included(cls, source, name, rel_path):
+        return not source.include or cls._matches(source.include, name, rel_path)
+
+    def _scan_dir(self, source, dir_path, rel_prefix, depth, cached, racy_after_ns):
+        """
+        遍历单个文件夹（可在工作线程中调用）。
+        :param rel_prefix: 笔记名前缀，即来源前缀 + 文件夹在来源内的相对路径
+        :param cached: 上一次遍历的文件夹字典，修改时间相同时直接沿用
+        :param racy_after_ns: 修改时间晚于此刻的文件夹不可靠，不记录修改时间
+        :return: (笔记名前缀, (修改时间, [NoteRecord], [子文件夹前缀]) 或 None,
+                  待遍历的子文件夹 [(来源, 绝对路径, 笔记名前缀, 深度)], 是否来自缓存)
+        """
+        source_prefix = source.prefix
+        has_ignore_rules = bool(self.ignore_patterns or source.exclude)
+        try:
+            dir_mtime = os.stat(dir_path).st_mtime_ns
+        except OSError as e:
+            logger.error(f"扫描文件夹 '{dir_path}' 失败: {e}")
+            return rel_prefix, None, [], False
+        cached_entry = cached.get(rel_prefix)
+        if cached_entry is not None and cached_entry[0] is not None and cached_entry[0] == dir_mtime:
+            subdirs = [(source, os.path.join(source.path, *prefix[len(source_prefix):].rstrip("/").split("/")),
+                        prefix, depth + 1)
+                       for prefix in cached_entry[2]]
+            return rel_prefix, cached_entry, subdirs, True
+
+        records, subdirs = [], []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    rel_path = rel_prefix + entry.name
+                    source_rel_path = rel_path[len(source_prefix):]
+                    if has_ignore_rules and self._is_ignored(source, entry.name, source_rel_path):
+                        continue
+                    try:
+                        if depth < self.max_depth and entry.is_dir(follow_symlinks=False):
+                            # 不跟随符号链接，避免链接成环时无限递归
+                            subdirs.append((source, entry.path, rel_path + "/", depth + 1))
+                            continue
+                        note_type = self.get_note_type(entry.name)
+                        if note_type == 'unknown' or not self._is_included(source, entry.name, source_rel_path) \
+                                or not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError as e:
+                        # 文件在扫描过程中被删除或无权访问
+                        logger.warning(f"读取笔记文件 '{rel_path}' 的信息失败: {e}")
+                        continue
+                    records.append(NoteRecord(rel_path, note_type, stat.st_size, stat.st_ctime, stat.st_mtime))
+        except OSError as e:
+            logger.error(f"扫描文件夹 '{dir_path}' 失败: {e}")
+            return rel_prefix, None, [], False
+        dir_entry = (dir_mtime if dir_mtime < racy_after_ns else None, records, [task[2] for task in subdirs])
+        return rel_prefix, dir_entry, subdirs, False
+
+    def sort_notes(self, notes, sort_by="ctime", reverse=False):
+        """按 SORT_KEYS 中的方式对 NoteRecord 列表排序（返回新列表，不访问磁盘）"""
+        if sort_by not in self.SORT_KEYS:
+            raise ValueError(f"不支持的排序方式: {sort_by}")
+        return sorted(notes, key=self.SORT_KEYS[sort_by], reverse=reverse)
+
+    def get_record(self, note_name):
+        """返回当前 notes 中的 NoteRecord，不存在时返回 None"""
+        with self._lock:
+            if self._by_name_source is not self.notes:
+                self._by_name = {record.name: record for record in self.notes}
+                self._by_name_source = self.notes
+            return self._by_name.get(note_name)
+
+    def note_names(self):
+        """返回当前全部笔记名的集合（加锁时取得的快照，之后 notes 的变化不会反映到其中）"""
+        with self._lock:
+            notes = self.notes
+        return {record.name for record in notes}
+
+    def get_metadata(self, note_name):
+        """
+        返回笔记的 NoteMetadata（标题、字数、预览或图片尺寸、格式），读取失败时返回 None。
+        文件的修改时间和大小未变化时直接使用缓存，不打开文件。
+        """
+        record = self.get_record(note_name) or self.stat_note(note_name)
+        if record is None:
+            return None
+        return self.metadata.get(record, lambda: self.get_note_path(note_name))
+
+    def get_thumbnail(self, note_name, callback=None, timeout=None):
+        """
+        返回图片笔记的缩略图路径；尚未生成时在后台进程中生成并返回 None，
+        完成后调用 callback(缩略图路径)（在后台线程中）。参数含义见 ThumbnailCache.get。
+        """
+        if self.thumbnails is None:
+            return None
+        record = self.get_record(note_name) or self.stat_note(note_name)
+        if record is None or record.type != 'image':
+            return None
+        return self.thumbnails.get(record, lambda: self.get_note_path(note_name), callback, timeout)
+
+    def _request_search_sync(self):
+        """让全文索引在后台与当前 notes 同步（只重新读取变化过的笔记）"""
+        if self.search_index is not None:
+            with self._lock:
+                notes = self.notes
+            self.search_index.request_sync(notes, self.get_note_path)
+
+    def search(self, query, limit=100):
+        """
+        在笔记名以及 Markdown 笔记的标题和内容中搜索，返回按相关度排序的笔记名。
+        全文索引不可用时退回到按笔记名匹配（不区分大小写）。
+        """
+        results = self.search_index.search(query, limit) if self.search_index is not None else None
+        if results is not None:
+            return results
+        query = query.strip().lower()
+        with self._lock:
+            return [record.name for record in self.notes if query in record.name.lower()][:limit]
+
+    def reconcile_schedules(self, scheduled):
+        """
+        为文件已不存在的调度找到被重命名或移动后的笔记（可能读取文件内容，应在后台线程中调用）。
+        所在来源文件夹暂时不可用的笔记不视为失效。
+        :param scheduled: 已设置调度的笔记名集合
+        :return: ScheduleMatches
+        """
+        if self.identities is None:
+            return ScheduleMatches()
+        with self._lock:
+            notes = self.notes
+        return self.identities.reconcile(notes, set(scheduled), self.get_note_path, self._is_source_available)
+
+    def _is_source_available(self, note_name):
+        source, _ = self.split_note_name(note_name)
+        return source is not None and os.path.isdir(source.path)
 
-        logger.info(f"开始扫描笔记文件夹: {self.data_folder}")
-        for filename in os.listdir(self.data_folder):
-            file_path = os.path.join(self.data_folder, filename)
-            if os.path.isfile(file_path):
-                _, ext = os.path.splitext(filename)
-                if ext.lower() in self.SUPPORTED_MD_EXTS or ext.lower() in self.SUPPORTED_IMG_EXTS:
-                    self.notes.append(filename)
+    def close(self):
+        """关闭元数据缓存、缩略图进程池和全文索引（退出程序前调用）"""
+        self.metadata.close()
+        if self.thumbnails is not None:
+            self.thumbnails.close()
+        if self.search_index is not None:
+            self.search_index.close()
 
-        # 根据文件的创建时间进行升序排序
-        self.notes.sort(key=lambda f: os.path.getctime(os.path.join(self.data_folder, f)))
-        logger.info(f"扫描完成，共找到 {len(self.notes)} 个笔记。")
-        return self.notes
+    def get_note_path(self, note_name):
+        """返回笔记在其来源文件夹中的绝对路径（按前缀直接定位来源，不检查其他文件夹），路径无效时返回 None"""
+        source, rel_path = self.split_note_name(note_name)
+        return resolve_note_path(source.path, rel_path) if source is not None else None
 
     def get_note_type(self, filename):
         """根据文件名后缀判断笔记类型"""
@@ -40,4 +539,4 @@ class NoteManager:
             return 'markdown'
         elif ext.lower() in self.SUPPORTED_IMG_EXTS:
             return 'image'
-        return 'unknown'
\ No newline at end of file
+        return 'unknown'
@@ -0,0 +1,195 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from loguru import logger
+from PIL import Image, UnidentifiedImageError
+
+# 只读取 Markdown 文件的前这么多字节，超大的文件字数按这部分统计
+MAX_TEXT_BYTES = 1024 * 1024
+PREVIEW_CHARS = 80
+
+# 中日韩文字按字计数，其余按连续的字母数字计数
+CJK_RANGES = r"\u3400-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af"
+_WORD_RE = re.compile(rf"[{CJK_RANGES}]|[^\W_{CJK_RANGES}]+(?:['’-][^\W_{CJK_RANGES}]+)*")
+_MARKUP_RE = re.compile(r"!?\[([^\]]*)\]\([^)]*\)|[*_`~>#|]+")
+
+
+class NoteMetadata(NamedTuple):
+    """笔记的元数据；Markdown 笔记只有 title/words/preview，图片笔记只有 width/height/format"""
+    title: Optional[str] = None
+    words: Optional[int] = None
+    preview: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    format: Optional[str] = None
+
+    def describe(self):
+        """一行文字的摘要，用于列表旁的信息栏和提醒通知"""
+        if self.format:
+            if self.width and self.height:
+                return f"{self.format} 图片 {self.width}×{self.height}"
+            return f"{self.format} 图片"
+        parts = [part for part in (self.title, f"{self.words} 字" if self.words is not None else None) if part]
+        return " · ".join(parts)
+
+
+def _plain(line):
+    """去掉一行 Markdown 中的常见标记，只保留文字"""
+    return " ".join(_MARKUP_RE.sub(lambda m: m.group(1) or "", line).split())
+
+
+def extract_markdown(file_path):
+    """读取 Markdown 笔记的标题（第一个标题或第一行非空文字）、字数和开头的预览"""
+    with open(file_path, 'rb') as f:
+        text = f.read(MAX_TEXT_BYTES).decode('utf-8-sig', errors='replace')
+    lines = text.splitlines()
+    # 跳过 YAML front matter
+    if lines and lines[0].strip() == "---":
+        for i, line in enumerate(lines[1:], start=1):
+            if line.strip() in ("---", "..."):
+                lines = lines[i + 1:]
+                break
+
+    title, title_index = None, None
+    for i, line in enumerate(lines):
+        if line.lstrip().startswith("#"):
+            title, title_index = _plain(line.strip().strip("#")), i
+            break
+    if not title:
+        for i, line in enumerate(lines):
+            if line.strip():
+                title, title_index = _plain(line)[:PREVIEW_CHARS], i
+                break
+
+    body = lines[title_index + 1:] if title_index is not None else lines
+    preview = ""
+    for line in body:
+        if line.strip():
+            preview = (preview + " " + _plain(line)).strip()
+            if len(preview) >= PREVIEW_CHARS:
+                break
+    if len(preview) > PREVIEW_CHARS:
+        preview = preview[:PREVIEW_CHARS - 1] + "…"
+    words = len(_WORD_RE.findall(_MARKUP_RE.sub(lambda m: m.group(1) or " ", "\n".join(lines))))
+    return NoteMetadata(title=title or None, words=words, preview=preview)
+
+
+def extract_image(file_path):
+    """只读取图片文件头得到尺寸和格式，不解码像素"""
+    with Image.open(file_path) as image:
+        width, height = image.size
+        return NoteMetadata(width=width, height=height, format=image.format)
+
+
+class MetadataCache:
+    """
+    笔记元数据缓存：内存中保留最近使用的 capacity 条（LRU），
+    磁盘上保存在 SQLite 数据库中（metadata_cache.db，与 config.json 同目录）。
+    两级缓存都以 (笔记名, 修改时间, 大小) 为键，文件变化后自动重新读取，未变化的文件不再打开。
+    """
+
+    def __init__(self, path=None, capacity=2048):
+        """:param path: 数据库路径，None 表示只使用内存缓存"""
+        self.path = path
+        self.capacity = capacity
+        self._lock = threading.RLock()
+        self._lru = OrderedDict()
+        self._conn = None
+        if path:
+            try:
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS metadata ("
+                    "filename TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL, data TEXT NOT NULL)")
+            except sqlite3.Error as e:
+                logger.warning(f"打开笔记元数据缓存 '{path}' 失败，将只使用内存缓存: {e}")
+                self._conn = None
+
+    def get(self, record, get_path):
+        """
+        返回 NoteRecord 对应笔记的元数据，缓存中没有或已过期时读取文件。
+        :param get_path: 返回笔记文件路径的函数，只在需要读取文件时调用
+        :return: NoteMetadata，文件无法读取时返回 None
+        """
+        key = (record.name, record.mtime, record.size)
+        with self._lock:
+            metadata = self._lru.get(key)
+            if metadata is not None:
+                self._lru.move_to_end(key)
+                return metadata
+            metadata = self._load(key)
+        if metadata is None:
+            metadata = self._extract(record, get_path())
+            if metadata is None:
+                return None
+            self._store(key, metadata)
+        with self._lock:
+            self._lru[key] = metadata
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+        return metadata
+
+    def _extract(self, record, file_path):
+        if not file_path:
+            return None
+        try:
+            if record.type == 'markdown':
+                return extract_markdown(file_path)
+            if record.type == 'image':
+                return extract_image(file_path)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+            logger.warning(f"读取笔记 '{record.name}' 的元数据失败: {e}")
+        return None
+
+    def _load(self, key):
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute(
+                "SELECT data FROM metadata WHERE filename = ? AND mtime = ? AND size = ?", key).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取笔记元数据缓存失败: {e}")
+            return None
+        return NoteMetadata(*json.loads(row[0])) if row else None
+
+    def _store(self, key, metadata):
+        if self._conn is None:
+            return
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)",
+                        key + (json.dumps(list(metadata), ensure_ascii=False),))
+            except sqlite3.Error as e:
+                logger.warning(f"保存笔记元数据缓存失败: {e}")
+
+    def prune(self, filenames):
+        """删除不在 filenames 中的笔记的缓存（完整扫描后调用）"""
+        if self._conn is None:
+            return
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS current_notes (filename TEXT PRIMARY KEY)")
+                    self._conn.execute("DELETE FROM current_notes")
+                    self._conn.executemany("INSERT OR IGNORE INTO current_notes VALUES (?)",
+                                           ((f,) for f in filenames))
+                    self._conn.execute(
+                        "DELETE FROM metadata WHERE filename NOT IN (SELECT filename FROM current_notes)")
+            except sqlite3.Error as e:
+                logger.warning(f"清理笔记元数据缓存失败: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
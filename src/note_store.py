@@ -0,0 +1,214 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import datetime
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+from loguru import logger
+
+from schedule_rules import RuleParseError, ScheduleRule, parse_rules
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    filename TEXT PRIMARY KEY,
+    mode     TEXT,
+    schedule TEXT,                      -- 原始规则（JSON），NULL 表示未设置调度
+    present  INTEGER NOT NULL DEFAULT 0 -- 最近一次扫描时文件是否存在
+);
+CREATE INDEX IF NOT EXISTS idx_notes_unscheduled ON notes(filename) WHERE schedule IS NULL AND present = 1;
+
+CREATE TABLE IF NOT EXISTS rules (
+    filename TEXT NOT NULL REFERENCES notes(filename) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    interval INTEGER NOT NULL,
+    unit     TEXT NOT NULL,
+    weekday  TEXT,
+    at_time  TEXT,
+    next_due TEXT,                      -- 下一次触发时间（ISO 格式，可按字符串排序）
+    PRIMARY KEY (filename, position)
+);
+CREATE INDEX IF NOT EXISTS idx_rules_next_due ON rules(next_due);
+
+CREATE TABLE IF NOT EXISTS fire_history (
+    id       INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    fired_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fire_history_filename ON fire_history(filename, fired_at);
+"""
+
+
+def _iso(moment):
+    return moment.isoformat(timespec="seconds")
+
+
+def read_note_schedules(path):
+    """
+    以只读方式读取数据库中的调度 {笔记文件名: 调度配置}，不建表、不修改数据库（模拟运行使用）。
+    数据库不存在时返回空字典。
+    """
+    if not os.path.exists(path):
+        return {}
+    conn = sqlite3.connect(pathlib.Path(path).absolute().as_uri() + "?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT filename, mode, schedule FROM notes WHERE schedule IS NOT NULL").fetchall()
+    finally:
+        conn.close()
+    return {filename: {"mode": mode, "schedule": json.loads(schedule)} for filename, mode, schedule in rows}
+
+
+class SqliteNoteStore:
+    """
+    SQLite 存储的笔记、调度规则和触发历史（storage_backend 设置为 "sqlite" 时使用）。
+    规则展开为 rules 表中的行并维护下一次触发时间，"一小时内到期的笔记"、
+    "未设置调度的笔记"等查询走索引，不需要遍历全部配置；批量修改在单个事务中完成。
+    """
+
+    def __init__(self, path, clock=None):
+        self.path = path
+        self.clock = clock
+        self._lock = threading.RLock()
+        # 调度线程和界面线程共用同一连接，由 _lock 串行化访问
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+
+    def _now(self):
+        return self.clock.now() if self.clock else datetime.datetime.now()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- 调度配置 ---
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM notes WHERE schedule IS NOT NULL LIMIT 1").fetchone() is None
+
+    def get_note_schedule(self, note_filename):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mode, schedule FROM notes WHERE filename = ? AND schedule IS NOT NULL",
+                (note_filename,)).fetchone()
+        if row is None:
+            return None
+        return {"mode": row[0], "schedule": json.loads(row[1])}
+
+    def get_all_note_schedules(self):
+        """返回 {笔记文件名: 调度配置} 字典"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename, mode, schedule FROM notes WHERE schedule IS NOT NULL").fetchall()
+        return {filename: {"mode": mode, "schedule": json.loads(schedule)} for filename, mode, schedule in rows}
+
+    def get_scheduled_notes(self):
+        """返回已设置调度的笔记文件名集合"""
+        with self._lock:
+            rows = self._conn.execute("SELECT filename FROM notes WHERE schedule IS NOT NULL").fetchall()
+        return {row[0] for row in rows}
+
+    def set_note_schedule(self, note_filename, schedule_info):
+        self.set_many_note_schedules({note_filename: schedule_info})
+
+    def set_many_note_schedules(self, mapping):
+        """
+        在一个事务中写入多个笔记的调度配置；值为 None 表示清除该笔记的调度。
+        规则无法解析的配置照常保存，但不会生成 rules 行（与 JSON 存储的行为一致）。
+        """
+        now = self._now()
+        upserts, rule_rows, deletes = [], [], []
+        for filename, schedule_info in mapping.items():
+            if schedule_info is None:
+                deletes.append((filename,))
+                continue
+            raw_rules = schedule_info.get("schedule")
+            upserts.append((filename, schedule_info.get("mode"), json.dumps(raw_rules, ensure_ascii=False)))
+            try:
+                rules = parse_rules(raw_rules)
+            except RuleParseError as e:
+                logger.warning(f"笔记 '{filename}' 的调度规则无效，将不计算触发时间: {e}")
+                rules = ()
+            for position, rule in enumerate(rules):
+                rule_rows.append((filename, position, rule.interval, rule.unit, rule.weekday, rule.at_time,
+                                  _iso(rule.next_run_after(now))))
+
+        with self._lock, self._conn:
+            if deletes:
+                self._conn.executemany("DELETE FROM rules WHERE filename = ?", deletes)
+                self._conn.executemany(
+                    "UPDATE notes SET mode = NULL, schedule = NULL WHERE filename = ?", deletes)
+                self._conn.executemany("DELETE FROM notes WHERE filename = ? AND present = 0", deletes)
+            if upserts:
+                self._conn.executemany(
+                    "INSERT INTO notes (filename, mode, schedule) VALUES (?, ?, ?) "
+                    "ON CONFLICT(filename) DO UPDATE SET mode = excluded.mode, schedule = excluded.schedule",
+                    upserts)
+                self._conn.executemany("DELETE FROM rules WHERE filename = ?", [(row[0],) for row in upserts])
+                self._conn.executemany("INSERT INTO rules VALUES (?, ?, ?, ?, ?, ?, ?)", rule_rows)
+
+    # --- 笔记文件 ---
+
+    def sync_notes(self, filenames):
+        """在一个事务中记录最近一次扫描到的笔记文件"""
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS scanned (filename TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM scanned")
+            self._conn.executemany("INSERT OR IGNORE INTO scanned VALUES (?)", ((f,) for f in filenames))
+            self._conn.execute(
+                "UPDATE notes SET present = 0 WHERE present = 1 AND filename NOT IN (SELECT filename FROM scanned)")
+            self._conn.execute(
+                "INSERT INTO notes (filename, present) SELECT filename, 1 FROM scanned WHERE true "
+                "ON CONFLICT(filename) DO UPDATE SET present = 1 WHERE present = 0")
+            self._conn.execute("DELETE FROM notes WHERE present = 0 AND schedule IS NULL")
+
+    def get_unscheduled_notes(self):
+        """返回最近一次扫描到、但尚未设置调度的笔记文件名"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename FROM notes WHERE schedule IS NULL AND present = 1 ORDER BY filename").fetchall()
+        return [row[0] for row in rows]
+
+    # --- 触发时间与历史 ---
+
+    def _refresh_next_due(self, now):
+        """将已过期（错过或已触发）的规则的下一次触发时间推进到 now 之后（调用方需持有锁）"""
+        stale = self._conn.execute(
+            "SELECT filename, position, interval, unit, weekday, at_time FROM rules WHERE next_due <= ?",
+            (_iso(now),)).fetchall()
+        if not stale:
+            return
+        updates = [(_iso(ScheduleRule(interval, unit, weekday, at_time).next_run_after(now)), filename, position)
+                   for filename, position, interval, unit, weekday, at_time in stale]
+        with self._conn:
+            self._conn.executemany("UPDATE rules SET next_due = ? WHERE filename = ? AND position = ?", updates)
+
+    def get_notes_due_between(self, start, end):
+        """返回在 (start, end] 内有规则到期的笔记文件名，按到期时间排序"""
+        with self._lock:
+            self._refresh_next_due(start)
+            rows = self._conn.execute(
+                "SELECT filename, MIN(next_due) AS due FROM rules WHERE next_due > ? AND next_due <= ? "
+                "GROUP BY filename ORDER BY due",
+                (_iso(start), _iso(end))).fetchall()
+        return [row[0] for row in rows]
+
+    def record_fire(self, when, note_filename, mode=None):
+        """记录一次提醒触发，并推进该笔记各条规则的下一次触发时间（签名与 fire_listeners 一致）"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO fire_history (filename, fired_at) VALUES (?, ?)",
+                               (note_filename, _iso(when)))
+        with self._lock:
+            self._refresh_next_due(when)
+
+    def get_fire_history(self, note_filename, limit=100):
+        """返回笔记最近的触发时间，从新到旧"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT fired_at FROM fire_history WHERE filename = ? ORDER BY fired_at DESC LIMIT ?",
+                (note_filename, limit)).fetchall()
+        return [datetime.datetime.fromisoformat(row[0]) for row in rows]
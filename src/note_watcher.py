@@ -0,0 +1,241 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+from loguru import logger
+
+from note_manager import NoteChanges
+
+
+class NoteWatcher:
+    """
+    监视各笔记来源文件夹中笔记文件的增加、删除和重命名，增量更新 NoteManager.notes 并通知各监听器。
+    安装了 watchdog 时使用系统的文件变化通知（Linux 上为 inotify，Windows 上为 ReadDirectoryChangesW），
+    否则每隔 interval 秒完整遍历一次并与上次的结果比较。
+    同一批文件操作（如一次复制 1000 个文件）产生的事件在安静 debounce 秒后合并为一次通知。
+    监听器 listener(changes) 在监视线程中调用，涉及界面的操作需自行切回主线程。
+    """
+
+    # 事件持续不断时，最迟在第一次事件后这么多秒发出通知
+    MAX_DELAY = 5.0
+
+    def __init__(self, note_manager, backend="auto", debounce=0.5, interval=2):
+        """
+        :param backend: "auto"（优先使用系统通知）、"native"、"polling" 或 "off"
+        """
+        self.note_manager = note_manager
+        self.backend = backend
+        self.debounce = debounce
+        self.interval = interval
+        self.listeners = []
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.mode = None
+        self._observer = None
+        self._watched_sources = None
+        # [(来源文件夹的绝对路径, 来源前缀)]，路径较长的在前，嵌套的来源优先匹配内层
+        self._watched_roots = []
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._moves = []
+        self._full_rescan = False
+        self._first_event_at = None
+        self._flush_timer = None
+
+    def start(self):
+        if self.backend == "off":
+            logger.info("笔记文件夹监视已关闭。")
+            return
+        if self.thread and self.thread.is_alive():
+            return
+        self.mode = "polling"
+        if self.backend in ("auto", "native"):
+            try:
+                import watchdog.observers  # noqa: F401
+                self.mode = "native"
+            except ImportError as e:
+                logger.warning(f"无法加载 watchdog，将定期扫描笔记文件夹。错误: {e}")
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="note-watcher", daemon=True)
+        self.thread.start()
+        logger.info(f"开始监视笔记文件夹（{'系统通知' if self.mode == 'native' else f'每 {self.interval} 秒扫描一次'}）。")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self._stop_observer()
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+    def _run(self):
+        while True:
+            # 数据文件夹和笔记来源可能在设置中被修改，每轮检查一次
+            if self.mode == "native" and self.note_manager.sources != self._watched_sources:
+                self._start_observer()
+            elif self.mode == "polling":
+                self.check()
+            if self.stop_event.wait(self.interval):
+                return
+
+    # --- 系统通知 ---
+
+    def _start_observer(self):
+        from watchdog.observers import Observer
+
+        self._stop_observer()
+        sources = self.note_manager.sources
+        self._watched_sources = sources
+        sources = [source for source in sources if os.path.isdir(source.path)]
+        self._watched_roots = sorted(((os.path.abspath(source.path), source.prefix) for source in sources),
+                                     key=lambda root: len(root[0]), reverse=True)
+        if not sources:
+            return
+        observer = Observer()
+        handler = _EventHandler(self)
+        try:
+            for source in sources:
+                observer.schedule(handler, source.path, recursive=self.note_manager.max_depth > 0)
+            observer.start()
+        except OSError as e:
+            # 如 inotify 监视数量达到上限
+            logger.warning(f"无法监视笔记文件夹，将改为定期扫描。错误: {e}")
+            self.mode = "polling"
+            return
+        self._observer = observer
+        # 开始监视前发生的变化由一次完整比较补上
+        self._queue(full_rescan=True)
+
+    def _stop_observer(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def _note_name(self, path):
+        """将事件中的绝对路径转换为笔记名（来源前缀 + 相对来源文件夹的路径，'/' 分隔），不在任何来源中时返回 None"""
+        if isinstance(path, bytes):
+            path = os.fsdecode(path)
+        path = os.path.abspath(path)
+        for root, prefix in self._watched_roots:
+            if path.startswith(root + os.sep):
+                return prefix + os.path.relpath(path, root).replace(os.sep, "/")
+        return None
+
+    def _queue(self, paths=(), move=None, full_rescan=False):
+        """记录一个文件事件，并（重新）开始防抖计时"""
+        with self._lock:
+            self._pending.update(name for name in paths if name)
+            if move:
+                self._moves.append(move)
+            self._full_rescan = self._full_rescan or full_rescan
+            now = time.monotonic()
+            if self._first_event_at is None:
+                self._first_event_at = now
+            if self._flush_timer is not None:
+                if now - self._first_event_at >= self.MAX_DELAY:
+                    return
+                self._flush_timer.cancel()
+            self._flush_timer = threading.Timer(self.debounce, self.check)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    # --- 合并与通知 ---
+
+    def check(self):
+        """
+        处理积累的事件（轮询模式下完整比较一次），更新 NoteManager.notes 并通知监听器。
+        :return: 实际生效的 NoteChanges，没有变化时返回 None
+        """
+        with self._lock:
+            pending, moves = self._pending, self._moves
+            full_rescan = self._full_rescan or self.mode != "native"
+            self._pending, self._moves, self._full_rescan = set(), [], False
+            self._first_event_at = None
+            self._flush_timer = None
+
+        try:
+            if full_rescan:
+                changes = self._settled_diff()
+            else:
+                changes = self._collect(pending, moves)
+            changes = self.note_manager.apply_changes(changes)
+        except Exception as e:
+            logger.error(f"更新笔记列表失败: {e}")
+            return None
+        if not changes:
+            return None
+
+        logger.info(f"笔记文件夹有变化: 新增 {len(changes.added)} 个，删除 {len(changes.removed)} 个，"
+                    f"重命名 {len(changes.renamed)} 个。")
+        for listener in self.listeners:
+            try:
+                listener(changes)
+            except Exception as e:
+                logger.error(f"处理笔记文件变化失败: {e}")
+        return changes
+
+    def _settled_diff(self):
+        """
+        完整遍历并与 notes 比较。有变化时每隔 debounce 秒再遍历一次，
+        直到两次结果相同（文件复制已结束）或超过 MAX_DELAY，避免一次复制被拆成多次通知。
+        """
+        records = self.note_manager.walk()
+        changes = self.note_manager.diff_notes(records)
+        deadline = time.monotonic() + self.MAX_DELAY
+        while changes and time.monotonic() < deadline and not self.stop_event.wait(self.debounce):
+            latest = self.note_manager.walk()
+            if set(latest) == set(records):
+                break
+            records = latest
+            changes = self.note_manager.diff_notes(records)
+        return changes
+
+    def _collect(self, pending, moves):
+        """只读取事件涉及的文件，生成 NoteChanges"""
+        known = self.note_manager.note_names()
+        changes = NoteChanges()
+        for old_name, new_name in moves:
+            record = self.note_manager.stat_note(new_name)
+            if old_name in known and record:
+                changes.renamed.append((old_name, record))
+            elif old_name in known:
+                changes.removed.append(old_name)
+            elif record:
+                changes.added.append(record)
+            pending.discard(old_name)
+            pending.discard(new_name)
+        for name in pending:
+            record = self.note_manager.stat_note(name)
+            if record:
+                (changes.updated if name in known else changes.added).append(record)
+            elif name in known:
+                changes.removed.append(name)
+        return changes
+
+
+class _EventHandler:
+    """watchdog 事件处理器：只记录受影响的路径，实际处理在防抖后进行"""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def dispatch(self, event):
+        if event.event_type in ("opened", "closed", "closed_no_write"):
+            return
+        if event.is_directory:
+            # 文件夹被创建、删除或移动时，其中的文件不会逐个产生事件
+            if event.event_type != "modified":
+                self.watcher._queue(full_rescan=True)
+            return
+        src_name = self.watcher._note_name(event.src_path)
+        if event.event_type == "moved":
+            dest_name = self.watcher._note_name(event.dest_path)
+            self.watcher._queue(move=(src_name, dest_name) if src_name and dest_name else None,
+                                paths=(src_name, dest_name))
+        else:
+            self.watcher._queue(paths=(src_name,))
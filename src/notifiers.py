@@ -0,0 +1,203 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from loguru import logger
+
+
+class NotifierBackend:
+    """
+    提醒的输出后端：负责发送系统通知和用编辑器打开文件。
+    调度服务只依赖这个接口，具体实现由 notifier_backend 设置项选择。
+    """
+    name = "base"
+
+    def notify(self, title, msg, on_click=None, icon_path=None):
+        """
+        发送一条系统通知，on_click 为点击通知后的回调，icon_path 为通知中显示的图片（如笔记的缩略图）。
+        后端不支持的参数会被忽略。
+        """
+        raise NotImplementedError
+
+    def open_files(self, file_paths, editor_path=None):
+        """用指定编辑器一次打开若干文件；editor_path 为空时逐个用系统默认程序打开"""
+        raise NotImplementedError
+
+
+class WindowsToastBackend(NotifierBackend):
+    """Windows 实现：win10toast-click 可点击通知 + os.startfile"""
+    name = "windows"
+
+    def __init__(self):
+        # 延迟导入，使其他平台也能加载本模块
+        from win10toast_click import ToastNotifier
+
+        class MyToastNotifier(ToastNotifier):
+            def on_destroy(self, hwnd, msg, wparam, lparam):
+                super().on_destroy(hwnd, msg, wparam, lparam)
+                return 0
+
+        self.toaster = MyToastNotifier()
+
+    def notify(self, title, msg, on_click=None, icon_path=None):
+        self.toaster.show_toast(
+            title=title,
+            msg=msg,
+            icon_path=self._to_ico(icon_path),
+            duration=60,
+            threaded=True,
+            callback_on_click=on_click
+        )
+
+    @staticmethod
+    def _to_ico(icon_path):
+        """win10toast 只接受 .ico 图标，把 PNG 缩略图转换后保存在它旁边"""
+        if not icon_path:
+            return None
+        ico_path = os.path.splitext(icon_path)[0] + ".ico"
+        if not os.path.exists(ico_path):
+            try:
+                from PIL import Image
+                with Image.open(icon_path) as image:
+                    image.save(ico_path, format="ICO")
+            except Exception as e:
+                logger.warning(f"转换通知图标失败: {e}")
+                return None
+        return ico_path
+
+    def open_files(self, file_paths, editor_path=None):
+        if editor_path:
+            subprocess.Popen([editor_path] + list(file_paths))
+            return
+        for file_path in file_paths:
+            os.startfile(file_path)
+
+
+class DesktopBackend(NotifierBackend):
+    """通用桌面实现：notify-send / osascript 发送通知，xdg-open / open 打开文件"""
+    name = "desktop"
+
+    def notify(self, title, msg, on_click=None, icon_path=None):
+        if sys.platform == "darwin":
+            script = f'display notification {self._quote(msg)} with title {self._quote(title)}'
+            subprocess.Popen(["osascript", "-e", script])
+        elif shutil.which("notify-send"):
+            icon_args = ["-i", icon_path] if icon_path else []
+            subprocess.Popen(["notify-send", *icon_args, title, msg])
+        else:
+            logger.info(f"[通知] {title}: {msg}")
+
+    def open_files(self, file_paths, editor_path=None):
+        if editor_path:
+            subprocess.Popen([editor_path] + list(file_paths))
+            return
+        for file_path in file_paths:
+            if sys.platform == "win32":
+                os.startfile(file_path)
+            elif sys.platform == "darwin":
+                subprocess.Popen(["open", file_path])
+            else:
+                subprocess.Popen(["xdg-open", file_path])
+
+    @staticmethod
+    def _quote(text):
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class RecordingBackend(NotifierBackend):
+    """进程内记录后端：不产生任何真实通知或进程，只记录调用，用于测试和无界面运行"""
+    name = "recording"
+
+    def __init__(self, clock=None):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.events = []
+
+    def notify(self, title, msg, on_click=None, icon_path=None):
+        self._record({"kind": "notify", "title": title, "msg": msg, "on_click": on_click, "icon": icon_path})
+
+    def open_files(self, file_paths, editor_path=None):
+        self._record({"kind": "open", "files": list(file_paths), "editor": editor_path})
+
+    def _record(self, event):
+        event["at"] = self.clock.now() if self.clock else datetime.datetime.now()
+        with self._lock:
+            self.events.append(event)
+
+    def clear(self):
+        with self._lock:
+            self.events = []
+
+
+class InstrumentedBackend(NotifierBackend):
+    """为后端的每次调用计时，并统计各操作的调用次数、失败次数和延迟"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def notify(self, title, msg, on_click=None, icon_path=None):
+        self._timed("notify", self.backend.notify, title, msg, on_click=on_click, icon_path=icon_path)
+
+    def open_files(self, file_paths, editor_path=None):
+        self._timed("open_files", self.backend.open_files, file_paths, editor_path=editor_path)
+
+    def _timed(self, operation, func, *args, **kwargs):
+        started = time.perf_counter()
+        failed = False
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            with self._lock:
+                op_stats = self.stats.setdefault(
+                    operation, {"calls": 0, "failures": 0, "total_latency": 0.0, "max_latency": 0.0})
+                op_stats["calls"] += 1
+                op_stats["failures"] += failed
+                op_stats["total_latency"] += latency
+                op_stats["max_latency"] = max(op_stats["max_latency"], latency)
+
+    def get_stats(self):
+        """返回 {后端名: {操作名: {calls, failures, avg_latency, max_latency, ...}}}"""
+        with self._lock:
+            stats = {op: dict(op_stats) for op, op_stats in self.stats.items()}
+        for op_stats in stats.values():
+            op_stats["avg_latency"] = op_stats["total_latency"] / op_stats["calls"] if op_stats["calls"] else 0.0
+        return {self.name: stats}
+
+
+BACKENDS = {
+    WindowsToastBackend.name: WindowsToastBackend,
+    DesktopBackend.name: DesktopBackend,
+    RecordingBackend.name: RecordingBackend,
+}
+
+
+def create_notifier(name="auto"):
+    """
+    根据名称创建带计时统计的通知后端。
+    "auto" 在 Windows 上使用 win10toast-click，其余平台（或缺少该依赖时）使用通用桌面实现。
+    """
+    if name == "auto":
+        name = "windows" if sys.platform == "win32" else "desktop"
+    if name not in BACKENDS:
+        logger.warning(f"未知的通知后端 '{name}'，将使用 'desktop'。")
+        name = "desktop"
+
+    try:
+        backend = BACKENDS[name]()
+    except ImportError as e:
+        logger.warning(f"无法加载通知后端 '{name}'，将使用 'desktop'。错误: {e}")
+        backend = DesktopBackend()
+    logger.info(f"使用通知后端: {backend.name}")
+    return InstrumentedBackend(backend)
@@ -0,0 +1,52 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import datetime
+import threading
+
+
+class DigestCoalescer:
+    """
+    将同一时间窗口内到期的提醒合并为一批。
+    第一条提醒到达时开启窗口，窗口结束时由调度线程通过 pop_due 取走整批提醒；
+    本类不创建线程，窗口结束时间由调度线程纳入休眠时间的计算。
+    """
+
+    def __init__(self, window_seconds=30):
+        self.window_seconds = max(0, window_seconds)
+        self._lock = threading.Lock()
+        # 以字典作有序集合：按到达顺序保存 (笔记, 模式)，去重只需一次哈希查找
+        self._pending = {}
+        self.deadline = None
+
+    @property
+    def enabled(self):
+        return self.window_seconds > 0
+
+    def add(self, filename, mode, now):
+        """加入一条提醒；同一笔记在窗口内重复到期时只保留一条"""
+        with self._lock:
+            self._pending.setdefault((filename, mode))
+            if self.deadline is None:
+                self.deadline = now + datetime.timedelta(seconds=self.window_seconds)
+
+    def add_many(self, reminders, now):
+        """一次加入多条提醒 [(filename, mode), ...]（如启动时补发的提醒），只加锁一次"""
+        with self._lock:
+            self._pending.update(dict.fromkeys(reminders))
+            if self._pending and self.deadline is None:
+                self.deadline = now + datetime.timedelta(seconds=self.window_seconds)
+
+    def seconds_until_flush(self, now):
+        """距离窗口结束的秒数，没有待合并的提醒时返回 None"""
+        with self._lock:
+            if self.deadline is None:
+                return None
+            return (self.deadline - now).total_seconds()
+
+    def pop_due(self, now, force=False):
+        """窗口已结束（或 force 为 True）时取出整批提醒，否则返回空列表"""
+        with self._lock:
+            if self.deadline is None or (not force and now < self.deadline):
+                return []
+            batch, self._pending, self.deadline = list(self._pending), {}, None
+            return batch
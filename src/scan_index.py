@@ -0,0 +1,79 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import os
+from loguru import logger
+
+
+class ScanIndex:
+    """
+    持久化的笔记扫描索引（scan_index.json，与 config.json 同目录）。
+    按文件夹保存上一次扫描的结果：{笔记名前缀: (文件夹修改时间, [NoteRecord], [子文件夹前缀])}，
+    笔记名前缀为来源前缀（如 "工作:"）加文件夹在来源内的相对路径。
+    启动时据此立即显示笔记列表；重新校验时文件夹的修改时间未变化，说明其中没有增删或重命名，
+    可以直接沿用索引中的记录，只需 stat 文件夹本身。
+    """
+
+    VERSION = 3
+
+    def __init__(self, path, record_type):
+        """
+        :param record_type: 笔记记录的类型（NoteRecord），载入时用 record_type(*字段) 重建记录
+        """
+        self.path = path
+        self.record_type = record_type
+
+    @classmethod
+    def make_key(cls, sources, max_depth, ignore_patterns):
+        """索引只在笔记来源和扫描参数完全相同时有效；sources 为 NoteSource 列表。返回可直接写入 JSON 的列表"""
+        return [cls.VERSION,
+                [[source.name, os.path.abspath(source.path), list(source.include), list(source.exclude)]
+                 for source in sources],
+                max_depth, list(ignore_patterns)]
+
+    def load(self, key):
+        """返回与 key 匹配的文件夹字典，不存在或不匹配时返回 None；格式不对的文件夹条目会被跳过（下次校验时重新扫描）"""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取笔记扫描索引失败，将重新扫描: {e}")
+            return None
+        if not isinstance(data, dict) or data.get("key") != key or not isinstance(data.get("dirs"), dict):
+            return None
+
+        dirs, skipped = {}, 0
+        for prefix, entry in data["dirs"].items():
+            try:
+                dir_mtime, records, subdirs = entry
+                if dir_mtime is not None and type(dir_mtime) is not int:
+                    raise TypeError(dir_mtime)
+                if not all(isinstance(subdir, str) for subdir in subdirs):
+                    raise TypeError(subdirs)
+                dirs[prefix] = (dir_mtime, [self._load_record(record) for record in records], list(subdirs))
+            except (TypeError, ValueError):
+                skipped += 1
+        if skipped:
+            logger.warning(f"笔记扫描索引中有 {skipped} 个文件夹的记录无效，将在校验时重新扫描。")
+        return dirs
+
+    def _load_record(self, fields):
+        name, note_type, size, ctime, mtime = fields
+        if not isinstance(name, str) or not isinstance(note_type, str) or type(size) is not int \
+                or not all(isinstance(t, (int, float)) and not isinstance(t, bool) for t in (ctime, mtime)):
+            raise TypeError(fields)
+        return self.record_type(name, note_type, size, ctime, mtime)
+
+    def save(self, key, dirs):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                # NoteRecord 是 NamedTuple，直接写为数组
+                json.dump({"key": key, "dirs": dirs}, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"保存笔记扫描索引失败: {e}")
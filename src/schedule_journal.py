@@ -0,0 +1,135 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import json
+import os
+import threading
+from loguru import logger
+
+
+class ScheduleJournal:
+    """
+    笔记调度配置的只追加日志（JSON Lines），与 config.json 中的快照配合使用。
+    保存单个笔记的规则时只追加一行，耗时与笔记总数无关；加载时在快照上按顺序重放日志。
+    每行形如 {"note": "a.md", "info": {...}} 或 {"note": "a.md", "deleted": true}。
+
+    写入新快照前先调用 rotate 将当前日志改名为 <path>.1，快照写入成功后再删除它；
+    快照写入失败时 <path>.1 会保留下来，下次加载时与 <path> 一起重放，不会丢失修改。
+    """
+
+    # 日志行数超过 笔记数 / 2 + COMPACT_MIN_LINES 时应写入新快照
+    COMPACT_MIN_LINES = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self.rotated_path = path + ".1" if path else None
+        self._lock = threading.Lock()
+        self._line_count = 0
+        self._file = None
+
+    def replay(self, notes_schedule):
+        """
+        按顺序将轮转出的旧日志和当前日志重放到 notes_schedule 上（原地修改）。
+        :return: 重放的记录数
+        """
+        if not self.path:
+            return 0
+        replayed = 0
+        with self._lock:
+            self._line_count = 0
+            for path in (self.rotated_path, self.path):
+                if not os.path.exists(path):
+                    continue
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            self._line_count += 1
+                            try:
+                                entry = json.loads(line)
+                                if entry.get("deleted"):
+                                    notes_schedule.pop(entry["note"], None)
+                                else:
+                                    notes_schedule[entry["note"]] = entry["info"]
+                                replayed += 1
+                            except (ValueError, KeyError, TypeError, AttributeError):
+                                # 进程崩溃时最后一行可能只写了一半，忽略即可
+                                continue
+                except IOError as e:
+                    logger.error(f"读取调度日志 '{path}' 失败: {e}")
+        if replayed:
+            logger.info(f"已从调度日志重放 {replayed} 条修改。")
+        return replayed
+
+    def record(self, note_filename, schedule_info):
+        """追加一条修改；schedule_info 为 None 表示删除该笔记的调度"""
+        self.record_many({note_filename: schedule_info})
+
+    def record_many(self, mapping):
+        """一次写入追加多条修改 {笔记文件名: 调度配置或 None}"""
+        if not self.path or not mapping:
+            return
+        lines = []
+        for note_filename, schedule_info in mapping.items():
+            if schedule_info is None:
+                entry = {"note": note_filename, "deleted": True}
+            else:
+                entry = {"note": note_filename, "info": schedule_info}
+            lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                self._file.write("".join(lines))
+                self._file.flush()
+                self._line_count += len(lines)
+            except IOError as e:
+                logger.error(f"写入调度日志失败: {e}")
+
+    def needs_compaction(self, note_count):
+        """日志是否已经长到需要写入新快照"""
+        with self._lock:
+            return self._line_count > note_count // 2 + self.COMPACT_MIN_LINES
+
+    def rotate(self):
+        """
+        将当前日志移到 <path>.1，之后的修改写入新的日志文件。
+        调用方需保证此时的快照内容已包含当前日志中的全部修改。
+        """
+        if not self.path:
+            return
+        with self._lock:
+            self._close()
+            if not os.path.exists(self.path):
+                return
+            try:
+                if os.path.exists(self.rotated_path):
+                    # 上一次快照写入失败，旧日志还在：把当前日志接在其后
+                    with open(self.path, 'r', encoding='utf-8') as src, \
+                            open(self.rotated_path, 'a', encoding='utf-8') as dst:
+                        dst.write(src.read())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, self.rotated_path)
+                self._line_count = 0
+            except OSError as e:
+                logger.error(f"轮转调度日志失败: {e}")
+
+    def discard_rotated(self):
+        """新快照已写入，删除轮转出的旧日志"""
+        if not self.rotated_path:
+            return
+        with self._lock:
+            try:
+                if os.path.exists(self.rotated_path):
+                    os.remove(self.rotated_path)
+            except OSError as e:
+                logger.error(f"删除旧调度日志失败: {e}")
+
+    def close(self):
+        """关闭日志文件句柄（下次写入时会自动重新打开）"""
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,236 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import datetime
+import re
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# 规则中允许出现的时间单位（单数形式会被规范化为复数）
+UNITS = ("seconds", "minutes", "hours", "days", "weeks")
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# 形如 every(3).hours、every().monday.at('10:30')、every().days.at("08:05")
+_RULE_RE = re.compile(
+    r"^\s*every\(\s*(?P<interval>\d*)\s*\)"
+    r"\.(?P<unit>[a-z]+)"
+    r"(?:\.at\(\s*(?P<quote>['\"])(?P<at>[0-9:]+)(?P=quote)\s*\))?\s*$"
+)
+_AT_RE = re.compile(r"^(?P<hour>\d{1,2}):(?P<minute>\d{2})$")
+
+
+class RuleParseError(ValueError):
+    """规则字符串无法解析时抛出"""
+
+
+@dataclass(frozen=True)
+class ScheduleRule:
+    """一条已编译的调度规则，对应 schedule 库的一次 every(...) 链式调用"""
+    interval: int
+    unit: str
+    weekday: Optional[str] = None
+    at_time: Optional[str] = None
+
+    @property
+    def hour(self) -> Optional[int]:
+        return int(self.at_time.split(":")[0]) if self.at_time else None
+
+    @property
+    def minute(self) -> Optional[int]:
+        return int(self.at_time.split(":")[1]) if self.at_time else None
+
+    def to_dict(self) -> dict:
+        """转换为 config.json（第 2 版起）中保存的结构化规则"""
+        data = {"interval": self.interval, "unit": self.unit}
+        if self.weekday:
+            data["weekday"] = self.weekday
+        if self.at_time:
+            data["at"] = self.at_time
+        return data
+
+    def to_rule_str(self) -> str:
+        """还原为 config.json 中保存的规则字符串"""
+        rule = f"every({self.interval if self.interval > 1 else ''}).{self.weekday or self.unit}"
+        if self.at_time:
+            rule += f".at('{self.at_time}')"
+        return rule
+
+    def next_run_after(self, moment: datetime.datetime) -> datetime.datetime:
+        """
+        计算严格晚于 moment 的下一次触发时间，语义与 schedule 库的 Job 一致，
+        但不依赖系统当前时间，可用于补发计算。
+        """
+        next_run = moment
+        if self.weekday is not None:
+            days_ahead = (WEEKDAYS.index(self.weekday) - moment.weekday()) % 7
+            next_run += datetime.timedelta(days=days_ahead)
+        if self.at_time is not None:
+            next_run = next_run.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+
+        period = datetime.timedelta(**{self.unit: self.interval})
+        if self.interval != 1:
+            next_run += period
+        while next_run <= moment:
+            next_run += period
+        return next_run
+
+    def occurrences_between(self, start: datetime.datetime, end: datetime.datetime, limit=None):
+        """返回 (start, end] 区间内的所有触发时间，最多 limit 个"""
+        occurrences = []
+        moment = self.next_run_after(start)
+        while moment <= end and (limit is None or len(occurrences) < limit):
+            occurrences.append(moment)
+            moment = self.next_run_after(moment)
+        return occurrences
+
+    def create_job(self, scheduler):
+        """在给定的 schedule.Scheduler 上创建对应的任务（尚未调用 do）"""
+        job = scheduler.every(self.interval)
+        job = getattr(job, self.weekday or self.unit)
+        if self.at_time:
+            job = job.at(self.at_time)
+        return job
+
+
+@dataclass(frozen=True)
+class CompiledSchedule:
+    """一个笔记的完整调度配置：提醒模式 + 若干条规则"""
+    mode: str
+    rules: Tuple[ScheduleRule, ...]
+
+
+def parse_rule(rule_str: str) -> ScheduleRule:
+    """将单条规则字符串解析为 ScheduleRule"""
+    match = _RULE_RE.match(rule_str or "")
+    if not match:
+        raise RuleParseError(f"无法解析的调度规则: {rule_str!r}")
+
+    interval = int(match.group("interval")) if match.group("interval") else 1
+    if interval <= 0:
+        raise RuleParseError(f"调度间隔必须是正整数: {rule_str!r}")
+
+    word = match.group("unit")
+    weekday = None
+    if word in WEEKDAYS:
+        if interval != 1:
+            raise RuleParseError(f"按星期调度时不能指定间隔: {rule_str!r}")
+        weekday, unit = word, "weeks"
+    elif word in UNITS:
+        unit = word
+    elif word + "s" in UNITS:
+        if interval != 1:
+            raise RuleParseError(f"单数单位只能用于间隔为 1 的规则: {rule_str!r}")
+        unit = word + "s"
+    else:
+        raise RuleParseError(f"未知的时间单位 '{word}': {rule_str!r}")
+
+    return _build_rule(interval, unit, weekday, match.group("at"), rule_str)
+
+
+def rule_from_dict(data: dict) -> ScheduleRule:
+    """将结构化规则 {"interval": 2, "unit": "days", "at": "08:00"} 解析为 ScheduleRule"""
+    interval = data.get("interval", 1)
+    if type(interval) is not int or interval <= 0:
+        raise RuleParseError(f"调度间隔必须是正整数: {data!r}")
+    unit, weekday = data.get("unit"), data.get("weekday")
+    if unit not in UNITS:
+        raise RuleParseError(f"未知的时间单位 '{unit}': {data!r}")
+    if weekday is not None:
+        if weekday not in WEEKDAYS or unit != "weeks" or interval != 1:
+            raise RuleParseError(f"无效的星期规则: {data!r}")
+    at_time = data.get("at")
+    if at_time is not None and not isinstance(at_time, str):
+        raise RuleParseError(f"不支持的触发时间 '{at_time}': {data!r}")
+    return _build_rule(interval, unit, weekday, at_time, data)
+
+
+def _build_rule(interval, unit, weekday, at_time, rule_str) -> ScheduleRule:
+    """校验触发时间并创建 ScheduleRule，rule_str 为原始规则，仅用于错误信息"""
+    if at_time is not None:
+        at_match = _AT_RE.match(at_time)
+        if not at_match or weekday is None and unit != "days":
+            raise RuleParseError(f"不支持的触发时间 '{at_time}': {rule_str!r}")
+        hour, minute = int(at_match.group("hour")), int(at_match.group("minute"))
+        if hour > 23 or minute > 59:
+            raise RuleParseError(f"无效的触发时间 '{at_time}': {rule_str!r}")
+        at_time = f"{hour:02d}:{minute:02d}"
+
+    return ScheduleRule(interval=interval, unit=unit, weekday=weekday, at_time=at_time)
+
+
+def parse_rules(schedule_rules) -> Tuple[ScheduleRule, ...]:
+    """
+    解析一个笔记的规则：单条规则或规则列表（多选星期），跳过空规则。
+    每条规则可以是结构化的字典，也可以是旧版（第 1 版配置）的 every(...) 字符串。
+    """
+    if isinstance(schedule_rules, (str, dict)):
+        schedule_rules = [schedule_rules]
+    elif not isinstance(schedule_rules, list):
+        raise RuleParseError(f"无效的调度规则格式: {schedule_rules!r}")
+    rules = []
+    for raw_rule in schedule_rules:
+        if not raw_rule:
+            continue  # 跳过空规则
+        if isinstance(raw_rule, dict):
+            rules.append(rule_from_dict(raw_rule))
+        elif isinstance(raw_rule, str):
+            rules.append(parse_rule(raw_rule))
+        else:
+            raise RuleParseError(f"无效的调度规则格式: {raw_rule!r}")
+    return tuple(rules)
+
+
+class RuleCache:
+    """
+    按笔记缓存编译后的调度规则。
+    只有当笔记保存的规则或模式发生变化时才会重新解析，调度服务、
+    任务分析器和界面共享同一份编译结果。
+    """
+
+    def __init__(self):
+        self._cache = {}
+
+    def get(self, note_filename, schedule_info) -> Optional[CompiledSchedule]:
+        """返回笔记的编译结果；配置为空时返回 None，规则无效时抛出 RuleParseError"""
+        if not schedule_info:
+            self._cache.pop(note_filename, None)
+            return None
+
+        key = self._key(schedule_info)
+        cached = self._cache.get(note_filename)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        compiled = CompiledSchedule(mode=schedule_info.get("mode"), rules=parse_rules(schedule_info.get("schedule")))
+        self._cache[note_filename] = (key, compiled)
+        return compiled
+
+    @staticmethod
+    def _key(schedule_info):
+        raw_rules = schedule_info.get("schedule")
+        return schedule_info.get("mode"), tuple(raw_rules) if isinstance(raw_rules, list) else raw_rules
+
+    def discard(self, note_filename):
+        self._cache.pop(note_filename, None)
+
+    def __contains__(self, note_filename):
+        return note_filename in self._cache
+
+    def preload(self, schedules):
+        """
+        为已经校验过的配置直接构建编译结果，跳过解析和校验（用于配置校验缓存命中时）。
+        schedules 中的规则必须是结构化字典。
+        """
+        # ScheduleRule 不可变，相同的规则共用同一个对象
+        interned = {}
+        for note_filename, schedule_info in schedules.items():
+            rules = []
+            for raw in schedule_info["schedule"]:
+                if not raw:
+                    continue
+                fields = (raw.get("interval", 1), raw["unit"], raw.get("weekday"), raw.get("at"))
+                rule = interned.get(fields)
+                if rule is None:
+                    rule = interned[fields] = ScheduleRule(*fields)
+                rules.append(rule)
+            self._cache[note_filename] = (self._key(schedule_info),
+                                          CompiledSchedule(mode=schedule_info["mode"], rules=tuple(rules)))
@@ -1,118 +1,555 @@
 #!/user/bin/env python3
 # -*- coding: utf-8 -*-
+import heapq
+import itertools
 import schedule
-import time
 import threading
+import time
+import datetime
 import os
-import subprocess
 from loguru import logger
-from win10toast_click import ToastNotifier
-
 
-class MyToastNotifier(ToastNotifier):
-    def __init__(self):
-        super().__init__()
-
-    def on_destroy(self, hwnd, msg, wparam, lparam):
-        super().on_destroy(hwnd, msg, wparam, lparam)
-        return 0
+from clocks import SystemClock
+from dispatch_governor import DispatchGovernor
+from dispatch_pool import DispatchPool
+from fire_journal import FireJournal
+from notifiers import create_notifier
+from reminder_digest import DigestCoalescer
 
 
 class SchedulerService:
-    def __init__(self, config_manager, note_manager):
+    # 单次休眠的最长时间（秒）。即使没有任务到期也会定期醒来，
+    # 以免系统休眠或调整时钟后一直睡过头。
+    MAX_IDLE_SECONDS = 60
+    # 实际休眠时间比预期多出该秒数时，认为系统经历了休眠或时钟跳变
+    CLOCK_JUMP_SECONDS = 120
+    # 向触发日志写入存活记录的最小间隔（秒）
+    HEARTBEAT_SECONDS = 600
+    # 错过提醒的补发策略：只补发一次、全部补发、全部丢弃
+    CATCHUP_POLICIES = ("once", "all", "drop")
+    # 发送图片笔记的通知前，等待缩略图生成的最长时间（秒）
+    THUMBNAIL_WAIT = 2
+
+    def __init__(self, config_manager, note_manager, clock=None, notifier=None, persist_state=True,
+                 check_files=True):
+        """
+        :param clock: 时间来源，默认为系统时钟；模拟运行时传入 VirtualClock
+        :param notifier: 通知后端，默认按 notifier_backend 设置项创建
+        :param persist_state: 是否将触发日志和暂缓队列写入磁盘（模拟运行时为 False）
+        :param check_files: 触发提醒前是否检查笔记文件存在（模拟运行时为 False）
+        """
         self.config_manager = config_manager
         self.note_manager = note_manager
+        self.clock = clock or SystemClock()
+        self.check_files = check_files
         self.stop_event = threading.Event()
+        # 调度线程在此条件变量上休眠，重新加载任务或停止服务时将其唤醒
+        self.wakeup = threading.Condition()
         self.thread = None
-        self.toaster = MyToastNotifier()
+        # 发送通知和打开文件的后端，由 notifier_backend 设置项选择
+        self.notifier = notifier or create_notifier(config_manager.get_setting("notifier_backend", "auto"))
+        # 提醒在线程池中执行，调度线程只负责入队
+        self.dispatch_pool = DispatchPool(
+            max_workers=config_manager.get_setting("dispatch_workers", 4),
+            max_queue=config_manager.get_setting("dispatch_queue_size", 256),
+        )
+
+        # 服务私有的调度器，任务以笔记文件名作为标签
+        self.scheduler = schedule.Scheduler()
+        # 每个笔记当前生效的编译配置及其任务: filename -> (CompiledSchedule, [(ScheduleRule, Job)])
+        self._note_jobs = {}
+        # 将同一时间窗口内到期的提醒合并为一次通知或一次编辑器调用
+        self.digest = DigestCoalescer(config_manager.get_setting("digest_window_seconds", 30))
+        # 分发前的限流层：每分钟/每小时次数上限和免打扰时段
+        self.governor = DispatchGovernor(
+            per_minute=config_manager.get_setting("max_reminders_per_minute", 10),
+            per_hour=config_manager.get_setting("max_reminders_per_hour", 120),
+            quiet_hours=config_manager.get_setting("quiet_hours", []),
+            state_path=config_manager.get_state_path("deferred_reminders.json") if persist_state else None,
+        )
+        # 记录每个笔记最后一次触发的时间，用于补发错过的提醒
+        self.journal = FireJournal(config_manager.get_state_path("fire_journal.jsonl") if persist_state else None)
+        # catchup_policy 为 "all" 时每个笔记错过的次数 {filename: 次数}，显示提醒时取出并写进通知
+        # （只用单次的字典操作读写，调度线程和分发线程之间不需要另外加锁）
+        self._missed_counts = {}
+        # 每次提醒触发时调用的监听器 listener(when, filename, mode)，用于模拟运行记录时间线
+        self.fire_listeners = []
+        if persist_state:
+            # 使用 SQLite 存储时同时写入触发历史并推进规则的下次触发时间
+            self.fire_listeners.append(config_manager.record_fire)
+        self._last_heartbeat = None
+
+        # 按下次触发时间排序的任务堆，元素为 (next_run, seq, job)
+        self._job_heap = []
+        # 每个任务当前有效的堆条目序号，用于惰性丢弃过期条目
+        self._job_seq = {}
+        # 每个任务对应的规则，下次触发时间由规则按 self.clock 计算
+        self._job_rules = {}
+        self._seq_counter = itertools.count()
+        self.stats = {
+            "wakeups": 0, "runs": 0, "total_lag": 0.0, "max_lag": 0.0,
+            "catchups": 0, "replayed": 0, "dropped": 0,
+        }
+
+    def _push_job(self, job):
+        """将任务按其下次触发时间放入堆中（调用方需持有 wakeup 锁）"""
+        if job.next_run is None:
+            return
+        seq = next(self._seq_counter)
+        self._job_seq[job] = seq
+        heapq.heappush(self._job_heap, (job.next_run, seq, job))
+
+    def _discard_stale_entries(self):
+        """丢弃堆顶已被重新调度或已删除任务的条目（调用方需持有 wakeup 锁）"""
+        while self._job_heap:
+            _, seq, job = self._job_heap[0]
+            if self._job_seq.get(job) == seq:
+                return
+            heapq.heappop(self._job_heap)
+
+    def _next_event_time(self, now):
+        """
+        下一个需要处理的时间点：最早到期的任务、合并窗口结束或暂缓提醒可放行，
+        都没有时返回 None（调用方需持有 wakeup 锁）
+        """
+        self._discard_stale_entries()
+        candidates = []
+        for wait_seconds in (self.digest.seconds_until_flush(now), self.governor.seconds_until_ready(now)):
+            if wait_seconds is not None:
+                candidates.append(now + datetime.timedelta(seconds=wait_seconds))
+        if self._job_heap:
+            candidates.append(self._job_heap[0][0])
+        return min(candidates) if candidates else None
+
+    def _wait_for_next_event(self):
+        """
+        休眠到下一个需要处理的时间点（或被唤醒）。
+        :return: 是否检测到系统休眠或时钟跳变
+        """
+        with self.wakeup:
+            now = self.clock.now()
+            next_event = self._next_event_time(now)
+            timeout = self.MAX_IDLE_SECONDS
+            if next_event is not None:
+                timeout = min(timeout, (next_event - now).total_seconds())
+            if timeout <= 0:
+                return False
+            wall_before = time.time()
+            self.wakeup.wait(timeout)
+            self.stats["wakeups"] += 1
+            return time.time() - wall_before - timeout > self.CLOCK_JUMP_SECONDS
+
+    def _pop_due_jobs(self, now):
+        """取出所有已到期的任务"""
+        with self.wakeup:
+            due_jobs = []
+            while True:
+                self._discard_stale_entries()
+                if not self._job_heap or self._job_heap[0][0] > now:
+                    break
+                _, _, job = heapq.heappop(self._job_heap)
+                # 任务运行期间不在堆中，运行结束后再按新的触发时间放回
+                self._job_seq[job] = None
+                due_jobs.append(job)
+            return due_jobs
+
+    def _process_due(self):
+        """运行所有已到期的任务，然后处理合并窗口和暂缓队列"""
+        for job in self._pop_due_jobs(self.clock.now()):
+            if self.stop_event.is_set():
+                break
+            self._run_job(job)
+        self._flush_digest()
+        self._drain_governor()
+        self._heartbeat()
+
+    def _run_job(self, job):
+        """运行一个到期任务，记录调度延迟，并按规则计算新的触发时间放回堆中"""
+        now = self.clock.now()
+        lag = max(0.0, (now - job.next_run).total_seconds())
+        rule = self._job_rules.get(job)
+        try:
+            job.job_func()
+        except Exception as e:
+            logger.error(f"运行任务 '{job}' 失败: {e}")
+
+        with self.wakeup:
+            self.stats["runs"] += 1
+            self.stats["total_lag"] += lag
+            self.stats["max_lag"] = max(self.stats["max_lag"], lag)
+            # 若运行期间任务已被删除（重新加载），则不再放回
+            if rule is not None and job in self._job_seq and self._job_seq[job] is None:
+                job.last_run = now
+                job.next_run = rule.next_run_after(now)
+                self._push_job(job)
+
+    def get_stats(self):
+        """返回调度引擎的运行统计：唤醒次数、运行次数和调度延迟（秒）"""
+        with self.wakeup:
+            stats = dict(self.stats)
+            stats["jobs"] = len(self._job_seq)
+        stats["avg_lag"] = stats["total_lag"] / stats["runs"] if stats["runs"] else 0.0
+        stats["dispatch"] = self.dispatch_pool.get_stats()
+        stats["governor"] = self.governor.get_stats()
+        stats["notifier"] = self.notifier.get_stats()
+        return stats
 
     def _run_continuously(self):
-        """后台线程持续运行schedule任务"""
+        """后台线程按任务的下次触发时间休眠，到期时运行任务"""
         logger.info("调度服务已启动。")
+        # 启动时先补发停机期间错过的提醒，在后台线程中进行，不阻塞界面
+        self._catch_up()
         while not self.stop_event.is_set():
-            schedule.run_pending()
-            time.sleep(1)
-        logger.info("调度服务已停止。")
+            if self._wait_for_next_event():
+                logger.warning("检测到系统休眠或时钟跳变，开始补发错过的提醒。")
+                self._catch_up()
+                continue
+            self._process_due()
+        # 停止前发出尚未结束合并窗口的提醒
+        self._flush_digest(force=True)
+        self.journal.touch(self.clock.now())
+        self.journal.close()
+        stats = self.get_stats()
+        logger.info(
+            f"调度服务已停止。共唤醒 {stats['wakeups']} 次，运行任务 {stats['runs']} 次，"
+            f"平均延迟 {stats['avg_lag']:.3f} 秒，最大延迟 {stats['max_lag']:.3f} 秒。"
+        )
+
+    def run_until(self, end):
+        """
+        在虚拟时钟上同步运行调度，直到 end（不启动后台线程）。
+        时钟直接跳到下一个需要处理的时间点，因此模拟一个月只需几秒。
+        """
+        while True:
+            with self.wakeup:
+                next_event = self._next_event_time(self.clock.now())
+            if next_event is None or next_event > end:
+                break
+            self.clock.advance_to(next_event)
+            self._process_due()
+        self.clock.advance_to(end)
+        self._flush_digest(force=True)
+
+    def _heartbeat(self):
+        """定期向触发日志写入存活记录"""
+        now = self.clock.now()
+        if self._last_heartbeat is None or (now - self._last_heartbeat).total_seconds() >= self.HEARTBEAT_SECONDS:
+            self.journal.touch(now)
+            self._last_heartbeat = now
+
+    def _catch_up(self):
+        """
+        一次遍历所有笔记，根据触发日志计算自上次触发（或服务上次存活）以来错过的提醒，
+        按 catchup_policy 设置补发，并将已过期的任务重新安排到当前时间之后。
+        """
+        policy = self.config_manager.get_setting("catchup_policy", "once")
+        if policy not in self.CATCHUP_POLICIES:
+            logger.warning(f"未知的补发策略 '{policy}'，将使用 'once'。")
+            policy = "once"
+        limit = max(1, int(self.config_manager.get_setting("catchup_max_per_note", 10)))
+
+        now = self.clock.now()
+        last_alive = self.journal.last_alive
+        missed_reminders = []
+        with self.wakeup:
+            for filename, (compiled, rule_jobs) in self._note_jobs.items():
+                since = self.journal.get_last_fired(filename) or last_alive
+                missed = []
+                if since is not None:
+                    for rule, _ in rule_jobs:
+                        # 只补发一次时，每条规则找到一个错过的时间点就够了
+                        missed.extend(rule.occurrences_between(since, now, limit if policy != "once" else 1))
+                if missed:
+                    missed_reminders.append((filename, compiled.mode, sorted(missed)[-limit:]))
+
+                # 已过期的任务由补发处理，这里直接安排到下一次触发时间
+                for rule, job in rule_jobs:
+                    if self._job_seq.get(job) is not None and job.next_run <= now:
+                        job.next_run = rule.next_run_after(now)
+                        self._push_job(job)
+            self.stats["catchups"] += 1
+
+        replayed = dropped = 0
+        handled_notes, reminders = [], []
+        for filename, mode, missed in missed_reminders:
+            # 丢弃的提醒同样记下时间点，下次启动时不再重复统计
+            handled_notes.append(filename)
+            if policy == "drop":
+                dropped += len(missed)
+                continue
+            occurrences = missed if policy == "all" else missed[-1:]
+            for _ in occurrences:
+                self._notify_fire_listeners(now, filename, mode)
+            # 每个笔记只提醒一次，"all" 策略在提醒中注明错过的次数
+            if len(occurrences) > 1:
+                self._missed_counts[filename] = len(occurrences)
+            reminders.append((filename, mode))
+            replayed += len(occurrences)
+        self.journal.record_many(handled_notes, now)
+        # 启用合并时所有补发的提醒一次性放入合并窗口，不逐条加锁
+        if self.digest.enabled:
+            self.digest.add_many(reminders, now)
+        else:
+            for filename, mode in reminders:
+                self._dispatch(filename, mode)
+
+        with self.wakeup:
+            self.stats["replayed"] += replayed
+            self.stats["dropped"] += dropped
+        self.journal.touch(now)
+        self._last_heartbeat = now
+        if missed_reminders:
+            logger.info(f"补发检查完成（策略: {policy}）：{len(missed_reminders)} 个笔记错过了提醒，"
+                        f"补发 {replayed} 次，丢弃 {dropped} 次。")
 
     def start(self):
         """启动调度服务线程"""
         if self.thread is None or not self.thread.is_alive():
             self.stop_event.clear()
+            self.dispatch_pool.start()
+            # 先加载任务，再启动线程，以便线程启动时能对所有任务进行补发检查
+            self.reload_schedules()
             self.thread = threading.Thread(target=self._run_continuously, daemon=True)
             self.thread.start()
-            self.reload_schedules()
 
     def stop(self):
         """停止调度服务线程"""
         self.stop_event.set()
+        with self.wakeup:
+            self.wakeup.notify_all()
         if self.thread:
             self.thread.join()  # 等待线程结束
+        self.dispatch_pool.stop()
 
     def reload_schedules(self):
-        """清空并重新加载所有笔记的调度任务"""
-        schedule.clear()
-        logger.info("正在重新加载所有调度任务...")
-        all_schedules = self.config_manager.config.get('notes_schedule', {})
+        """将所有笔记的调度任务与配置同步，只增删发生变化的笔记的任务"""
+        logger.info("正在同步所有调度任务...")
+        all_schedules = self.config_manager.get_all_note_schedules()
+
+        with self.wakeup:
+            changed = 0
+            for filename in set(self._note_jobs) | set(all_schedules):
+                if self._sync_note(filename, all_schedules.get(filename)):
+                    changed += 1
+            self.wakeup.notify_all()
+            job_count = len(self.scheduler.jobs)
+        logger.info(f"同步完成，{changed} 个笔记的任务有变化，当前共有 {job_count} 个任务。")
+
+    def apply_config_change(self, change):
+        """只同步一次配置变更（ConfigChange）中涉及的笔记"""
+        if not change.notes:
+            return
+        changed = 0
+        with self.wakeup:
+            for filename in change.notes:
+                if self._sync_note(filename, self.config_manager.get_note_schedule(filename)):
+                    changed += 1
+            if changed:
+                self.wakeup.notify_all()
+        logger.info(f"已应用配置变更，{changed} 个笔记的任务有变化。")
+
+    def _sync_note(self, filename, schedule_info):
+        """
+        比较笔记的新旧调度配置，仅在发生变化时替换其任务（调用方需持有 wakeup 锁）。
+        未变化的笔记保留原有任务，因此 every(3).hours 之类的间隔任务不会被重置。
+        :param schedule_info: 笔记当前的调度配置，None 表示未设置
+        :return: 任务是否发生了变化
+        """
+        try:
+            compiled = self.config_manager.rule_cache.get(filename, schedule_info)
+        except Exception as e:
+            logger.error(f"为 '{filename}' 添加任务失败，配置: '{schedule_info}'. 错误: {e}")
+            compiled = None
+        if compiled is not None and (not compiled.rules or not compiled.mode):
+            compiled = None
 
-        for filename, schedule_info in all_schedules.items():
+        old_compiled, _ = self._note_jobs.get(filename, (None, []))
+        if compiled == old_compiled:
+            return False
+
+        self._remove_note_jobs(filename)
+        if compiled is None:
+            return True
+
+        rule_jobs = []
+        for rule in compiled.rules:
             try:
-                schedule_rules = schedule_info.get("schedule")
-                mode = schedule_info.get("mode")
-                if not schedule_rules or not mode:
-                    continue
-
-                # **--- 修改开始 ---**
-                # 检查任务规则是单个字符串还是列表（针对多选星期）
-                # 并将其统一处理为列表
-                if isinstance(schedule_rules, str):
-                    rules_to_process = [schedule_rules]
-                elif isinstance(schedule_rules, list):
-                    rules_to_process = schedule_rules
-                else:
-                    logger.warning(f"为 '{filename}' 跳过无效的调度规则格式: {schedule_rules}")
-                    continue
-
-                # 遍历所有规则并创建任务
-                for rule_str in rules_to_process:
-                    if not rule_str: continue  # 跳过空规则
-                    job = eval(f"schedule.{rule_str}")
-                    job.do(self.trigger_reminder, filename=filename, mode=mode)
-                    logger.info(f"已为 '{filename}' 添加任务: {rule_str}, 模式: {mode}")
-                # **--- 修改结束 ---**
+                job = rule.create_job(self.scheduler)
+                job.tag(filename)
+                job.do(self.enqueue_reminder, filename=filename, mode=compiled.mode)
+                # 以服务的时钟为准计算首次触发时间
+                job.next_run = rule.next_run_after(self.clock.now())
+            except Exception as e:
+                logger.error(f"为 '{filename}' 添加任务失败，规则: '{rule.to_rule_str()}'. 错误: {e}")
+                continue
+            rule_jobs.append((rule, job))
+            self._job_rules[job] = rule
+            self._push_job(job)
+            logger.info(f"已为 '{filename}' 添加任务: {rule.to_rule_str()}, 模式: {compiled.mode}")
+        self._note_jobs[filename] = (compiled, rule_jobs)
+        return True
+
+    def _remove_note_jobs(self, filename):
+        """删除笔记的全部任务（调用方需持有 wakeup 锁）"""
+        _, rule_jobs = self._note_jobs.pop(filename, (None, []))
+        for _, job in rule_jobs:
+            # 堆中的条目会因序号失效而被惰性丢弃
+            self._job_seq.pop(job, None)
+            self._job_rules.pop(job, None)
+        if rule_jobs:
+            self.scheduler.clear(filename)
+            logger.info(f"已移除 '{filename}' 的 {len(rule_jobs)} 个任务。")
+
+    def enqueue_reminder(self, filename, mode):
+        """任务到期时由调度线程调用，记录触发时间后将提醒交给线程池"""
+        now = self.clock.now()
+        self.journal.record(filename, now)
+        self._notify_fire_listeners(now, filename, mode)
+        self._dispatch(filename, mode)
 
+    def _notify_fire_listeners(self, when, filename, mode):
+        for listener in self.fire_listeners:
+            try:
+                listener(when, filename, mode)
             except Exception as e:
-                logger.error(f"为 '{filename}' 添加任务失败，配置: '{schedule_info}'. 错误: {e}")
+                logger.error(f"提醒触发监听器执行失败: {e}")
 
-        logger.info(f"重新加载完成，当前共有 {len(schedule.get_jobs())} 个任务。")
+    def _dispatch(self, filename, mode):
+        """启用合并时放入合并窗口，否则直接作为一次分发提交"""
+        if self.digest.enabled:
+            self.digest.add(filename, mode, self.clock.now())
+        else:
+            self._submit_batch([(filename, mode)])
 
-    def trigger_reminder(self, filename, mode):
-        """根据模式触发提醒"""
-        logger.info(f"触发提醒: 文件='{filename}', 模式='{mode}'")
-        data_folder = self.config_manager.get_setting("data_folder")
-        if not data_folder:
-            logger.error("无法触发提醒，因为数据文件夹未设置。")
-            return
+    def _flush_digest(self, force=False):
+        """合并窗口结束时，将整批提醒作为一次分发提交"""
+        batch = self.digest.pop_due(self.clock.now(), force=force)
+        if batch:
+            self._submit_batch(batch)
+
+    def _submit_batch(self, batch):
+        """经限流层放行后交给线程池；被限流的提醒进入暂缓队列"""
+        if self.governor.admit(batch, self.clock.now()):
+            self.dispatch_pool.submit(self.trigger_digest, batch)
+        else:
+            logger.info(f"{len(batch)} 条提醒因频率限制或免打扰时段被暂缓。")
 
-        file_path = os.path.join(data_folder, filename)
+    def _drain_governor(self):
+        """按令牌速率逐个放行暂缓队列中的提醒"""
+        for filename, mode in self.governor.pop_ready(self.clock.now()):
+            self.dispatch_pool.submit(self.trigger_reminder, filename=filename, mode=mode)
+
+    def _resolve_note_path(self, filename):
+        """返回笔记文件的绝对路径；笔记来源未设置或文件不存在时记录错误并返回 None"""
+        # 笔记名是来源前缀 + 相对来源文件夹的路径（如 'dir/note.md'、'工作:周报.md'），
+        # NoteManager 按前缀直接定位来源文件夹
+        file_path = self.note_manager.get_note_path(filename)
+        if not self.check_files:
+            return file_path or os.path.join(*filename.split("/"))
+        if not file_path:
+            logger.error(f"无法触发提醒，笔记来源未设置或笔记路径无效: {filename}")
+            return None
         if not os.path.exists(file_path):
             logger.error(f"无法触发提醒，文件不存在: {file_path}")
+            return None
+        return file_path
+
+    def trigger_reminder(self, filename, mode):
+        """根据模式触发提醒"""
+        logger.info(f"触发提醒: 文件='{filename}', 模式='{mode}'")
+        file_path = self._resolve_note_path(filename)
+        if not file_path:
             return
 
         if mode == 'light':
             self.show_light_reminder(filename, file_path)
         elif mode == 'popup':
+            missed = self._missed_counts.pop(filename, 0)
+            if missed:
+                logger.info(f"'{filename}' 在停机期间错过了 {missed} 次提醒。")
             self.show_popup_reminder(filename, file_path)
 
+    def _missed_suffix(self, filename):
+        """取出笔记在停机期间错过的次数，返回通知中附加的说明（没有多次错过时为空字符串）"""
+        missed = self._missed_counts.pop(filename, 0)
+        return f"（错过 {missed} 次）" if missed > 1 else ""
+
+    def trigger_digest(self, reminders):
+        """
+        触发一批合并后的提醒：通知模式的笔记合并为一条通知，
+        直接显示模式的笔记尽量用一次编辑器调用打开。
+        :param reminders: [(filename, mode), ...]
+        """
+        if len(reminders) == 1:
+            self.trigger_reminder(*reminders[0])
+            return
+
+        logger.info(f"触发合并提醒: 共 {len(reminders)} 个笔记")
+        light_notes, popup_notes = [], []
+        for filename, mode in reminders:
+            file_path = self._resolve_note_path(filename)
+            if not file_path:
+                continue
+            if mode == 'light':
+                light_notes.append((filename, file_path))
+            elif mode == 'popup':
+                missed = self._missed_counts.pop(filename, 0)
+                if missed:
+                    logger.info(f"'{filename}' 在停机期间错过了 {missed} 次提醒。")
+                popup_notes.append((filename, file_path))
+
+        if len(light_notes) == 1:
+            self.show_light_reminder(*light_notes[0])
+        elif light_notes:
+            self.show_digest_reminder(light_notes)
+        if popup_notes:
+            self.open_files_with_editor(popup_notes)
+
+    def show_digest_reminder(self, notes):
+        """用一条系统通知列出多个需要回顾的笔记，点击后打开全部笔记"""
+        # 通知内容有长度限制，只列出前几个文件名
+        max_listed = 5
+        names = [filename + self._missed_suffix(filename) for filename, _ in notes]
+        msg = "是时候回顾一下这些笔记了：\n" + "\n".join(names[:max_listed])
+        if len(names) > max_listed:
+            msg += f"\n……等共 {len(names)} 个笔记"
+        try:
+            self.notifier.notify(
+                title=f"笔记提醒（{len(notes)} 条）",
+                msg=msg,
+                on_click=lambda: self.open_files_with_editor(notes)
+            )
+            logger.info(f"已发送合并系统通知，共 {len(notes)} 个笔记")
+        except Exception as e:
+            logger.error(f"发送系统通知失败: {e}")
+
+    def _describe_note(self, filename):
+        """返回通知中显示的笔记摘要（标题、字数和预览，或图片尺寸），没有可用的元数据时返回空字符串"""
+        if not self.check_files:
+            return ""
+        metadata = self.note_manager.get_metadata(filename)
+        if metadata is None:
+            return ""
+        lines = [metadata.describe(), metadata.preview]
+        return "\n".join(line for line in lines if line)
+
     def show_light_reminder(self, filename, file_path):
         """显示轻度提醒 (Toast)"""
+        msg = f"是时候回顾一下笔记了：\n{filename}{self._missed_suffix(filename)}"
+        summary = self._describe_note(filename)
+        if summary:
+            msg += f"\n{summary}"
+        # 图片笔记附上缩略图；尚未生成时最多等待 THUMBNAIL_WAIT 秒（在分发线程中，不影响界面）
+        icon_path = None
+        if self.check_files:
+            icon_path = self.note_manager.get_thumbnail(filename, timeout=self.THUMBNAIL_WAIT)
         try:
-            # 使用 win10toast-click，可以传入一个点击后的回调函数
-            self.toaster.show_toast(
+            # 支持点击回调的后端（如 win10toast-click）会在点击通知后打开笔记
+            self.notifier.notify(
                 title="笔记提醒",
-                msg=f"是时候回顾一下笔记了：\n{filename}",
-                duration=60,
-                threaded=True,
-                callback_on_click=lambda: self.open_file_with_editor(filename, file_path)
+                msg=msg,
+                icon_path=icon_path,
+                on_click=lambda: self.open_file_with_editor(filename, file_path)
             )
             logger.info(f"已发送系统通知 for '{filename}'")
         except Exception as e:
@@ -122,20 +559,53 @@ class SchedulerService:
         """显示弹窗提醒 (打开编辑器)"""
         self.open_file_with_editor(filename, file_path)
 
-    def open_file_with_editor(self, filename, file_path):
+    def _get_editor(self, filename):
+        """返回笔记类型对应的编辑器路径，以及该编辑器是否支持一次打开多个文件"""
         note_type = self.note_manager.get_note_type(filename)
-        editor_path = ""
         if note_type == 'markdown':
-            editor_path = self.config_manager.get_setting("md_editor_path")
+            return (self.config_manager.get_setting("md_editor_path"),
+                    self.config_manager.get_setting("md_editor_multi_file", False))
         elif note_type == 'image':
-            editor_path = self.config_manager.get_setting("img_editor_path")
+            return (self.config_manager.get_setting("img_editor_path"),
+                    self.config_manager.get_setting("img_editor_multi_file", False))
+        return "", False
+
+    def open_files_with_editor(self, notes):
+        """
+        打开多个笔记：支持多文件的编辑器只启动一次，其余逐个打开。
+        :param notes: [(filename, file_path), ...]
+        """
+        groups = {}
+        for filename, file_path in notes:
+            groups.setdefault(self._get_editor(filename), []).append((filename, file_path))
+
+        for (editor_path, multi_file), group in groups.items():
+            if len(group) > 1 and multi_file and self._editor_available(editor_path):
+                file_paths = [file_path for _, file_path in group]
+                try:
+                    logger.info(f"使用指定编辑器 '{editor_path}' 一次打开 {len(file_paths)} 个文件")
+                    self.notifier.open_files(file_paths, editor_path)
+                except Exception as e:
+                    logger.error(f"使用编辑器 '{editor_path}' 打开多个文件失败: {e}")
+                continue
+            for filename, file_path in group:
+                self.open_file_with_editor(filename, file_path)
+
+    def _editor_available(self, editor_path):
+        """模拟运行时（check_files 为 False）不检查编辑器是否存在于本机，按配置记录"""
+        return bool(editor_path) and (not self.check_files or os.path.exists(editor_path))
+
+    def open_file_with_editor(self, filename, file_path):
+        editor_path, _ = self._get_editor(filename)
 
         try:
-            if editor_path and os.path.exists(editor_path):
+            if self._editor_available(editor_path):
                 logger.info(f"使用指定编辑器 '{editor_path}' 打开 '{file_path}'")
-                subprocess.Popen([editor_path, file_path])
+                self.notifier.open_files([file_path], editor_path)
             else:
-                logger.warning(f"编辑器路径未设置或无效，尝试使用系统默认程序打开 '{file_path}'")
-                os.startfile(file_path)
+                # 模拟运行时每次触发都会走到这里，不必逐条警告
+                log = logger.warning if self.check_files else logger.debug
+                log(f"编辑器路径未设置或无效，尝试使用系统默认程序打开 '{file_path}'")
+                self.notifier.open_files([file_path])
         except Exception as e:
             logger.error(f"打开文件 '{file_path}' 失败: {e}")
\ No newline at end of file
@@ -0,0 +1,216 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import re
+import sqlite3
+import threading
+from loguru import logger
+
+from note_metadata import CJK_RANGES, MAX_TEXT_BYTES
+
+# 连续的中日韩文字，或连续的字母数字
+_TOKEN_RE = re.compile(rf"[{CJK_RANGES}]+|[^\W_{CJK_RANGES}]+")
+_CJK_RE = re.compile(rf"[{CJK_RANGES}]")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id       INTEGER PRIMARY KEY,
+    filename TEXT UNIQUE NOT NULL,
+    mtime    REAL NOT NULL,
+    size     INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(title, body, tokenize='unicode61 remove_diacritics 2');
+"""
+
+
+def tokenize(text, for_query=False):
+    """
+    将文字切分为索引词：字母数字按单词（小写），中日韩文字切分为单字和相邻两字（二元组）。
+    查询时两个字以上的中文只使用二元组，要求它们全部出现。
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        run = match.group()
+        if not _CJK_RE.match(run):
+            tokens.append(run.lower())
+            continue
+        bigrams = [run[i:i + 2] for i in range(len(run) - 1)]
+        if for_query:
+            tokens.extend(bigrams or [run])
+        else:
+            tokens.extend(run)
+            tokens.extend(bigrams)
+    return tokens
+
+
+class SearchIndex:
+    """
+    笔记的全文索引（SQLite FTS5 倒排索引，保存在 config.json 同目录的 search_index.db 中）。
+    Markdown 笔记索引文件名、第一个标题和正文，其他笔记（如图片）只索引文件名。
+    在后台线程中按笔记的修改时间和大小增量更新：只读取新增或变化过的笔记，删除已不存在的笔记；
+    查询按 BM25 排序，标题（文件名和第一个标题）的权重高于正文。
+    当前的 SQLite 不支持 FTS5 时搜索不可用（search 返回 None）。
+    """
+
+    # 每个事务写入的笔记数，写入之间可以穿插查询
+    BATCH_SIZE = 200
+    TITLE_WEIGHT = 5.0
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            logger.warning(f"无法创建全文搜索索引 '{path}'，搜索功能不可用: {e}")
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._condition = threading.Condition()
+        self._request = None
+        self._closed = False
+        self.thread = None
+
+    @property
+    def available(self):
+        return self._conn is not None
+
+    # --- 增量更新 ---
+
+    def request_sync(self, records, get_path):
+        """
+        请求在后台线程中把索引同步到 records（NoteRecord 列表）。
+        多次请求只处理最新的一次。get_path(笔记名) 返回笔记的绝对路径。
+        """
+        if not self.available:
+            return
+        with self._condition:
+            self._request = (list(records), get_path)
+            self._condition.notify()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="search-index", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._request is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                records, get_path = self._request
+                self._request = None
+            try:
+                self.sync(records, get_path)
+            except Exception as e:
+                logger.error(f"更新全文搜索索引失败: {e}")
+
+    def _superseded(self):
+        with self._condition:
+            return self._request is not None or self._closed
+
+    def sync(self, records, get_path):
+        """
+        将索引同步到 records：删除不存在的笔记，重新索引修改时间或大小变化过的笔记。
+        :return: 重新索引的笔记数
+        """
+        notes = {record.name: record for record in records}
+        with self._lock:
+            existing = {filename: (doc_id, mtime, size) for doc_id, filename, mtime, size
+                        in self._conn.execute("SELECT id, filename, mtime, size FROM docs")}
+        stale_ids = [(doc_id,) for filename, (doc_id, _, _) in existing.items() if filename not in notes]
+        changed = [record for name, record in notes.items()
+                   if existing.get(name, (None, None, None))[1:] != (record.mtime, record.size)]
+        if stale_ids:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM docs_fts WHERE rowid = ?", stale_ids)
+                self._conn.executemany("DELETE FROM docs WHERE id = ?", stale_ids)
+
+        indexed = 0
+        for start in range(0, len(changed), self.BATCH_SIZE):
+            if self._superseded():
+                # 有更新的同步请求（或正在关闭），剩余部分交给下一次
+                break
+            batch = []
+            for record in changed[start:start + self.BATCH_SIZE]:
+                document = self._read_document(record, get_path(record.name))
+                if document is not None:
+                    batch.append((record, document))
+            with self._lock, self._conn:
+                for record, (title, body) in batch:
+                    row = existing.get(record.name)
+                    if row is None:
+                        doc_id = self._conn.execute(
+                            "INSERT INTO docs (filename, mtime, size) VALUES (?, ?, ?)",
+                            (record.name, record.mtime, record.size)).lastrowid
+                    else:
+                        doc_id = row[0]
+                        self._conn.execute("UPDATE docs SET mtime = ?, size = ? WHERE id = ?",
+                                           (record.mtime, record.size, doc_id))
+                        self._conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (doc_id,))
+                    self._conn.execute("INSERT INTO docs_fts (rowid, title, body) VALUES (?, ?, ?)",
+                                       (doc_id, title, body))
+            indexed += len(batch)
+        if indexed or stale_ids:
+            logger.info(f"全文搜索索引已更新: 重新索引 {indexed} 个笔记，删除 {len(stale_ids)} 个。")
+        return indexed
+
+    @staticmethod
+    def _read_document(record, file_path):
+        """返回 (标题索引词, 正文索引词)，文件无法读取时返回 None。非 Markdown 笔记不读取文件，只以文件名为标题"""
+        name = os.path.splitext(record.name)[0]
+        if record.type != 'markdown':
+            return " ".join(tokenize(name)), ""
+        if not file_path:
+            return None
+        try:
+            with open(file_path, 'rb') as f:
+                text = f.read(MAX_TEXT_BYTES).decode('utf-8-sig', errors='replace')
+        except OSError as e:
+            logger.warning(f"读取笔记 '{record.name}' 失败，跳过全文索引: {e}")
+            return None
+        heading = next((line for line in text.splitlines() if line.lstrip().startswith("#")), "")
+        title = name + " " + heading
+        return " ".join(tokenize(title)), " ".join(tokenize(text))
+
+    # --- 查询 ---
+
+    def search(self, query, limit=100):
+        """
+        返回内容或标题包含 query 中全部词语的笔记名，按相关度从高到低排序。
+        最后一个英文单词按前缀匹配，便于边输入边搜索。不可用时返回 None。
+        """
+        if not self.available:
+            return None
+        tokens = tokenize(query, for_query=True)
+        if not tokens:
+            return []
+        terms = ['"' + token.replace('"', '""') + '"' for token in tokens]
+        if not _CJK_RE.match(tokens[-1]):
+            terms[-1] += "*"
+        with self._lock:
+            try:
+                rows = self._conn.execute(
+                    "SELECT docs.filename FROM docs_fts JOIN docs ON docs.id = docs_fts.rowid "
+                    "WHERE docs_fts MATCH ? ORDER BY bm25(docs_fts, ?, 1.0) LIMIT ?",
+                    (" AND ".join(terms), self.TITLE_WEIGHT, limit)).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"全文搜索失败: {e}")
+                return []
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,101 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+调度模拟：在虚拟时钟上把一份 config.json 运行 N 天，输出提醒触发的时间线。
+不会发送真实通知或打开编辑器，也不会写入配置文件、触发日志和暂缓队列。
+
+用法: python src/simulation.py config.json --days 30 --format csv --output timeline.csv
+"""
+import argparse
+import csv
+import datetime
+import json
+import sys
+from loguru import logger
+
+from clocks import VirtualClock
+from config_manager import ConfigSnapshot
+from note_manager import NoteManager, parse_note_sources
+from notifiers import InstrumentedBackend, RecordingBackend
+from scheduler_service import SchedulerService
+
+
+def run_simulation(config_path, days, start=None):
+    """
+    在虚拟时钟上运行 config_path 中的全部调度 days 天。
+    :param start: 模拟的起始时间，默认为当前时间
+    配置文件以只读方式加载，不会被保存、迁移或备份。
+    :return: (触发事件列表, 调度服务统计, 记录后端)
+    :raises OSError: 配置文件不存在或无法读取
+    :raises ValueError: 配置文件无法解析
+    """
+    config_manager = ConfigSnapshot(config_path)
+    # 只修改内存中的配置：提醒在调度线程中同步执行，保证时间线可重现
+    config_manager.config['settings']['dispatch_workers'] = 0
+
+    clock = VirtualClock(start)
+    recorder = RecordingBackend(clock)
+    service = SchedulerService(
+        config_manager,
+        NoteManager(config_manager.get_setting("data_folder"),
+                    sources=parse_note_sources(config_manager.get_setting("note_sources", []))),
+        clock=clock,
+        notifier=InstrumentedBackend(recorder),
+        persist_state=False,
+        check_files=False,
+    )
+
+    events = []
+    service.fire_listeners.append(
+        lambda when, filename, mode: events.append({"time": when, "note": filename, "mode": mode})
+    )
+    service.reload_schedules()
+    service.run_until(clock.now() + datetime.timedelta(days=days))
+    return events, service.get_stats(), recorder
+
+
+def write_timeline(events, stats, fp, fmt="csv"):
+    """将触发时间线写为 CSV 或 JSON"""
+    if fmt == "csv":
+        writer = csv.writer(fp)
+        writer.writerow(["time", "note", "mode"])
+        for event in events:
+            writer.writerow([event["time"].isoformat(timespec="seconds"), event["note"], event["mode"]])
+    else:
+        json.dump({
+            "events": [dict(event, time=event["time"].isoformat(timespec="seconds")) for event in events],
+            "stats": stats,
+        }, fp, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在虚拟时钟上模拟 EchoNote 的调度配置")
+    parser.add_argument("config", help="config.json 路径")
+    parser.add_argument("--days", type=float, default=30, help="模拟的天数")
+    parser.add_argument("--start", help="起始时间，ISO 格式，如 2025-01-01T00:00（默认当前时间）")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv")
+    parser.add_argument("--output", help="输出文件路径（默认输出到标准输出）")
+    args = parser.parse_args(argv)
+
+    # 模拟时只关心时间线，屏蔽逐条任务的日志
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    start = datetime.datetime.fromisoformat(args.start) if args.start else None
+    try:
+        events, stats, recorder = run_simulation(args.config, args.days, start)
+    except (OSError, ValueError) as e:
+        print(f"无法读取配置文件 '{args.config}': {e}", file=sys.stderr)
+        return 1
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            write_timeline(events, stats, f, args.format)
+    else:
+        write_timeline(events, stats, sys.stdout, args.format)
+    print(f"模拟 {args.days} 天，共触发 {len(events)} 次提醒，发出 {len(recorder.events)} 次通知或打开文件。",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
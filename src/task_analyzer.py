@@ -1,6 +1,6 @@
 #!/user/bin/env python3
 # -*- coding: utf-8 -*-
-import re
+from schedule_rules import RuleParseError
 
 
 class TaskAnalyzer:
@@ -49,37 +49,29 @@ class TaskAnalyzer:
         :return: list[list[int]] 7天 x 8个时间段的任务计数网格
         """
         grid = [[0] * self.TIME_SLOTS for _ in range(7)]
-        all_schedules = self.config_manager.config.get('notes_schedule', {})
+        all_schedules = self.config_manager.get_all_note_schedules()
 
-        for schedule_info in all_schedules.values():
-            rules = schedule_info.get("schedule")
-            if not rules:
+        for filename, schedule_info in all_schedules.items():
+            try:
+                compiled = self.config_manager.rule_cache.get(filename, schedule_info)
+            except RuleParseError:
+                continue
+            if not compiled:
                 continue
 
-            if isinstance(rules, str):
-                rules = [rules]
-
-            for rule in rules:
-                time_match = re.search(r"at\(['\"](\d{1,2}):\d{2}['\"]\)", rule)
-                if not time_match:
+            for rule in compiled.rules:
+                if rule.at_time is None:
                     continue
 
-                hour = int(time_match.group(1))
-                column_idx = self._map_hour_to_column(hour)
-
-                # 检查是否为周任务 (周一至周五)
-                is_weekly_task = False
-                for day_en, day_idx in self.weekday_map.items():
-                    if day_idx < 7 and f".{day_en}" in rule:
-                        grid[day_idx][column_idx] += 1
-                        is_weekly_task = True
+                column_idx = self._map_hour_to_column(rule.hour)
 
-                if is_weekly_task:
+                # 周任务：只统计对应的星期
+                if rule.weekday is not None:
+                    grid[self.weekday_map[rule.weekday]][column_idx] += 1
                     continue
 
                 # 如果不是周任务，检查是否为“每1天”的日度任务
-                if "every().days" in rule:
-                    # 仅统计周一到周五
+                if rule.unit == "days" and rule.interval == 1:
                     for day_idx in range(7):
                         grid[day_idx][column_idx] += 1
 
@@ -0,0 +1,255 @@
+#!/user/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from loguru import logger
+from PIL import Image
+
+
+def render_thumbnail(src_path, cache_dir, size):
+    """
+    在工作进程中生成缩略图，返回缩略图路径。
+    缩略图按源文件内容的 SHA-256 命名（内容相同的图片共用一个缩略图），已存在时直接返回。
+    """
+    digest = hashlib.sha256()
+    with open(src_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    name = f"{digest.hexdigest()}_{size[0]}x{size[1]}.png"
+    dest_path = os.path.join(cache_dir, name[:2], name)
+    if os.path.exists(dest_path):
+        return dest_path
+
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    with Image.open(src_path) as image:
+        # JPEG 可以直接按缩小后的尺寸解码，大截图不必解码全部像素
+        image.draft("RGB", size)
+        image.thumbnail(size)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+        image.save(tmp_path, "PNG")
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+class ThumbnailCache:
+    """
+    图片笔记的缩略图：在进程池中用 Pillow 生成固定大小的缩略图，界面线程从不解码原图。
+    缩略图保存在按内容寻址的缓存目录中（thumbnails/，与 config.json 同目录），
+    总大小超过 max_bytes 时按最近使用时间淘汰；(笔记名, 修改时间, 大小) 到缩略图的映射保存在 index.json 中，
+    重启后不需要重新读取原图。索引修改后延迟 save_delay 秒保存，期间的其他修改合并到同一次写入。
+    """
+
+    INDEX_FILE = "index.json"
+    # 淘汰时删除到上限的这个比例以下，避免每生成一张就淘汰一次
+    EVICT_TO_RATIO = 0.8
+
+    def __init__(self, cache_dir, size=128, max_bytes=64 * 1024 * 1024, workers=2, save_delay=5.0):
+        self.cache_dir = cache_dir
+        self.size = (size, size)
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._executor = None
+        self._pending = {}
+        self._index = None
+        self._index_dirty = False
+        self.save_delay = save_delay
+        self._save_timer = None
+        self._total_bytes = None
+        self._closed = False
+
+    def _load_index(self):
+        """调用方需持有锁"""
+        if self._index is not None:
+            return
+        self._index = {}
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        # 修改过缩略图尺寸后，旧尺寸的缩略图不再使用
+        suffix = f"_{self.size[0]}x{self.size[1]}.png"
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for name, mtime, size, thumb_name in json.load(f):
+                    if thumb_name.endswith(suffix):
+                        self._index[(name, mtime, size)] = thumb_name
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"读取缩略图索引失败: {e}")
+
+    def get(self, record, get_path, callback=None, timeout=None):
+        """
+        返回 NoteRecord 对应图片的缩略图路径。
+        缓存中没有时提交到进程池生成，并立即返回 None（timeout 不为 None 时最多等待 timeout 秒）；
+        生成完成后在后台线程中调用 callback(缩略图路径)，失败时不调用。
+        :param get_path: 返回原图路径的函数，只在需要生成缩略图时调用
+        """
+        key = (record.name, record.mtime, record.size)
+        with self._lock:
+            self._load_index()
+            thumb_name = self._index.get(key)
+            if thumb_name:
+                thumb_path = os.path.join(self.cache_dir, thumb_name)
+                try:
+                    # 用修改时间记录最近一次使用，淘汰时按它排序
+                    os.utime(thumb_path)
+                    return thumb_path
+                except OSError:
+                    # 已被淘汰
+                    del self._index[key]
+                    self._mark_index_dirty()
+
+            future = self._pending.get(key)
+            submitted = future is None
+            if submitted and self._closed:
+                # 退出过程中不再创建进程池
+                return None
+            if submitted:
+                src_path = get_path()
+                if not src_path:
+                    return None
+                try:
+                    if self._executor is None:
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    future = self._executor.submit(render_thumbnail, src_path, self.cache_dir, self.size)
+                except (BrokenProcessPool, RuntimeError) as e:
+                    # 工作进程意外退出后进程池不可再用，下次请求时重新创建
+                    logger.error(f"提交缩略图任务失败: {e}")
+                    self._executor = None
+                    return None
+                self._pending[key] = future
+
+        # 任务可能已经完成，回调会在当前线程中立即执行，因此在锁外注册
+        if submitted:
+            future.add_done_callback(lambda f: self._on_done(key, f))
+        if callback is not None:
+            future.add_done_callback(lambda f: self._notify(f, callback))
+        if timeout is None:
+            return None
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            return None
+        except Exception:
+            # 失败原因已在 _on_done 中记录
+            return None
+
+    @staticmethod
+    def _notify(future, callback):
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            callback(future.result())
+        except Exception as e:
+            logger.error(f"处理缩略图回调失败: {e}")
+
+    def _on_done(self, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.cancelled():
+                return
+            try:
+                thumb_path = future.result()
+            except Exception as e:
+                logger.warning(f"生成笔记 '{key[0]}' 的缩略图失败: {e}")
+                return
+            self._index[key] = os.path.relpath(thumb_path, self.cache_dir)
+            self._mark_index_dirty()
+            if self._total_bytes is not None:
+                try:
+                    self._total_bytes += os.path.getsize(thumb_path)
+                except OSError:
+                    pass
+        self._evict_if_needed()
+
+    def _evict_if_needed(self):
+        """缓存目录超过 max_bytes 时，按最近使用时间删除最旧的缩略图"""
+        with self._lock:
+            if self._total_bytes is not None and self._total_bytes <= self.max_bytes:
+                return
+            files = []
+            for dir_path, _, filenames in os.walk(self.cache_dir):
+                for filename in filenames:
+                    if not filename.endswith(".png"):
+                        continue
+                    path = os.path.join(dir_path, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+            self._total_bytes = sum(size for _, size, _ in files)
+            if self._total_bytes <= self.max_bytes:
+                return
+            target = self.max_bytes * self.EVICT_TO_RATIO
+            evicted = set()
+            for _, size, path in sorted(files):
+                if self._total_bytes <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                # Windows 通知使用的 .ico 副本
+                ico_path = os.path.splitext(path)[0] + ".ico"
+                if os.path.exists(ico_path):
+                    try:
+                        os.remove(ico_path)
+                    except OSError:
+                        pass
+                self._total_bytes -= size
+                evicted.add(os.path.relpath(path, self.cache_dir))
+            self._index = {key: name for key, name in self._index.items() if name not in evicted}
+            self._index_dirty = True
+            logger.info(f"缩略图缓存超过上限，已删除 {len(evicted)} 个最久未使用的缩略图。")
+        # 被删除的缩略图立即从索引文件中移除
+        self.save_index()
+
+    def _mark_index_dirty(self):
+        """调用方需持有锁。标记索引已修改，在 save_delay 秒后统一保存"""
+        self._index_dirty = True
+        if self._save_timer is None and not self._closed:
+            self._save_timer = threading.Timer(self.save_delay, self._save_on_timer)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save_on_timer(self):
+        with self._lock:
+            self._save_timer = None
+        self.save_index()
+
+    def save_index(self):
+        # 定时保存和淘汰后的保存可能同时进行，写入按取快照的顺序依次完成，旧快照不会覆盖新快照
+        with self._save_lock:
+            with self._lock:
+                if not self._index_dirty:
+                    return
+                entries = [[*key, name] for key, name in self._index.items()]
+                self._index_dirty = False
+            index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+            tmp_path = index_path + ".tmp"
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_path, index_path)
+            except OSError as e:
+                logger.warning(f"保存缩略图索引失败: {e}")
+
+    def close(self):
+        """保存索引并关闭进程池（不等待尚未完成的缩略图）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            timer, self._save_timer = self._save_timer, None
+            self._closed = True
+        if timer is not None:
+            timer.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.save_index()
@@ -2,12 +2,16 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
+import threading
 import tkinter as tk
 from tkinter import messagebox
 
 import customtkinter as ctk
 from loguru import logger
+from PIL import Image
 
+from note_manager import parse_note_sources
+from schedule_rules import RuleParseError
 from task_analyzer import TaskAnalyzer
 from ui.left_panel import LeftPanel
 from ui.settings_panel import SettingsPanel
@@ -27,6 +31,17 @@ class App(ctk.CTk):
         self.note_manager = note_manager
         self.scheduler_service = scheduler_service
         self.selected_note = None
+        # 列表框中选中的全部笔记（按住 Ctrl/Shift 可多选），selected_note 为其中第一个
+        self.selected_notes = []
+        self._note_index = {}
+        self._thumbnail_image = None
+        # 当前的搜索词，非空时列表框只显示搜索结果
+        self._search_query = ""
+        self._search_after_id = None
+        # 笔记文件已不存在、也找不到重命名后文件的调度，等待用户确认后批量清除
+        self._dangling_schedules = []
+        # 退出时需要先停止的监视线程（ConfigWatcher、NoteWatcher），由 main.py 在创建后注册
+        self.watchers = []
         self.task_analyzer = TaskAnalyzer(self.config_manager)
 
         self._save_geometry_after_id = None
@@ -82,29 +97,159 @@ class App(ctk.CTk):
 
         # --- 初始化 ---
         self.settings_frame.load_settings_to_gui()
-        self.refresh_notes_list()
+        self.load_notes_list()
         self.schedule_frame.hide_schedule_widgets()  # 默认隐藏
 
-    def refresh_notes_list(self):
+    def _apply_scan_settings(self):
         self.note_manager.data_folder = self.settings_frame.entry_data_folder.get()
-        notes = self.note_manager.scan_notes()
-        self.left_frame.notes_listbox.delete(0, tk.END)
-        for note in notes:
-            self.left_frame.notes_listbox.insert(tk.END, note)
+        self.note_manager.max_depth = self.config_manager.get_setting("scan_max_depth", 0)
+        self.note_manager.ignore_patterns = self.config_manager.get_setting("scan_ignore_patterns", [])
+        self.note_manager.workers = self.config_manager.get_setting("scan_workers", 4)
+        self.note_manager.extra_sources = parse_note_sources(self.config_manager.get_setting("note_sources", []))
+
+    def load_notes_list(self):
+        """启动时先显示扫描索引中的笔记，再在后台线程中重新校验，差异通过 on_notes_changed 更新"""
+        self._apply_scan_settings()
+        records = self.note_manager.load_index()
+        if records is None:
+            self.refresh_notes_list()
+            return
+        notes = [record.name for record in records]
+        self.config_manager.sync_notes(notes)
+        self._populate_notes_listbox(notes)
+        threading.Thread(target=self._revalidate_notes, name="note-revalidate", daemon=True).start()
+
+    def _revalidate_notes(self):
+        try:
+            changes = self.note_manager.revalidate()
+        except Exception as e:
+            logger.error(f"校验笔记扫描索引失败: {e}")
+            return
+        if changes:
+            self.after(0, self.on_notes_changed, changes)
+        else:
+            self._reconcile_schedules()
 
-        self._update_listbox_colors()
+    def refresh_notes_list(self):
+        self._apply_scan_settings()
+        notes = [record.name for record in self.note_manager.scan_notes()]
+        self.config_manager.sync_notes(notes)
+        self._search_query = ""
+        self.left_frame.entry_search.delete(0, tk.END)
+        self._populate_notes_listbox(notes)
+        self._clear_selection()
+        self._reconcile_schedules()
+
+    def _reconcile_schedules(self):
+        """在后台线程中为失效的调度查找被重命名或移动的笔记，结果在主线程中应用（可在任意线程中调用）"""
+        scheduled = self.config_manager.get_scheduled_notes()
+
+        def run():
+            try:
+                matches = self.note_manager.reconcile_schedules(scheduled)
+            except Exception as e:
+                logger.error(f"匹配重命名的笔记失败: {e}")
+                return
+            self.after(0, self._apply_schedule_matches, matches)
+
+        threading.Thread(target=run, name="note-identity", daemon=True).start()
+
+    def _apply_schedule_matches(self, matches):
+        self._move_schedules(matches.renamed)
+        scheduled = self.config_manager.get_scheduled_notes()
+        self._dangling_schedules = [name for name in matches.dangling if name in scheduled]
+        if self._dangling_schedules:
+            logger.warning(f"{len(self._dangling_schedules)} 个提醒对应的笔记文件已不存在: "
+                           f"{', '.join(self._dangling_schedules[:10])}")
+        self.left_frame.show_dangling_schedules(len(self._dangling_schedules))
+
+    def _move_schedules(self, renamed):
+        """把重命名或移动前的笔记的调度迁移到新笔记名下（新笔记名已有调度时不覆盖）"""
+        scheduled = self.config_manager.get_scheduled_notes()
+        mapping = {}
+        for old_name, new_name in renamed:
+            if old_name in scheduled and new_name not in scheduled and old_name not in mapping \
+                    and new_name not in mapping:
+                mapping[old_name] = None
+                mapping[new_name] = self.config_manager.get_note_schedule(old_name)
+        if not mapping:
+            return
+        try:
+            change = self.config_manager.set_many_note_schedules(mapping)
+        except RuleParseError as e:
+            logger.error(f"迁移重命名笔记的调度失败: {e}")
+            return
+        logger.info(f"{len(mapping) // 2} 个笔记被重命名或移动，提醒设置已随之迁移。")
+        self._update_listbox_colors(change.notes)
+        self.scheduler_service.apply_config_change(change)
+        if self.selected_note in change.notes:
+            self.on_note_select()
+
+    def prune_dangling_schedules(self):
+        """确认后一次性清除所有失效的调度"""
+        scheduled = self.config_manager.get_scheduled_notes()
+        current = self.note_manager.note_names()
+        dangling = [name for name in self._dangling_schedules if name in scheduled and name not in current]
+        if not dangling:
+            self.left_frame.show_dangling_schedules(0)
+            return
+        preview = "\n".join(dangling[:10]) + ("\n..." if len(dangling) > 10 else "")
+        if not messagebox.askyesno("确认", f"以下 {len(dangling)} 个提醒对应的笔记文件已不存在，确定要清除吗？\n\n{preview}"):
+            return
+        change = self.config_manager.set_many_note_schedules(dict.fromkeys(dangling))
+        self.scheduler_service.apply_config_change(change)
+        self._dangling_schedules = []
+        self.left_frame.show_dangling_schedules(0)
 
+    def _clear_selection(self):
         self.schedule_frame.hide_schedule_widgets()
         self.schedule_frame.label_schedule_title.configure(
             text="提醒设置 (请先在左侧选择一个笔记)"
         )
         self.selected_note = None
+        self.selected_notes = []
+        self._show_note_info()
+
+    def on_search_changed(self, event=None):
+        """搜索框内容变化后稍等片刻再搜索，避免每输入一个字都查询一次"""
+        if self._search_after_id:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(150, self._apply_search)
+
+    def _apply_search(self):
+        self._search_after_id = None
+        query = self.left_frame.entry_search.get().strip()
+        if query == self._search_query:
+            return
+        self._search_query = query
+        if query:
+            notes = self.note_manager.search(query)
+        else:
+            notes = [record.name for record in self.note_manager.notes]
+        self._populate_notes_listbox(notes)
+        self._clear_selection()
+
+    def _populate_notes_listbox(self, notes):
+        """用笔记列表重新填充左侧列表框，并按是否存在调度设置背景色"""
+        self.left_frame.notes_listbox.delete(0, tk.END)
+        for note in notes:
+            self.left_frame.notes_listbox.insert(tk.END, note)
+        self._note_index = {note: i for i, note in enumerate(notes)}
+
+        self._update_listbox_colors()
 
-    def _update_listbox_colors(self):
-        """遍历列表中的所有项目，并根据是否存在调度来设置背景色"""
-        all_notes = self.left_frame.notes_listbox.get(0, tk.END)
-        for i, note_name in enumerate(all_notes):
-            if self.config_manager.get_note_schedule(note_name):
+    def _update_listbox_colors(self, notes=None):
+        """
+        根据是否存在调度设置列表项的背景色。
+        :param notes: 只更新这些笔记（如一次批量修改涉及的笔记），默认更新全部
+        """
+        if notes is None:
+            items = enumerate(self.left_frame.notes_listbox.get(0, tk.END))
+        else:
+            items = ((self._note_index[note], note) for note in notes if note in self._note_index)
+        scheduled_notes = self.config_manager.get_scheduled_notes()
+        for i, note_name in items:
+            if note_name in scheduled_notes:
                 self.left_frame.notes_listbox.itemconfig(i, bg=self.SCHEDULED_BG_COLOR)
             else:
                 self.left_frame.notes_listbox.itemconfig(i, bg=self.DEFAULT_BG_COLOR)
@@ -114,16 +259,117 @@ class App(ctk.CTk):
         if not selection_indices:
             return
 
-        selected_index = selection_indices[0]
-        self.selected_note = self.left_frame.notes_listbox.get(selected_index)
+        self.selected_notes = [self.left_frame.notes_listbox.get(i) for i in selection_indices]
+        self.selected_note = self.selected_notes[0]
 
-        self.schedule_frame.label_schedule_title.configure(
-            text=f"设置: {self.selected_note}"
-        )
+        if len(self.selected_notes) > 1:
+            title = f"设置: {self.selected_note} 等 {len(self.selected_notes)} 个笔记"
+        else:
+            title = f"设置: {self.selected_note}"
+        self.schedule_frame.label_schedule_title.configure(text=title)
         self.schedule_frame.show_schedule_widgets()
-
-        schedule_info = self.config_manager.get_note_schedule(self.selected_note)
-        self.schedule_frame.parse_and_load_schedule_rule(schedule_info)
+        self._show_note_info()
+
+        try:
+            compiled = self.config_manager.get_compiled_schedule(self.selected_note)
+        except RuleParseError as e:
+            logger.warning(f"笔记 '{self.selected_note}' 的调度规则无效，将显示默认设置。错误: {e}")
+            compiled = None
+        self.schedule_frame.parse_and_load_schedule_rule(compiled)
+
+    def _show_note_info(self):
+        """在列表下方显示当前笔记的元数据，图片笔记另外显示缩略图"""
+        self._thumbnail_image = None
+        self.left_frame.label_note_info.configure(image=None)
+        if len(self.selected_notes) != 1:
+            self.left_frame.label_note_info.configure(text=f"已选择 {len(self.selected_notes)} 个笔记"
+                                                      if self.selected_notes else "")
+            return
+        metadata = self.note_manager.get_metadata(self.selected_note)
+        lines = [metadata.describe(), metadata.preview] if metadata else []
+        self.left_frame.label_note_info.configure(text="\n".join(line for line in lines if line))
+
+        # 缩略图在后台进程中生成，完成后切回主线程显示
+        note = self.selected_note
+        thumb_path = self.note_manager.get_thumbnail(
+            note, callback=lambda path: self.after(0, self._show_thumbnail, note, path))
+        if thumb_path:
+            self._show_thumbnail(note, thumb_path)
+
+    def _show_thumbnail(self, note, thumb_path):
+        """显示缩略图（需在主线程中调用）；选中的笔记已经改变时忽略"""
+        if self.selected_notes != [note]:
+            return
+        try:
+            with Image.open(thumb_path) as image:
+                image.load()
+                self._thumbnail_image = ctk.CTkImage(light_image=image, dark_image=image, size=image.size)
+        except OSError as e:
+            logger.warning(f"加载缩略图失败: {e}")
+            return
+        self.left_frame.label_note_info.configure(image=self._thumbnail_image, compound="top")
+
+    def on_config_changed(self, change):
+        """配置文件被外部修改后，只刷新受影响的界面部分（需在主线程中调用）"""
+        if change.settings & {"data_folder", "md_editor_path", "img_editor_path"}:
+            self.settings_frame.load_settings_to_gui()
+        if change.settings & {"data_folder", "note_sources", "scan_max_depth", "scan_ignore_patterns", "scan_workers"}:
+            self.refresh_notes_list()
+            return
+        if change.notes:
+            self._update_listbox_colors(change.notes)
+            if self.selected_note in change.notes:
+                self.on_note_select()
+
+    def on_notes_changed(self, changes):
+        """数据文件夹中的笔记有增删或重命名时，原地更新列表框（需在主线程中调用）"""
+        self.config_manager.sync_notes([record.name for record in self.note_manager.notes])
+        if self._search_query:
+            # 正在显示搜索结果：重新搜索（全文索引在后台更新，稍后再次刷新时会包含新内容）
+            self._search_query = ""
+            self._apply_search()
+            self._update_schedules_for(changes)
+            return
+        listbox = self.left_frame.notes_listbox
+        # 列表可能已被一次完整刷新更新过，忽略已经反映在列表中的变化
+        removed = [self._note_index[name] for name in changes.removed if name in self._note_index]
+        for i in sorted(removed, reverse=True):
+            listbox.delete(i)
+        renamed = {}
+        if removed:
+            self._note_index = {note: i for i, note in enumerate(listbox.get(0, tk.END))}
+        for old_name, record in changes.renamed:
+            i = self._note_index.get(old_name)
+            if i is None or record.name in self._note_index:
+                continue
+            listbox.delete(i)
+            listbox.insert(i, record.name)
+            del self._note_index[old_name]
+            self._note_index[record.name] = i
+            renamed[old_name] = record.name
+        for record in changes.added:
+            if record.name not in self._note_index:
+                listbox.insert(tk.END, record.name)
+                self._note_index[record.name] = listbox.size() - 1
+
+        self._update_listbox_colors(
+            list(renamed.values()) + [record.name for record in changes.added])
+
+        selected = [renamed.get(note, note) for note in self.selected_notes]
+        selected = [note for note in selected if note in self._note_index]
+        if not selected:
+            if self.selected_notes:
+                self._clear_selection()
+        elif selected != self.selected_notes:
+            self.selected_notes = selected
+            self.selected_note = selected[0]
+            self._show_note_info()
+        self._update_schedules_for(changes)
+
+    def _update_schedules_for(self, changes):
+        """监视到的重命名直接迁移调度，其余（如改名后又修改了内容、程序未运行时的移动）由身份索引匹配"""
+        self._move_schedules(changes.renamed)
+        self._reconcile_schedules()
 
     def open_note_with_editor(self):
         """使用配置的编辑器打开当前选中的笔记"""
@@ -131,13 +377,11 @@ class App(ctk.CTk):
             messagebox.showwarning("警告", "请先从左侧选择一个笔记。")
             return
 
-        data_folder = self.config_manager.get_setting("data_folder")
-        if not data_folder:
-            logger.error("无法打开文件，因为数据文件夹未设置。")
-            messagebox.showerror("错误", "数据文件夹未设置。")
+        file_path = self.note_manager.get_note_path(self.selected_note)
+        if not file_path:
+            logger.error(f"无法打开文件，笔记来源未设置或笔记路径无效: {self.selected_note}")
+            messagebox.showerror("错误", f"数据文件夹未设置或笔记路径无效: {self.selected_note}")
             return
-
-        file_path = os.path.join(data_folder, self.selected_note)
         if not os.path.exists(file_path):
             logger.error(f"无法打开文件，文件不存在: {file_path}")
             messagebox.showerror("错误", f"文件不存在: {self.selected_note}")
@@ -181,7 +425,12 @@ class App(ctk.CTk):
             self._save_geometry_after_id = None
 
         self._save_geometry()
-        icon.stop()
+        # 先停止会修改配置或读取笔记的后台线程，再写入所有尚未保存的配置修改，最后关闭笔记的缓存和进程池
+        for watcher in self.watchers:
+            watcher.stop()
         self.scheduler_service.stop()
+        self.config_manager.flush()
+        self.note_manager.close()
+        icon.stop()
         self.quit()
         sys.exit()
\ No newline at end of file
@@ -16,21 +16,31 @@ class LeftPanel(ctk.CTkFrame):
         super().__init__(master, corner_radius=0)
         self.app = app
 
-        self.grid_rowconfigure(1, weight=1)
+        self.grid_rowconfigure(2, weight=1)
         self.grid_columnconfigure(0, weight=1)
 
         self.label_notes = ctk.CTkLabel(self, text="笔记列表", font=ctk.CTkFont(size=16, weight="bold"))
         self.label_notes.grid(row=0, column=0, padx=20, pady=(20, 10))
 
+        # 全文搜索：输入后只列出内容或标题匹配的笔记，清空后恢复完整列表
+        self.entry_search = ctk.CTkEntry(self, placeholder_text="搜索笔记内容...")
+        self.entry_search.grid(row=1, column=0, sticky="ew", padx=10)
+        self.entry_search.bind("<KeyRelease>", self.app.on_search_changed)
+
         self.notes_listbox = tk.Listbox(self, bg=self.app.DEFAULT_BG_COLOR, fg="white",
-                                        selectbackground="#1f6aa5",
+                                        selectbackground="#1f6aa5", selectmode=tk.EXTENDED,
                                         borderwidth=0, highlightthickness=0, font=("Segoe UI", 12))
-        self.notes_listbox.grid(row=1, column=0, sticky='nsew', padx=10, pady=10)
+        self.notes_listbox.grid(row=2, column=0, sticky='nsew', padx=10, pady=10)
         self.notes_listbox.bind("<<ListboxSelect>>", self.app.on_note_select)
 
+        # 选中笔记的元数据（标题、字数和预览，或图片尺寸）
+        self.label_note_info = ctk.CTkLabel(self, text="", anchor="w", justify="left", wraplength=220,
+                                            text_color="gray70")
+        self.label_note_info.grid(row=3, column=0, sticky="ew", padx=12)
+
         # --- 左侧底部按钮框架 ---
         self.left_bottom_frame = ctk.CTkFrame(self, fg_color="transparent")
-        self.left_bottom_frame.grid(row=2, column=0, padx=20, pady=10, sticky="ew")
+        self.left_bottom_frame.grid(row=4, column=0, padx=20, pady=10, sticky="ew")
         self.left_bottom_frame.grid_columnconfigure(0, weight=1)
         self.left_bottom_frame.grid_columnconfigure(1, weight=1)
 
@@ -41,6 +51,18 @@ class LeftPanel(ctk.CTkFrame):
                                                   command=self.open_data_folder)
         self.btn_open_data_folder.grid(row=0, column=1, padx=(5, 0), sticky="ew")
 
+        # 笔记文件已不存在、也找不到重命名后文件的调度，有这样的调度时才显示
+        self.btn_prune_schedules = ctk.CTkButton(self.left_bottom_frame, text="", fg_color="#8B4513",
+                                                 command=self.app.prune_dangling_schedules)
+
+    def show_dangling_schedules(self, count):
+        """显示或隐藏清理失效调度的按钮"""
+        if count:
+            self.btn_prune_schedules.configure(text=f"清理 {count} 个失效提醒")
+            self.btn_prune_schedules.grid(row=1, column=0, columnspan=2, pady=(10, 0), sticky="ew")
+        else:
+            self.btn_prune_schedules.grid_remove()
+
     def open_data_folder(self):
         """打开数据文件夹"""
         folder_path = self.app.settings_frame.entry_data_folder.get()
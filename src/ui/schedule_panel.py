@@ -1,9 +1,10 @@
 #!/user/bin/env python3
 # -*- coding: utf-8 -*-
-import re
 from tkinter import messagebox
 import customtkinter as ctk
 
+from schedule_rules import ScheduleRule
+
 
 # 用于显示鼠标悬浮提示的辅助类
 class Tooltip:
@@ -287,53 +288,29 @@ class SchedulePanel(ctk.CTkFrame):
             self.weekday_frame.grid_forget()
             self.time_frame.grid_forget()
 
-    def parse_and_load_schedule_rule(self, schedule_info):
-        """解析存储的规则字符串或列表并更新GUI"""
+    def parse_and_load_schedule_rule(self, compiled):
+        """根据编译后的调度配置（CompiledSchedule）更新GUI"""
         self.reset_schedule_gui()
 
-        if not schedule_info or "schedule" not in schedule_info:
+        if not compiled or not compiled.rules:
             return
 
-        self.mode_var.set(schedule_info.get("mode", "popup"))
-        rule = schedule_info.get("schedule", "")
+        self.mode_var.set(compiled.mode or "popup")
+        first_rule = compiled.rules[0]
 
-        if isinstance(rule, list) and rule:
+        if any(rule.weekday for rule in compiled.rules):
             self.unit_var.set("周")
             self.interval_var.set("1")
-
-            time_match = re.search(r"at\(['\"](\d{1,2}:\d{2})['\"]\)", rule[0])
-            if time_match:
-                hour, minute = time_match.group(1).split(":")
-                self.hour_var.set(f"{int(hour):02d}")
-                self.minute_var.set(f"{int(minute):02d}")
-
-            for sub_rule in rule:
-                for day_en in self.weekday_map.values():
-                    if f".{day_en}" in sub_rule:
-                        self.weekday_vars[day_en].set(True)
-
-        elif isinstance(rule, str) and rule:
-            interval_match = re.search(r"every\((\d*)\)", rule)
-            self.interval_var.set(interval_match.group(1) if interval_match and interval_match.group(1) else "1")
-
-            unit_match = re.search(r"\.(" + "|".join(self.unit_map.values()) + r")", rule)
-            if unit_match and unit_match.group(1) in self.unit_map_rev:
-                self.unit_var.set(self.unit_map_rev[unit_match.group(1)])
-            else:
-                self.unit_var.set("天")
-
-            if self.unit_var.get() == "周":
-                weekday_match = re.search(r"\.(" + "|".join(self.weekday_map.values()) + r")", rule)
-                if weekday_match and weekday_match.group(1) in self.weekday_map_rev:
-                    self.weekday_vars[weekday_match.group(1)].set(True)
-
-            time_match = re.search(r"at\(['\"](\d{1,2}:\d{2})['\"]\)", rule)
-            if time_match:
-                hour, minute = time_match.group(1).split(":")
-                self.hour_var.set(f"{int(hour):02d}")
-                self.minute_var.set(f"{int(minute):02d}")
+            for rule in compiled.rules:
+                if rule.weekday in self.weekday_vars:
+                    self.weekday_vars[rule.weekday].set(True)
         else:
-            return
+            self.interval_var.set(str(first_rule.interval))
+            self.unit_var.set(self.unit_map_rev.get(first_rule.unit, "天"))
+
+        if first_rule.at_time:
+            self.hour_var.set(f"{first_rule.hour:02d}")
+            self.minute_var.set(f"{first_rule.minute:02d}")
 
         self.on_unit_change()
 
@@ -361,34 +338,36 @@ class SchedulePanel(ctk.CTkFrame):
                 messagebox.showwarning("警告", "选择“周”为单位时，必须选择至少一个星期几。")
                 return
 
-            hour = self.hour_var.get()
-            minute = self.minute_var.get()
-            time_part = f".at('{hour}:{minute}')"
-
-            rules = [f"every().{day_en}{time_part}" for day_en in selected_weekdays]
-            schedule_info = {"mode": self.mode_var.get(), "schedule": rules}
+            at_time = f"{self.hour_var.get()}:{self.minute_var.get()}"
+            rules = [ScheduleRule(interval=1, unit="weeks", weekday=day_en, at_time=at_time)
+                     for day_en in selected_weekdays]
+            schedule_info = {"mode": self.mode_var.get(), "schedule": [rule.to_dict() for rule in rules]}
         else:
-            unit_val = self.unit_map[unit_key]
-            rule_parts = [f"every({interval if interval > 1 else ''})", f".{unit_val}"]
-
+            at_time = None
             if unit_key == "天":
-                hour = self.hour_var.get()
-                minute = self.minute_var.get()
-                rule_parts.append(f".at('{hour}:{minute}')")
+                at_time = f"{self.hour_var.get()}:{self.minute_var.get()}"
 
-            schedule_info = {"mode": self.mode_var.get(), "schedule": "".join(rule_parts)}
+            rule = ScheduleRule(interval=interval, unit=self.unit_map[unit_key], at_time=at_time)
+            schedule_info = {"mode": self.mode_var.get(), "schedule": [rule.to_dict()]}
 
-        self.app.config_manager.set_note_schedule(self.app.selected_note, schedule_info)
-        self.app._update_listbox_colors()
-        self.app.scheduler_service.reload_schedules()
+        # 多选时把同一规则一次性应用到所有选中的笔记
+        notes = self.app.selected_notes or [self.app.selected_note]
+        change = self.app.config_manager.set_many_note_schedules({note: schedule_info for note in notes})
+        self.app._update_listbox_colors(change.notes)
+        self.app.scheduler_service.apply_config_change(change)
 
     def clear_current_schedule(self):
         if not self.app.selected_note:
             messagebox.showwarning("警告", "请先从左侧选择一个笔记。")
             return
 
-        if messagebox.askyesno("确认", f"确定要清除 '{self.app.selected_note}' 的所有提醒设置吗？"):
-            self.app.config_manager.set_note_schedule(self.app.selected_note, None)
+        notes = self.app.selected_notes or [self.app.selected_note]
+        if len(notes) > 1:
+            prompt = f"确定要清除选中的 {len(notes)} 个笔记的所有提醒设置吗？"
+        else:
+            prompt = f"确定要清除 '{self.app.selected_note}' 的所有提醒设置吗？"
+        if messagebox.askyesno("确认", prompt):
+            change = self.app.config_manager.set_many_note_schedules(dict.fromkeys(notes))
             self.reset_schedule_gui()
-            self.app._update_listbox_colors()
-            self.app.scheduler_service.reload_schedules()
\ No newline at end of file
+            self.app._update_listbox_colors(change.notes)
+            self.app.scheduler_service.apply_config_change(change)
\ No newline at end of file
@@ -74,6 +74,9 @@ class SettingsPanel(ctk.CTkFrame):
         self.browse_file(self.entry_img_editor)
 
     def load_settings_to_gui(self):
+        self.entry_data_folder.delete(0, tk.END)
+        self.entry_md_editor.delete(0, tk.END)
+        self.entry_img_editor.delete(0, tk.END)
         self.entry_data_folder.insert(0, self.app.config_manager.get_setting("data_folder", ""))
         self.entry_md_editor.insert(0, self.app.config_manager.get_setting("md_editor_path", ""))
         self.entry_img_editor.insert(0, self.app.config_manager.get_setting("img_editor_path", ""))
@@ -0,0 +1,119 @@
+import datetime
+import json
+
+import pytest
+
+from clocks import VirtualClock
+from config_manager import ConfigManager, ConfigSnapshot
+from note_manager import NoteManager
+from notifiers import RecordingBackend
+from scheduler_service import SchedulerService
+
+START = datetime.datetime(2026, 1, 5, 0, 0)
+HOURLY = {"mode": "light", "schedule": [{"interval": 1, "unit": "hours"}]}
+DAILY = {"mode": "popup", "schedule": [{"interval": 1, "unit": "days", "at": "08:00"}]}
+
+
+@pytest.fixture
+def make_service(tmp_path):
+    services = []
+
+    def make(policy, digest_window=0, max_per_note=10):
+        config = json.loads(json.dumps(ConfigManager.default_config))
+        config["settings"].update({
+            "catchup_policy": policy,
+            "catchup_max_per_note": max_per_note,
+            "digest_window_seconds": digest_window,
+            "dispatch_workers": 0,
+            "max_reminders_per_minute": 0,
+            "max_reminders_per_hour": 0,
+        })
+        config["notes_schedule"] = {"a.md": HOURLY, "b.md": DAILY}
+        config_path = tmp_path / "config.json"
+        config_path.write_text(json.dumps(config), encoding='utf-8')
+
+        clock = VirtualClock(START)
+        service = SchedulerService(ConfigSnapshot(str(config_path)), NoteManager(None), clock=clock,
+                                   notifier=RecordingBackend(clock), persist_state=False, check_files=False)
+        service.fired = []
+        service.fire_listeners.append(lambda when, filename, mode: service.fired.append(filename))
+        service.reload_schedules()
+        # 调度服务最后一次存活于 START，之后停机到 08:30
+        service.journal.touch(START)
+        clock.advance_to(START + datetime.timedelta(hours=8, minutes=30))
+        services.append(service)
+        return service
+    yield make
+    for service in services:
+        service.stop()
+
+
+def notifications(service):
+    return [event for event in service.notifier.events if event["kind"] == "notify"]
+
+
+def opened(service):
+    return [event["files"] for event in service.notifier.events if event["kind"] == "open"]
+
+
+def test_once_replays_each_note_once(make_service):
+    service = make_service("once")
+    service._catch_up()
+
+    assert sorted(service.fired) == ["a.md", "b.md"]
+    assert [event["msg"] for event in notifications(service)] == ["是时候回顾一下笔记了：\na.md"]
+    assert opened(service) == [["b.md"]]
+    assert service.stats["replayed"] == 2 and service.stats["dropped"] == 0
+
+
+def test_all_reports_missed_count_without_repeating(make_service):
+    service = make_service("all")
+    service._catch_up()
+
+    # 时间线保留每一次错过的触发
+    assert service.fired.count("a.md") == 8 and service.fired.count("b.md") == 1
+    # 但每个笔记只提醒一次，并注明错过的次数
+    assert [event["msg"] for event in notifications(service)] == ["是时候回顾一下笔记了：\na.md（错过 8 次）"]
+    assert opened(service) == [["b.md"]]
+    assert service.stats["replayed"] == 9
+
+
+def test_all_respects_max_per_note(make_service):
+    service = make_service("all", max_per_note=3)
+    service._catch_up()
+
+    assert service.fired.count("a.md") == 3
+    assert notifications(service)[0]["msg"].endswith("（错过 3 次）")
+
+
+def test_all_with_digest_lists_missed_count(make_service):
+    service = make_service("all", digest_window=30)
+    service._catch_up()
+    assert service.notifier.events == []
+
+    service._flush_digest(force=True)
+    [digest] = notifications(service)
+    assert "a.md（错过 8 次）" in digest["msg"]
+    assert opened(service) == [["b.md"]]
+
+
+def test_drop_discards_and_records_drop_point(make_service):
+    service = make_service("drop")
+    service._catch_up()
+
+    assert service.fired == [] and service.notifier.events == []
+    assert service.stats["dropped"] == 9
+
+    # 丢弃的时间点已记录，之后的补发不会再次统计
+    service.clock.advance_to(START + datetime.timedelta(hours=8, minutes=40))
+    service._catch_up()
+    assert service.stats["dropped"] == 9
+
+
+def test_catch_up_is_not_repeated(make_service):
+    service = make_service("once")
+    service._catch_up()
+    service.clock.advance_to(START + datetime.timedelta(hours=8, minutes=45))
+    service._catch_up()
+    assert sorted(service.fired) == ["a.md", "b.md"]
+    assert service.stats["replayed"] == 2
@@ -0,0 +1,136 @@
+import json
+import os
+
+import pytest
+
+from config_manager import ConfigManager
+from config_watcher import ConfigWatcher
+
+DAILY = {"mode": "light", "schedule": [{"interval": 1, "unit": "days", "at": "08:00"}]}
+WEEKLY = {"mode": "popup", "schedule": [{"interval": 1, "unit": "weeks", "weekday": "monday"}]}
+HOURLY = {"mode": "light", "schedule": [{"interval": 3, "unit": "hours"}]}
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = str(tmp_path / "config.json")
+    config = json.loads(json.dumps(ConfigManager.default_config))
+    config["settings"]["data_folder"] = "/notes"
+    config["notes_schedule"] = {"a.md": DAILY, "b.md": WEEKLY}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return path
+
+
+@pytest.fixture
+def manager(config_path):
+    manager = ConfigManager(config_path, save_delay=60)
+    yield manager
+    manager.schedule_journal.close()
+
+
+def write_externally(path, content):
+    """模拟外部程序写入 config.json，并确保文件签名发生变化"""
+    stat = os.stat(path)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def edit_externally(path, edit):
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    edit(config)
+    write_externally(path, json.dumps(config, indent=2))
+    return config
+
+
+def test_unchanged_file_is_ignored(manager):
+    assert manager.reload_external() is None
+
+
+def test_own_write_is_not_treated_as_external(manager):
+    manager.set_setting("autostart", True)
+    manager.flush()
+    assert manager.reload_external() is None
+
+
+def test_external_edits_are_merged(manager, config_path):
+    manager.set_note_schedule("c.md", HOURLY)
+
+    def edit(config):
+        config["settings"]["data_folder"] = "/elsewhere"
+        config["notes_schedule"]["a.md"] = HOURLY
+        del config["notes_schedule"]["b.md"]
+        config["notes_schedule"]["d.md"] = WEEKLY
+    edit_externally(config_path, edit)
+
+    change = manager.reload_external()
+    assert change.settings == {"data_folder"}
+    assert change.notes == {"a.md", "b.md", "d.md"}
+    assert change.conflicts == []
+    assert manager.get_setting("data_folder") == "/elsewhere"
+    # 程序内新增的 c.md 不受影响
+    assert manager.get_all_note_schedules() == {"a.md": HOURLY, "c.md": HOURLY, "d.md": WEEKLY}
+    assert not os.path.exists(config_path + ".conflict")
+    assert manager.reload_external() is None
+
+
+def test_conflicting_edits_keep_local_value(manager, config_path):
+    manager.set_setting("data_folder", "/local")
+    manager.set_note_schedule("a.md", WEEKLY)
+
+    def edit(config):
+        config["settings"]["data_folder"] = "/remote"
+        config["settings"]["autostart"] = True
+        config["notes_schedule"]["a.md"] = HOURLY
+    remote = edit_externally(config_path, edit)
+
+    change = manager.reload_external()
+    assert sorted(change.conflicts) == ["notes_schedule.a.md", "settings.data_folder"]
+    # 没有冲突的外部修改照常合并
+    assert change.settings == {"autostart"}
+    assert manager.get_setting("autostart") is True
+    assert manager.get_setting("data_folder") == "/local"
+    assert manager.get_note_schedule("a.md") == WEEKLY
+    with open(config_path + ".conflict", encoding='utf-8') as f:
+        assert json.load(f) == remote
+
+    # 合并结果写回文件后不再被当作外部修改
+    manager.flush()
+    assert manager.reload_external() is None
+    with open(config_path, encoding='utf-8') as f:
+        assert json.load(f)["settings"]["data_folder"] == "/local"
+
+
+def test_identical_edits_on_both_sides_are_not_conflicts(manager, config_path):
+    manager.set_note_schedule("a.md", HOURLY)
+    edit_externally(config_path, lambda config: config["notes_schedule"].update({"a.md": HOURLY}))
+
+    change = manager.reload_external()
+    assert not change
+    assert change.conflicts == []
+    assert manager.get_note_schedule("a.md") == HOURLY
+
+
+def test_half_written_file_is_retried(manager, config_path):
+    with open(config_path, encoding='utf-8') as f:
+        content = f.read()
+    write_externally(config_path, content[:len(content) // 2])
+    assert manager.reload_external() is None
+
+    config = json.loads(content)
+    config["settings"]["autostart"] = True
+    write_externally(config_path, json.dumps(config))
+    assert manager.reload_external().settings == {"autostart"}
+
+
+def test_watcher_notifies_listeners(manager, config_path):
+    watcher = ConfigWatcher(manager, interval=0)
+    changes = []
+    watcher.listeners.append(changes.append)
+    edit_externally(config_path, lambda config: config["notes_schedule"].pop("a.md"))
+
+    assert watcher.check().notes == {"a.md"}
+    assert [change.notes for change in changes] == [{"a.md"}]
+    assert watcher.check() is None
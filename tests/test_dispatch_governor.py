@@ -0,0 +1,103 @@
+import datetime
+
+import pytest
+
+from dispatch_governor import DispatchGovernor, TokenBucket
+
+START = datetime.datetime(2026, 1, 5, 12, 0)
+
+
+def later(**kwargs):
+    return START + datetime.timedelta(**kwargs)
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(2, 60)
+    assert bucket.has_token(START)
+    bucket.take(START)
+    bucket.take(START)
+    assert not bucket.has_token(START)
+    assert bucket.seconds_until_token(START) == pytest.approx(30)
+    assert not bucket.has_token(later(seconds=29))
+    assert bucket.has_token(later(seconds=30))
+    # 补充的令牌不超过容量
+    assert bucket.has_token(later(hours=1))
+    assert bucket.tokens == 2
+
+
+def test_zero_capacity_means_unlimited():
+    bucket = TokenBucket(0, 60)
+    for _ in range(100):
+        bucket.take(START)
+    assert bucket.has_token(START)
+    assert bucket.seconds_until_token(START) == 0
+
+
+def test_rate_limit_defers_and_releases_in_order():
+    governor = DispatchGovernor(per_minute=2, per_hour=0)
+    assert governor.admit([("a.md", "light")], START)
+    assert governor.admit([("b.md", "light")], START)
+    assert not governor.admit([("c.md", "light")], START)
+    assert not governor.admit([("d.md", "popup")], later(seconds=1))
+    # 同一笔记在队列中只保留一条
+    assert not governor.admit([("c.md", "light")], later(seconds=2))
+    stats = governor.get_stats()
+    assert stats["queue_depth"] == 2 and stats["merged"] == 1 and stats["deferred_rate"] == 3
+
+    assert governor.seconds_until_ready(later(seconds=2)) == pytest.approx(28)
+    assert governor.pop_ready(later(seconds=10)) == []
+    assert governor.pop_ready(later(seconds=30)) == [("c.md", "light")]
+    # 队列未清空时新的提醒排在后面
+    assert not governor.admit([("e.md", "light")], later(seconds=60))
+    assert governor.pop_ready(later(seconds=120)) == [("d.md", "popup"), ("e.md", "light")]
+    assert governor.seconds_until_ready(later(seconds=120)) is None
+    assert governor.get_stats()["released"] == 3
+
+
+@pytest.mark.parametrize("now, expected_end", [
+    (datetime.datetime(2026, 1, 5, 23, 30), datetime.datetime(2026, 1, 6, 8, 0)),
+    (datetime.datetime(2026, 1, 6, 7, 59), datetime.datetime(2026, 1, 6, 8, 0)),
+    (datetime.datetime(2026, 1, 6, 8, 0), None),
+    (datetime.datetime(2026, 1, 5, 21, 59), None),
+    (datetime.datetime(2026, 1, 5, 12, 30), datetime.datetime(2026, 1, 5, 13, 0)),
+])
+def test_quiet_hours_windows(now, expected_end):
+    governor = DispatchGovernor(per_minute=0, per_hour=0, quiet_hours=[["22:00", "08:00"], ["12:00", "13:00"]])
+    assert governor.quiet_until(now) == expected_end
+
+
+def test_quiet_hours_defer_until_window_ends():
+    governor = DispatchGovernor(per_minute=0, per_hour=0, quiet_hours=[["22:00", "08:00"]])
+    night = datetime.datetime(2026, 1, 5, 23, 0)
+    assert not governor.admit([("a.md", "light"), ("b.md", "popup")], night)
+    assert governor.get_stats()["deferred_quiet"] == 2
+    assert governor.seconds_until_ready(night) == 9 * 3600
+    assert governor.pop_ready(datetime.datetime(2026, 1, 6, 7, 59)) == []
+    assert governor.pop_ready(datetime.datetime(2026, 1, 6, 8, 0)) == [("a.md", "light"), ("b.md", "popup")]
+
+
+def test_invalid_quiet_hours_are_ignored():
+    governor = DispatchGovernor(quiet_hours=[["22:00"], ["25:00", "08:00"], ["09:00", "10:00"]])
+    assert governor.quiet_hours == [(9 * 60, 10 * 60)]
+
+
+def test_deferred_queue_survives_restart(tmp_path):
+    state_path = str(tmp_path / "dispatch_queue.json")
+    governor = DispatchGovernor(per_minute=1, per_hour=0, state_path=state_path)
+    assert governor.admit([("a.md", "light")], START)
+    assert not governor.admit([("b.md", "light")], later(seconds=1))
+    assert not governor.admit([("c.md", "popup")], later(seconds=2))
+
+    restored = DispatchGovernor(per_minute=1, per_hour=0, state_path=state_path)
+    stats = restored.get_stats()
+    assert stats["queue_depth"] == 2 and stats["deferred"] == 0
+    assert restored.pop_ready(later(minutes=5)) == [("b.md", "light")]
+    assert restored.pop_ready(later(minutes=6)) == [("c.md", "popup")]
+    # 放行后的队列同样会写回文件
+    assert DispatchGovernor(state_path=state_path).get_stats()["queue_depth"] == 0
+
+
+def test_corrupt_queue_file_is_ignored(tmp_path):
+    state_path = tmp_path / "dispatch_queue.json"
+    state_path.write_text("{not json", encoding='utf-8')
+    assert DispatchGovernor(state_path=str(state_path)).get_stats()["queue_depth"] == 0
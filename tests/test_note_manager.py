@@ -0,0 +1,130 @@
+import ntpath
+import os
+
+import pytest
+
+import note_manager
+from note_manager import NoteManager, resolve_note_path
+
+
+def write(path, content=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+@pytest.fixture
+def notes_dir(tmp_path):
+    root = tmp_path / "notes"
+    write(str(root / "a.md"), "# A")
+    write(str(root / "sub" / "b.md"), "# B")
+    write(str(root / "sub" / "deep" / "c.png"))
+    write(str(root / ".hidden" / "d.md"))
+    write(str(root / "notes.txt"))
+    return str(root)
+
+
+@pytest.fixture
+def make_manager():
+    managers = []
+
+    def make(*args, **kwargs):
+        manager = NoteManager(*args, **kwargs)
+        managers.append(manager)
+        return manager
+    yield make
+    for manager in managers:
+        manager.close()
+
+
+def test_resolve_note_path_inside_folder(tmp_path):
+    root = str(tmp_path)
+    assert resolve_note_path(root, "a.md") == os.path.join(root, "a.md")
+    assert resolve_note_path(root, "sub/b.md") == os.path.join(root, "sub", "b.md")
+    assert resolve_note_path(root, "sub/../a.md") == os.path.join(root, "a.md")
+
+
+@pytest.mark.parametrize("note_name", ["../x.md", "sub/../../x.md", "..", ".", "", "/etc/passwd"])
+def test_resolve_note_path_rejects_escapes(tmp_path, note_name):
+    assert resolve_note_path(str(tmp_path), note_name) is None
+
+
+def test_resolve_note_path_requires_data_folder():
+    assert resolve_note_path("", "a.md") is None
+    assert resolve_note_path(None, "a.md") is None
+
+
+@pytest.mark.parametrize("note_name", ["C:x.md", "D:x.md", "C:\\x.md", "\\\\server\\share\\x.md", "..\\x.md"])
+def test_resolve_note_path_rejects_windows_drives(monkeypatch, note_name):
+    monkeypatch.setattr(note_manager.os, "path", ntpath)
+    assert resolve_note_path("C:\\notes", note_name) is None
+    assert resolve_note_path("C:\\notes", "sub/a.md") == "C:\\notes\\sub\\a.md"
+
+
+def test_scan_nested_folders(notes_dir, make_manager):
+    manager = make_manager(notes_dir, max_depth=5, ignore_patterns=[".*"], workers=4)
+    records = manager.scan_notes(sort_by="name")
+    assert [(record.name, record.type) for record in records] == [
+        ("a.md", "markdown"), ("sub/b.md", "markdown"), ("sub/deep/c.png", "image")]
+    assert manager.note_names() == {"a.md", "sub/b.md", "sub/deep/c.png"}
+    assert manager.get_note_path("sub/b.md") == os.path.join(notes_dir, "sub", "b.md")
+
+
+def test_scan_respects_max_depth(notes_dir, make_manager):
+    assert make_manager(notes_dir, max_depth=0, workers=1).note_names() == set()
+    shallow = make_manager(notes_dir, max_depth=1, ignore_patterns=[".*"], workers=1)
+    assert {record.name for record in shallow.scan_notes()} == {"a.md", "sub/b.md"}
+    flat = make_manager(notes_dir, max_depth=0, workers=1)
+    assert {record.name for record in flat.scan_notes()} == {"a.md"}
+
+
+def test_missing_data_folder_yields_no_notes(tmp_path, make_manager):
+    assert make_manager(str(tmp_path / "missing")).scan_notes() == []
+
+
+def test_diff_notes_detects_rename_and_move(notes_dir, make_manager):
+    manager = make_manager(notes_dir, max_depth=5, ignore_patterns=[".*"], workers=1)
+    manager.scan_notes()
+    os.rename(os.path.join(notes_dir, "a.md"), os.path.join(notes_dir, "renamed.md"))
+    os.rename(os.path.join(notes_dir, "sub", "b.md"), os.path.join(notes_dir, "sub", "deep", "b.md"))
+
+    changes = manager.diff_notes(manager.walk(use_cache=False))
+    assert sorted((old_name, record.name) for old_name, record in changes.renamed) == [
+        ("a.md", "renamed.md"), ("sub/b.md", "sub/deep/b.md")]
+    assert changes.added == [] and changes.removed == [] and changes.updated == []
+
+    effective = manager.apply_changes(changes)
+    assert len(effective.renamed) == 2
+    assert manager.note_names() == {"renamed.md", "sub/deep/b.md", "sub/deep/c.png"}
+    # 已经生效的变化不会重复应用
+    assert not manager.apply_changes(changes)
+
+
+def test_diff_notes_added_removed_updated(notes_dir, make_manager):
+    manager = make_manager(notes_dir, max_depth=5, ignore_patterns=[".*"], workers=1)
+    manager.scan_notes()
+    write(os.path.join(notes_dir, "new.md"), "# a brand new note with different size")
+    os.remove(os.path.join(notes_dir, "sub", "deep", "c.png"))
+    write(os.path.join(notes_dir, "a.md"), "# A, edited")
+
+    changes = manager.diff_notes(manager.walk(use_cache=False))
+    assert [record.name for record in changes.added] == ["new.md"]
+    assert changes.removed == ["sub/deep/c.png"]
+    assert [record.name for record in changes.updated] == ["a.md"]
+    assert changes.renamed == []
+
+
+def test_diff_notes_needs_same_type_size_and_mtime(notes_dir, make_manager):
+    manager = make_manager(notes_dir, max_depth=5, ignore_patterns=[".*"], workers=1)
+    manager.scan_notes()
+    old_path = os.path.join(notes_dir, "a.md")
+    stat = os.stat(old_path)
+    os.remove(old_path)
+    # 大小相同但修改时间不同的新文件不是重命名
+    write(os.path.join(notes_dir, "other.md"), "# X")
+    os.utime(os.path.join(notes_dir, "other.md"), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    changes = manager.diff_notes(manager.walk(use_cache=False))
+    assert changes.renamed == []
+    assert changes.removed == ["a.md"]
+    assert [record.name for record in changes.added] == ["other.md"]
@@ -0,0 +1,110 @@
+import json
+import os
+
+from config_manager import ConfigManager
+from schedule_journal import ScheduleJournal
+
+DAILY = {"mode": "light", "schedule": [{"interval": 1, "unit": "days", "at": "08:00"}]}
+WEEKLY = {"mode": "popup", "schedule": [{"interval": 1, "unit": "weeks", "weekday": "monday"}]}
+
+
+def replayed(path):
+    notes_schedule = {}
+    ScheduleJournal(path).replay(notes_schedule)
+    return notes_schedule
+
+
+def test_replay_applies_records_in_order(tmp_path):
+    path = str(tmp_path / "schedule_journal.jsonl")
+    journal = ScheduleJournal(path)
+    journal.record("a.md", DAILY)
+    journal.record_many({"b.md": WEEKLY, "c.md": DAILY})
+    journal.record("a.md", WEEKLY)
+    journal.record("c.md", None)
+    journal.close()
+
+    notes_schedule = {"c.md": WEEKLY, "d.md": DAILY}
+    assert ScheduleJournal(path).replay(notes_schedule) == 5
+    assert notes_schedule == {"a.md": WEEKLY, "b.md": WEEKLY, "d.md": DAILY}
+
+
+def test_replay_ignores_torn_last_line(tmp_path):
+    path = str(tmp_path / "schedule_journal.jsonl")
+    journal = ScheduleJournal(path)
+    journal.record("a.md", DAILY)
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"note": "b.md", "info": {"mo')
+
+    assert replayed(path) == {"a.md": DAILY}
+
+
+def test_rotate_then_discard(tmp_path):
+    path = str(tmp_path / "schedule_journal.jsonl")
+    journal = ScheduleJournal(path)
+    journal.record("a.md", DAILY)
+    journal.rotate()
+    assert not os.path.exists(path)
+    assert os.path.exists(journal.rotated_path)
+    # 轮转后的修改写入新的日志文件
+    journal.record("b.md", WEEKLY)
+    journal.discard_rotated()
+    journal.close()
+
+    assert not os.path.exists(journal.rotated_path)
+    assert replayed(path) == {"b.md": WEEKLY}
+
+
+def test_rotated_log_survives_failed_snapshot(tmp_path):
+    path = str(tmp_path / "schedule_journal.jsonl")
+    journal = ScheduleJournal(path)
+    journal.record("a.md", DAILY)
+    journal.rotate()
+    # 快照写入失败：没有调用 discard_rotated，之后的修改写入新日志
+    journal.record("a.md", WEEKLY)
+    journal.record("b.md", DAILY)
+    assert replayed(path) == {"a.md": WEEKLY, "b.md": DAILY}
+
+    # 再次轮转时把当前日志接在旧日志之后，重放顺序不变
+    journal.rotate()
+    journal.record("b.md", None)
+    journal.close()
+    with open(journal.rotated_path, encoding='utf-8') as f:
+        assert [json.loads(line)["note"] for line in f] == ["a.md", "a.md", "b.md"]
+    assert replayed(path) == {"a.md": WEEKLY}
+
+
+def test_needs_compaction(tmp_path):
+    journal = ScheduleJournal(str(tmp_path / "schedule_journal.jsonl"))
+    journal.record_many({f"{i}.md": DAILY for i in range(ScheduleJournal.COMPACT_MIN_LINES)})
+    assert not journal.needs_compaction(note_count=0)
+    journal.record("x.md", DAILY)
+    assert journal.needs_compaction(note_count=0)
+    assert not journal.needs_compaction(note_count=10000)
+    journal.close()
+
+
+def test_config_manager_keeps_edits_when_snapshot_fails(tmp_path):
+    config_path = str(tmp_path / "config.json")
+    manager = ConfigManager(config_path, save_delay=60)
+    manager.set_note_schedule("a.md", DAILY)
+
+    # 临时文件路径被目录占用，快照写入失败
+    os.mkdir(config_path + ".tmp")
+    assert manager.save_config() is False
+    rotated_path = manager.schedule_journal.rotated_path
+    assert os.path.exists(rotated_path)
+
+    manager.set_note_schedule("b.md", WEEKLY)
+    manager.schedule_journal.close()
+    reloaded = ConfigManager(config_path, save_delay=60)
+    assert reloaded.get_all_note_schedules() == {"a.md": DAILY, "b.md": WEEKLY}
+    reloaded.schedule_journal.close()
+
+    os.rmdir(config_path + ".tmp")
+    assert manager.save_config() is True
+    manager.schedule_journal.close()
+    assert not os.path.exists(rotated_path)
+    with open(config_path, encoding='utf-8') as f:
+        assert json.load(f)["notes_schedule"] == {"a.md": DAILY, "b.md": WEEKLY}
+    assert ConfigManager(config_path, save_delay=60).get_all_note_schedules() == {"a.md": DAILY, "b.md": WEEKLY}
@@ -0,0 +1,94 @@
+import datetime
+
+import pytest
+
+from schedule_rules import RuleParseError, ScheduleRule, parse_rule, parse_rules, rule_from_dict
+
+
+def at(day, hour=0, minute=0):
+    return datetime.datetime(2026, 1, day, hour, minute)
+
+
+@pytest.mark.parametrize("rule_str, expected", [
+    ("every(3).hours", ScheduleRule(3, "hours")),
+    ("every().hour", ScheduleRule(1, "hours")),
+    ("every(2).days.at('08:00')", ScheduleRule(2, "days", at_time="08:00")),
+    ('every().day.at("8:05")', ScheduleRule(1, "days", at_time="08:05")),
+    ("every().monday.at('10:30')", ScheduleRule(1, "weeks", weekday="monday", at_time="10:30")),
+    ("  every( 10 ).minutes  ", ScheduleRule(10, "minutes")),
+])
+def test_parse_rule(rule_str, expected):
+    assert parse_rule(rule_str) == expected
+
+
+@pytest.mark.parametrize("rule_str", [
+    "",
+    "every(0).days",
+    "every(2).monday",
+    "every(2).day",
+    "every().fortnights",
+    "every().hours.at('08:00')",
+    "every().days.at('24:00')",
+    "every().days.at('8:5')",
+    "every(3).hours; import os",
+])
+def test_parse_rule_rejects_invalid(rule_str):
+    with pytest.raises(RuleParseError):
+        parse_rule(rule_str)
+
+
+def test_rule_str_round_trip():
+    for rule_str in ("every(3).hours", "every().days.at('08:05')", "every().friday.at('18:00')"):
+        assert parse_rule(rule_str).to_rule_str() == rule_str
+        rule = parse_rule(rule_str)
+        assert rule_from_dict(rule.to_dict()) == rule
+
+
+def test_parse_rules_accepts_mixed_list_and_skips_empty():
+    rules = parse_rules(["every().monday", "", {"interval": 1, "unit": "weeks", "weekday": "friday"}])
+    assert [rule.weekday for rule in rules] == ["monday", "friday"]
+    with pytest.raises(RuleParseError):
+        parse_rules({"interval": 2, "unit": "weeks", "weekday": "monday"})
+
+
+def test_interval_rule_next_run():
+    rule = parse_rule("every(3).hours")
+    assert rule.next_run_after(at(1, 7, 15)) == at(1, 10, 15)
+
+
+def test_every_two_days_at_time():
+    rule = parse_rule("every(2).days.at('08:00')")
+    # 与 schedule 库一致：间隔大于 1 时第一次触发在一个完整间隔之后
+    assert rule.next_run_after(at(1, 7)) == at(3, 8)
+    assert rule.next_run_after(at(1, 9)) == at(3, 8)
+    assert rule.next_run_after(at(3, 8)) == at(5, 8)
+
+
+def test_daily_at_time_same_day_or_next():
+    rule = parse_rule("every().day.at('08:00')")
+    assert rule.next_run_after(at(1, 7, 59)) == at(1, 8)
+    assert rule.next_run_after(at(1, 8)) == at(2, 8)
+
+
+def test_weekday_rule():
+    rule = parse_rule("every().monday.at('10:30')")
+    # 2026-01-05 是星期一
+    assert at(5).weekday() == 0
+    assert rule.next_run_after(at(1, 12)) == at(5, 10, 30)
+    assert rule.next_run_after(at(5, 9)) == at(5, 10, 30)
+    assert rule.next_run_after(at(5, 10, 30)) == at(12, 10, 30)
+
+
+def test_occurrences_between_is_half_open_and_limited():
+    rule = parse_rule("every(2).days.at('08:00')")
+    assert rule.occurrences_between(at(1, 7), at(9, 8)) == [at(3, 8), at(5, 8), at(7, 8), at(9, 8)]
+    assert rule.occurrences_between(at(3, 8), at(5, 8)) == [at(5, 8)]
+    assert rule.occurrences_between(at(1, 7), at(9, 8), limit=2) == [at(3, 8), at(5, 8)]
+    assert rule.occurrences_between(at(1, 7), at(2, 7)) == []
+
+
+def test_weekday_occurrences_between():
+    rule = parse_rule("every().friday")
+    fridays = rule.occurrences_between(at(1), at(31))
+    assert [moment.day for moment in fridays] == [2, 9, 16, 23, 30]
+    assert all(moment.weekday() == 4 for moment in fridays)